@@ -0,0 +1,93 @@
+"""消逝主题导入耗时测量.
+
+在新的解释器中用 -X importtime 导入集成包，输出集成自身的累计导入耗时，
+以及导入后是否加载了 astral 和 numpy（两者都应在首次使用时才加载）。
+
+用法：
+
+    python benchmarks/bench_import.py [--repeat 5] [--output import.json]
+
+Home Assistant 本身的模块在测量前预先导入，结果只反映集成带来的额外开销。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PACKAGE = "custom_components.xiaoshi_theme"
+
+# 预先导入集成依赖的 Home Assistant 模块，避免把它们计入集成的耗时
+_PRELOAD = (
+    "import homeassistant.helpers.event, homeassistant.helpers.debounce, "
+    "homeassistant.helpers.dispatcher, homeassistant.helpers.entity_registry, "
+    "homeassistant.config_entries"
+)
+_PROBE = (
+    "import sys; import {package}; "
+    "print('astral' in sys.modules, 'numpy' in sys.modules)"
+)
+
+
+def measure_once() -> Dict[str, Any]:
+    """在新的解释器中导入一次集成包."""
+    code = f"{_PRELOAD}; {_PROBE.format(package=PACKAGE)}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    package_us = None
+    for line in result.stderr.splitlines():
+        # 格式：import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if len(parts) == 3 and parts[2] == PACKAGE:
+            package_us = int(parts[1])
+    astral_loaded, numpy_loaded = result.stdout.split()
+    return {
+        "package_cumulative_us": package_us,
+        "astral_loaded": astral_loaded == "True",
+        "numpy_loaded": numpy_loaded == "True",
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """测量导入耗时并输出 JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="测量次数")
+    parser.add_argument("--output", help="结果写入的文件，默认输出到标准输出")
+    args = parser.parse_args(argv)
+
+    runs = [measure_once() for _ in range(args.repeat)]
+    samples = [run["package_cumulative_us"] for run in runs]
+    report = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "package": PACKAGE,
+        "median_us": statistics.median(samples),
+        "min_us": min(samples),
+        "max_us": max(samples),
+        "astral_loaded": any(run["astral_loaded"] for run in runs),
+        "numpy_loaded": any(run["numpy_loaded"] for run in runs),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+"""消逝主题基准测试.
+
+在内存中的 hass 替身上运行，不需要启动 Home Assistant，也不访问网络。
+测量一次主题评估（平板、手机）和一次色相更新在 1、10、100、1000 个手机主题条目下的
+延迟和内存分配，以及日出日落查询在位置共享和位置各不相同时的开销。
+
+用法：
+
+    python benchmarks/bench_tick.py [--entries 1,10,100,1000] [--repeat 50] [--output bench.json]
+
+结果以 JSON 输出，便于保存后与之后的运行对比。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from homeassistant.core import State  # noqa: E402
+
+from custom_components.xiaoshi_theme.const import (  # noqa: E402
+    DOMAIN,
+    CONF_INTEGRATION_TYPE,
+    CONF_LOCATION_SOURCE_ID,
+    CONF_PHONE_SLOT,
+    CONF_PAD_SLOT,
+    INTEGRATION_TYPE_PAD,
+    INTEGRATION_TYPE_PHONE,
+    ROLE_FULL_SWITCH,
+    ROLE_MODE_SWITCH,
+    ROLE_MODE_SELECT,
+    ROLE_MODE_NUMBER,
+    ROLE_HUE_SWITCH,
+    ROLE_HUE_NUMBER,
+    PAD_MODE_BLACK,
+)
+from custom_components.xiaoshi_theme.coordinator import XiaoshiThemeEngine  # noqa: E402
+from custom_components.xiaoshi_theme.index import ThemeEntryIndex  # noqa: E402
+from custom_components.xiaoshi_theme.settings import ThemeSettings  # noqa: E402
+from custom_components.xiaoshi_theme.utils import SOLAR_CACHE, is_daytime  # noqa: E402
+
+BENCHMARK_VERSION = 1
+DEFAULT_ENTRY_COUNTS = (1, 10, 100, 1000)
+DEFAULT_REPEAT = 50
+
+
+class StubStates:
+    """内存中的状态机."""
+
+    def __init__(self) -> None:
+        self._states: Dict[str, State] = {}
+
+    def get(self, entity_id: str) -> Optional[State]:
+        return self._states.get(entity_id)
+
+    def async_set(self, entity_id: str, state: str, attributes: Optional[dict] = None) -> None:
+        self._states[entity_id] = State(entity_id, state, attributes)
+
+    def async_all(self, domain: Optional[str] = None) -> List[State]:
+        return [
+            state for state in self._states.values() if domain is None or state.domain == domain
+        ]
+
+    def async_entity_ids(self, domain: Optional[str] = None) -> List[str]:
+        return [state.entity_id for state in self.async_all(domain)]
+
+
+class StubServices:
+    """内存中的服务注册表，只记录调用."""
+
+    def __init__(self) -> None:
+        self.calls: List[tuple] = []
+
+    async def async_call(self, domain: str, service: str, data: Optional[dict] = None, **kwargs: Any) -> None:
+        self.calls.append((domain, service, data))
+
+
+class StubConfigEntry:
+    """配置条目替身."""
+
+    def __init__(self, entry_id: str, data: dict) -> None:
+        self.entry_id = entry_id
+        self.domain = DOMAIN
+        self.data = data
+        self.options: dict = {}
+
+
+class StubConfigEntries:
+    """内存中的配置条目管理器."""
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, StubConfigEntry] = {}
+
+    def add(self, entry: StubConfigEntry) -> None:
+        self._entries[entry.entry_id] = entry
+
+    def async_entries(self, domain: Optional[str] = None) -> List[StubConfigEntry]:
+        return [entry for entry in self._entries.values() if domain is None or entry.domain == domain]
+
+    def async_get_entry(self, entry_id: str) -> Optional[StubConfigEntry]:
+        return self._entries.get(entry_id)
+
+    def async_update_entry(self, entry: StubConfigEntry, *, data: Optional[dict] = None, **kwargs: Any) -> bool:
+        if data is not None:
+            entry.data = data
+        return True
+
+
+class StubHass:
+    """hass 替身，只提供引擎评估时用到的部分."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.data: Dict[str, Any] = {DOMAIN: {}}
+        self.states = StubStates()
+        self.services = StubServices()
+        self.config_entries = StubConfigEntries()
+
+    def async_create_task(self, target: Any, name: Optional[str] = None) -> asyncio.Task:
+        return self.loop.create_task(target)
+
+
+class StubEntity:
+    """引擎登记的实体替身，记录推送的值."""
+
+    def __init__(self, **values: Any) -> None:
+        self.__dict__.update(values)
+        self.is_on = values.get("is_on", True)
+        self.hue_clock_enabled = False
+        self.hue_clock_running = False
+        self.suppressed_writes = 0
+        self.writes = 0
+
+    @property
+    def theme_value(self) -> Any:
+        if hasattr(self, "current_option"):
+            return self.current_option
+        return getattr(self, "native_value", self.is_on)
+
+    def async_push_value(self, value: Any) -> None:
+        if hasattr(self, "current_option"):
+            self.current_option = value
+        else:
+            self.native_value = value
+        self.writes += 1
+
+
+def _location(index: int, shared: bool) -> tuple:
+    """第 index 个位置源的坐标，纬度限制在 ±50° 以内避免极昼极夜."""
+    if shared:
+        return 31.2, 121.5
+    return -50.0 + (index * 7.31) % 100.0, -180.0 + (index * 13.7) % 360.0
+
+
+def build_engine(loop: asyncio.AbstractEventLoop, phone_entries: int, shared: bool) -> tuple:
+    """创建带一个平板主题和若干手机主题条目的引擎，不启动调度器."""
+    hass = StubHass(loop)
+    hass.states.async_set("zone.home", "0", {"latitude": 31.2, "longitude": 121.5, "friendly_name": "Home"})
+
+    entries = [
+        StubConfigEntry(
+            "pad",
+            {
+                CONF_INTEGRATION_TYPE: INTEGRATION_TYPE_PAD,
+                CONF_LOCATION_SOURCE_ID: "zone.home",
+                CONF_PAD_SLOT: 1,
+            },
+        )
+    ]
+    for i in range(1, phone_entries + 1):
+        source_id = "zone.home"
+        if not shared:
+            source_id = f"device_tracker.phone_{i}"
+            latitude, longitude = _location(i, shared)
+            hass.states.async_set(source_id, "not_home", {"latitude": latitude, "longitude": longitude})
+        entries.append(
+            StubConfigEntry(
+                f"phone_{i}",
+                {
+                    CONF_INTEGRATION_TYPE: INTEGRATION_TYPE_PHONE,
+                    CONF_LOCATION_SOURCE_ID: source_id,
+                    CONF_PHONE_SLOT: i,
+                },
+            )
+        )
+    for entry in entries:
+        hass.config_entries.add(entry)
+
+    index = ThemeEntryIndex(hass)
+    index.async_load()
+    engine = XiaoshiThemeEngine(hass, index, ThemeSettings(hass))
+    for entry in entries:
+        # 直接登记条目，跳过 async_register_entry 中的定时任务
+        engine._entries[entry.entry_id] = index.get(entry.entry_id)
+
+    entities: List[StubEntity] = []
+
+    def add(entry_id: str, role: str, entity: StubEntity) -> None:
+        engine.async_add_entity(entry_id, role, entity)
+        entities.append(entity)
+
+    add("pad", ROLE_FULL_SWITCH, StubEntity())
+    add("pad", ROLE_MODE_SWITCH, StubEntity())
+    add("pad", ROLE_MODE_SELECT, StubEntity(current_option=PAD_MODE_BLACK))
+    add("pad", ROLE_HUE_SWITCH, StubEntity())
+    add("pad", ROLE_HUE_NUMBER, StubEntity(native_value=1))
+    for i in range(1, phone_entries + 1):
+        add(f"phone_{i}", ROLE_FULL_SWITCH, StubEntity())
+        add(f"phone_{i}", ROLE_MODE_SWITCH, StubEntity())
+        add(f"phone_{i}", ROLE_MODE_NUMBER, StubEntity(native_value=1 + i % 8))
+    return hass, engine, entities
+
+
+def _measure(
+    name: str,
+    params: Dict[str, Any],
+    run: Callable[[], Any],
+    repeat: int,
+    setup: Optional[Callable[[], Any]] = None,
+) -> Dict[str, Any]:
+    """测量 run 的延迟分布，以及单次运行净增的内存块数和峰值内存."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    run()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    allocated_blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+
+    samples.sort()
+    return {
+        "name": name,
+        **params,
+        "repeat": repeat,
+        "min_us": samples[0] * 1e6,
+        "median_us": statistics.median(samples) * 1e6,
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6,
+        "max_us": samples[-1] * 1e6,
+        "net_alloc_blocks": allocated_blocks,
+        "peak_bytes": peak,
+    }
+
+
+def bench_ticks(loop: asyncio.AbstractEventLoop, counts: Iterable[int], repeat: int) -> List[Dict[str, Any]]:
+    """一次主题评估和一次色相更新的开销."""
+    results = []
+    for shared in (True, False):
+        for count in counts:
+            hass, engine, entities = build_engine(loop, count, shared)
+            initial = [dict(entity.__dict__) for entity in entities]
+
+            def reset() -> None:
+                # 每次评估前恢复初始值，保证每次都有相同数量的写入
+                for entity, values in zip(entities, initial):
+                    entity.__dict__.update(values)
+
+            params = {"entries": count, "shared_location": shared}
+            results.append(
+                _measure(
+                    "theme_tick",
+                    params,
+                    lambda: loop.run_until_complete(engine.async_refresh()),
+                    repeat,
+                    setup=reset,
+                )
+            )
+            results.append(
+                _measure(
+                    "theme_tick_steady",
+                    params,
+                    lambda: loop.run_until_complete(engine.async_refresh()),
+                    repeat,
+                )
+            )
+            if shared:
+                results.append(
+                    _measure(
+                        "hue_tick",
+                        {"entries": count},
+                        lambda: loop.run_until_complete(engine.async_update_hue()),
+                        repeat,
+                    )
+                )
+    return results
+
+
+def bench_solar(counts: Iterable[int], repeat: int) -> List[Dict[str, Any]]:
+    """日出日落查询的开销，分为缓存未命中和命中."""
+    hass = None
+    results = []
+    for shared in (True, False):
+        for count in counts:
+            locations = [_location(i, shared) for i in range(1, count + 1)]
+
+            def lookup() -> None:
+                for latitude, longitude in locations:
+                    is_daytime(hass, latitude, longitude)
+
+            def prefetch() -> None:
+                SOLAR_CACHE.prefetch(locations, time.time())
+
+            params = {"entries": count, "shared_location": shared}
+            results.append(_measure("is_daytime_cold", params, lookup, repeat, setup=SOLAR_CACHE.clear))
+            results.append(_measure("is_daytime_warm", params, lookup, repeat))
+            results.append(_measure("prefetch_cold", params, prefetch, repeat, setup=SOLAR_CACHE.clear))
+    SOLAR_CACHE.clear()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """运行基准测试并输出 JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--entries",
+        default=",".join(str(count) for count in DEFAULT_ENTRY_COUNTS),
+        help="手机主题条目数，逗号分隔",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每项测量的重复次数")
+    parser.add_argument("--output", help="结果写入的文件，默认输出到标准输出")
+    args = parser.parse_args(argv)
+
+    counts = [int(count) for count in args.entries.split(",") if count]
+    logging.basicConfig(level=logging.CRITICAL)
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = bench_ticks(loop, counts, args.repeat)
+    finally:
+        loop.close()
+    results.extend(bench_solar(counts, args.repeat))
+
+    report = {
+        "benchmark_version": BENCHMARK_VERSION,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
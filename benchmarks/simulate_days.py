@@ -0,0 +1,501 @@
+"""消逝主题多日运行模拟.
+
+用虚拟时钟驱动真实的主题引擎（XiaoshiThemeEngine）和它的全部定时任务：日出日落事件、
+色相定时任务、时钟检查、合并请求的延迟以及位置源的状态变化，按场景回放若干天，
+统计每天的唤醒次数、主题评估次数、日出日落计算次数、状态写入次数、记录器行数和服务调用次数。
+不需要启动 Home Assistant，也不访问网络；同一场景每次运行的结果相同。
+
+用法：
+
+    python benchmarks/simulate_days.py [--scenario scenario.json] [--days 3]
+        [--start 2024-03-30T00:00:00] [--time-zone Europe/Berlin]
+        [--output summary.json] [--baseline benchmarks/simulation_baseline.json]
+        [--tolerance 0.1] [--write-baseline]
+
+场景为 JSON，格式与 DEFAULT_SCENARIO 相同，命令行参数覆盖场景中的设置。
+指定 --baseline 时，任一指标的单日最大值超过基线（加容差）即返回非零，可在 CI 中使用；
+--write-baseline 把本次结果写为新的基线。默认场景跨过欧洲的夏令时切换。
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from homeassistant.core import Event  # noqa: E402
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from bench_tick import (  # noqa: E402
+    StubConfigEntry,
+    StubEntity,
+    StubHass,
+)
+from custom_components.xiaoshi_theme import coordinator, health, tables  # noqa: E402
+from custom_components.xiaoshi_theme.const import (  # noqa: E402
+    CONF_INTEGRATION_TYPE,
+    CONF_LOCATION_SOURCE_ID,
+    CONF_PHONE_SLOT,
+    CONF_PAD_SLOT,
+    INTEGRATION_TYPE_PAD,
+    INTEGRATION_TYPE_PHONE,
+    ROLE_FULL_SWITCH,
+    ROLE_MODE_SWITCH,
+    ROLE_MODE_SELECT,
+    ROLE_MODE_NUMBER,
+    ROLE_HUE_SWITCH,
+    ROLE_HUE_NUMBER,
+    PAD_MODE_BLACK,
+)
+from custom_components.xiaoshi_theme.index import ThemeEntryIndex  # noqa: E402
+from custom_components.xiaoshi_theme.settings import ThemeSettings  # noqa: E402
+from custom_components.xiaoshi_theme.utils import SOLAR_CACHE  # noqa: E402
+
+SIMULATION_VERSION = 1
+DEFAULT_TOLERANCE = 0.1
+
+# 默认场景：一个平板主题和两个手机主题，其中一部手机第二天飞往东京
+DEFAULT_SCENARIO: Dict[str, Any] = {
+    "start": "2024-03-30T00:00:00",
+    "time_zone": "Europe/Berlin",
+    "days": 3,
+    "locations": {
+        "zone.home": [52.52, 13.405],
+        "device_tracker.phone": [52.52, 13.405],
+    },
+    "entries": [
+        {"type": INTEGRATION_TYPE_PAD, "location": "zone.home"},
+        {"type": INTEGRATION_TYPE_PHONE, "location": "zone.home"},
+        {"type": INTEGRATION_TYPE_PHONE, "location": "device_tracker.phone"},
+    ],
+    "moves": [
+        {"hours": 36, "source": "device_tracker.phone", "latitude": 35.68, "longitude": 139.69},
+    ],
+}
+
+# 报告中的指标，按顺序输出
+METRICS = (
+    "wakeups",
+    "ticks",
+    "hue_ticks",
+    "entries_evaluated",
+    "solar_computations",
+    "table_builds",
+    "state_writes",
+    "recorder_rows",
+    "service_calls",
+)
+
+
+class VirtualClock:
+    """虚拟时钟和定时器队列.
+
+    time 和 monotonic 一起前进，不会被当作时钟跳变；perf_counter 保持真实时间，
+    主题评估的耗时仍按实际测量。
+    """
+
+    perf_counter = staticmethod(time.perf_counter)
+
+    def __init__(self, start: float) -> None:
+        self.now = start
+        self.wakeups = 0
+        self._timers: List[list] = []
+        self._seq = itertools.count()
+
+    def time(self) -> float:
+        return self.now
+
+    monotonic = time
+
+    def utcnow(self) -> datetime:
+        return datetime.fromtimestamp(self.now, timezone.utc)
+
+    def local_now(self, time_zone: Any = None) -> datetime:
+        return self.utcnow().astimezone(time_zone or dt_util.DEFAULT_TIME_ZONE)
+
+    def call_at(self, when: float, action: Callable[[], Any], wakeup: bool = True) -> Callable[[], None]:
+        """安排 when 时刻执行 action，返回取消函数."""
+        timer = [when, next(self._seq), action, wakeup]
+        heapq.heappush(self._timers, timer)
+
+        def cancel() -> None:
+            timer[2] = None
+
+        return cancel
+
+    async def run_until(self, until: float, drain: Callable[[], Any]) -> None:
+        """按时间顺序执行到 until 为止的所有定时器."""
+        while self._timers and self._timers[0][0] <= until:
+            when, _seq, action, wakeup = heapq.heappop(self._timers)
+            if action is None:
+                continue
+            self.now = max(self.now, when)
+            if wakeup:
+                self.wakeups += 1
+            result = action()
+            if asyncio.iscoroutine(result):
+                await result
+            await drain()
+        self.now = until
+
+
+class SimStore:
+    """不落盘的存储替身."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+    async def async_load(self) -> None:
+        return None
+
+    def async_delay_save(self, data_func: Callable[[], Any], delay: float = 0) -> None:
+        pass
+
+
+class SimBus:
+    """事件总线替身，模拟中不触发核心配置变化."""
+
+    def async_listen(self, event_type: str, listener: Callable) -> Callable[[], None]:
+        return lambda: None
+
+
+class SimHass(StubHass):
+    """在虚拟时钟下运行的 hass 替身."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        super().__init__(loop)
+        self.bus = SimBus()
+        self.table_builds = 0
+        self._tasks: List[asyncio.Task] = []
+
+    def async_create_task(self, target: Any, name: Optional[str] = None) -> asyncio.Task:
+        task = self.loop.create_task(target)
+        self._tasks.append(task)
+        return task
+
+    def async_create_background_task(self, target: Any, name: str) -> asyncio.Task:
+        return self.async_create_task(target, name)
+
+    async def async_add_executor_job(self, target: Callable, *args: Any) -> Any:
+        # 年表计算在模拟中同步执行，按位置计数
+        if target is tables._build_tables:
+            self.table_builds += len(args[0])
+        return target(*args)
+
+    async def async_drain(self) -> None:
+        """等待所有已创建的任务完成."""
+        while self._tasks:
+            tasks, self._tasks = self._tasks, []
+            await asyncio.gather(*tasks)
+
+
+class SimDebouncer:
+    """按虚拟时钟延迟执行的 Debouncer 替身，冷却期内的请求合并为一次."""
+
+    def __init__(self, clock: VirtualClock, cooldown: float, function: Callable[[], Any]) -> None:
+        self._clock = clock
+        self._cooldown = cooldown
+        self._function = function
+        self._cancel: Optional[Callable[[], None]] = None
+
+    async def async_call(self) -> None:
+        if self._cancel is not None:
+            return
+
+        async def fire() -> None:
+            self._cancel = None
+            await self._function()
+
+        self._cancel = self._clock.call_at(self._clock.now + self._cooldown, fire)
+
+    def async_cancel(self) -> None:
+        if self._cancel is not None:
+            self._cancel()
+            self._cancel = None
+
+
+class Simulation:
+    """按场景回放引擎的运行."""
+
+    def __init__(self, scenario: Dict[str, Any]) -> None:
+        self.scenario = scenario
+        self.time_zone = dt_util.get_time_zone(scenario["time_zone"])
+        if self.time_zone is None:
+            raise ValueError(f"未知的时区: {scenario['time_zone']}")
+        start = datetime.fromisoformat(scenario["start"])
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=self.time_zone)
+        self.start = start
+        self.clock = VirtualClock(start.timestamp())
+        self.loop = asyncio.new_event_loop()
+        self.hass = SimHass(self.loop)
+        self.entities: List[StubEntity] = []
+        self._state_listeners: List[tuple] = []
+        self._started: List[Callable] = []
+
+    def _patches(self) -> ExitStack:
+        """把引擎用到的时间和定时任务接到虚拟时钟上."""
+        clock = self.clock
+        stack = ExitStack()
+
+        def track_point_in_time(hass: Any, action: Callable, point: datetime) -> Callable[[], None]:
+            return clock.call_at(point.timestamp(), lambda: action(clock.utcnow()))
+
+        def track_time_interval(hass: Any, action: Callable, interval: timedelta) -> Callable[[], None]:
+            seconds = interval.total_seconds()
+            cancel: List[Callable[[], None]] = []
+
+            def fire() -> Any:
+                cancel[0] = clock.call_at(clock.now + seconds, fire)
+                return action(clock.utcnow())
+
+            cancel.append(clock.call_at(clock.now + seconds, fire))
+            return lambda: cancel[0]()
+
+        def track_time_change(
+            hass: Any, action: Callable, minute: Optional[str] = None, second: int = 0
+        ) -> Callable[[], None]:
+            # 只支持引擎使用的形式：每分钟或每 "/N" 分钟的第 0 秒
+            step = int(minute[1:]) if minute else 1
+            cancel: List[Callable[[], None]] = []
+
+            def next_point() -> float:
+                point = (int(clock.now) // 60 + 1) * 60
+                while datetime.fromtimestamp(point, dt_util.DEFAULT_TIME_ZONE).minute % step:
+                    point += 60
+                return point
+
+            def fire() -> Any:
+                cancel[0] = clock.call_at(next_point(), fire)
+                return action(clock.local_now())
+
+            cancel.append(clock.call_at(next_point(), fire))
+            return lambda: cancel[0]()
+
+        def track_state_change_event(hass: Any, entity_ids: List[str], action: Callable) -> Callable[[], None]:
+            listener = (set(entity_ids), action)
+            self._state_listeners.append(listener)
+            return lambda: self._state_listeners.remove(listener)
+
+        def at_started(hass: Any, action: Callable) -> Callable[[], None]:
+            self._started.append(action)
+            return lambda: self._started.remove(action)
+
+        def debouncer(hass: Any, logger: Any, *, cooldown: float, immediate: bool, function: Callable) -> SimDebouncer:
+            return SimDebouncer(clock, cooldown, function)
+
+        for module in (coordinator, health, tables):
+            stack.enter_context(patch.object(module, "time", clock))
+        stack.enter_context(patch.object(dt_util, "utcnow", clock.utcnow))
+        stack.enter_context(patch.object(dt_util, "now", clock.local_now))
+        stack.enter_context(patch.object(coordinator, "async_track_point_in_time", track_point_in_time))
+        stack.enter_context(patch.object(coordinator, "async_track_time_interval", track_time_interval))
+        stack.enter_context(patch.object(coordinator, "async_track_time_change", track_time_change))
+        stack.enter_context(patch.object(coordinator, "async_track_state_change_event", track_state_change_event))
+        stack.enter_context(patch.object(coordinator, "async_at_started", at_started))
+        stack.enter_context(patch.object(coordinator, "async_dispatcher_connect", lambda *args: lambda: None))
+        stack.enter_context(patch.object(coordinator, "async_dispatcher_send", lambda *args: None))
+        stack.enter_context(patch.object(coordinator, "Debouncer", debouncer))
+        stack.enter_context(patch.object(tables, "Store", SimStore))
+        return stack
+
+    def _add_entities(self, engine: coordinator.XiaoshiThemeEngine, entry: StubConfigEntry) -> None:
+        """登记条目的实体替身，模式开关都打开."""
+
+        def add(role: str, entity: StubEntity) -> None:
+            engine.async_add_entity(entry.entry_id, role, entity)
+            self.entities.append(entity)
+
+        add(ROLE_FULL_SWITCH, StubEntity())
+        add(ROLE_MODE_SWITCH, StubEntity())
+        if entry.data[CONF_INTEGRATION_TYPE] == INTEGRATION_TYPE_PAD:
+            add(ROLE_MODE_SELECT, StubEntity(current_option=PAD_MODE_BLACK))
+            add(ROLE_HUE_SWITCH, StubEntity())
+            add(ROLE_HUE_NUMBER, StubEntity(native_value=1))
+        else:
+            add(ROLE_MODE_NUMBER, StubEntity(native_value=2))
+
+    async def _async_move(self, move: Dict[str, Any]) -> None:
+        """位置源移动，通知监听它的调度器."""
+        source_id = move["source"]
+        self.hass.states.async_set(
+            source_id,
+            "not_home",
+            {"latitude": move["latitude"], "longitude": move["longitude"]},
+        )
+        event = Event("state_changed", {"entity_id": source_id})
+        for entity_ids, action in list(self._state_listeners):
+            if source_id in entity_ids:
+                self.clock.wakeups += 1
+                await action(event)
+
+    def _counters(self, engine: coordinator.XiaoshiThemeEngine) -> Dict[str, int]:
+        """当前的累计计数."""
+        return {
+            "wakeups": self.clock.wakeups,
+            "ticks": engine.metrics.ticks,
+            "hue_ticks": engine.metrics.hue_ticks,
+            "entries_evaluated": engine.metrics.entries_evaluated,
+            "solar_computations": SOLAR_CACHE.misses,
+            "table_builds": self.hass.table_builds,
+            "state_writes": engine.metrics.state_writes,
+            # 每次状态变化在记录器的 states 表中写入一行
+            "recorder_rows": sum(entity.writes for entity in self.entities),
+            "service_calls": len(self.hass.services.calls),
+        }
+
+    async def _async_run(self) -> Dict[str, Any]:
+        scenario = self.scenario
+        hass = self.hass
+        for source_id, (latitude, longitude) in scenario["locations"].items():
+            state = "0" if source_id.startswith("zone.") else "not_home"
+            hass.states.async_set(source_id, state, {"latitude": latitude, "longitude": longitude})
+
+        entries = []
+        slots = {INTEGRATION_TYPE_PAD: 0, INTEGRATION_TYPE_PHONE: 0}
+        for i, item in enumerate(scenario["entries"]):
+            data = {CONF_INTEGRATION_TYPE: item["type"], CONF_LOCATION_SOURCE_ID: item["location"]}
+            slots[item["type"]] += 1
+            if item["type"] == INTEGRATION_TYPE_PHONE:
+                data[CONF_PHONE_SLOT] = slots[item["type"]]
+            else:
+                data[CONF_PAD_SLOT] = slots[item["type"]]
+            entry = StubConfigEntry(f"{item['type']}_{i}", data)
+            entry.options = dict(item.get("options", {}))
+            hass.config_entries.add(entry)
+            entries.append(entry)
+
+        for move in scenario.get("moves", []):
+            when = self.start.timestamp() + move["hours"] * 3600
+            self.clock.call_at(when, lambda move=move: self._async_move(move), wakeup=False)
+
+        index = ThemeEntryIndex(hass)
+        index.async_load()
+        engine = coordinator.XiaoshiThemeEngine(hass, index, ThemeSettings(hass))
+        engine.async_start()
+        for entry in entries:
+            await engine.async_register_entry(entry)
+            self._add_entities(engine, entry)
+        # Home Assistant 启动完成
+        for action in list(self._started):
+            action(hass)
+        await hass.async_drain()
+
+        # 第一天包括启动时的注册、年表计算和第一次评估
+        days = []
+        previous = dict.fromkeys(METRICS, 0)
+        day_start = self.start
+        for day in range(scenario["days"]):
+            # 按当地日期划分，夏令时切换的那天为 23 或 25 小时
+            day_end = day_start + timedelta(days=1)
+            await self.clock.run_until(day_end.timestamp(), hass.async_drain)
+            counters = self._counters(engine)
+            days.append(
+                {
+                    "date": day_start.date().isoformat(),
+                    "hours": round((day_end.timestamp() - day_start.timestamp()) / 3600, 2),
+                    **{name: counters[name] - previous[name] for name in METRICS},
+                }
+            )
+            previous = counters
+            day_start = day_end
+
+        engine.async_stop()
+        await hass.async_drain()
+        return {
+            "simulation_version": SIMULATION_VERSION,
+            "scenario": scenario,
+            "totals": {name: sum(day[name] for day in days) for name in METRICS},
+            "per_day_max": {name: max((day[name] for day in days), default=0) for name in METRICS},
+            "days": days,
+            "errors": dict(engine.metrics.errors),
+        }
+
+    def run(self) -> Dict[str, Any]:
+        """运行模拟并返回汇总."""
+        previous_time_zone = dt_util.DEFAULT_TIME_ZONE
+        dt_util.set_default_time_zone(self.time_zone)
+        SOLAR_CACHE.clear()
+        SOLAR_CACHE.hits = SOLAR_CACHE.misses = SOLAR_CACHE.table_hits = SOLAR_CACHE.evictions = 0
+        try:
+            with self._patches():
+                return self.loop.run_until_complete(self._async_run())
+        finally:
+            self.loop.close()
+            dt_util.set_default_time_zone(previous_time_zone)
+            SOLAR_CACHE.clear()
+
+
+def check_baseline(summary: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """对比单日最大值与基线，返回超出的指标."""
+    regressions = []
+    for name, limit in baseline.get("per_day_max", {}).items():
+        value = summary["per_day_max"].get(name)
+        if value is None:
+            continue
+        allowed = limit * (1 + tolerance)
+        if value > allowed:
+            regressions.append(f"{name}: {value} > {limit}（容差 {tolerance:.0%}）")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """运行模拟并输出 JSON 汇总，超出基线时返回非零."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", help="场景 JSON 文件，默认使用内置场景")
+    parser.add_argument("--days", type=int, help="模拟的天数")
+    parser.add_argument("--start", help="开始时间（ISO 格式，不带时区时按场景时区）")
+    parser.add_argument("--time-zone", help="Home Assistant 的时区")
+    parser.add_argument("--output", help="汇总写入的文件，默认输出到标准输出")
+    parser.add_argument("--baseline", help="基线文件，单日最大值超出基线时返回非零")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="相对基线的容差")
+    parser.add_argument("--write-baseline", action="store_true", help="把本次结果写入 --baseline 指定的文件")
+    args = parser.parse_args(argv)
+
+    scenario = dict(DEFAULT_SCENARIO)
+    if args.scenario:
+        with open(args.scenario, encoding="utf-8") as file:
+            scenario.update(json.load(file))
+    for key, value in (("days", args.days), ("start", args.start), ("time_zone", args.time_zone)):
+        if value is not None:
+            scenario[key] = value
+
+    logging.basicConfig(level=logging.CRITICAL)
+    summary = Simulation(scenario).run()
+
+    output = json.dumps(summary, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline and args.write_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(
+                {"simulation_version": SIMULATION_VERSION, "per_day_max": summary["per_day_max"]},
+                file,
+                indent=2,
+            )
+            file.write("\n")
+    elif args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = check_baseline(summary, json.load(file), args.tolerance)
+        if regressions:
+            for regression in regressions:
+                print(f"超出基线: {regression}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
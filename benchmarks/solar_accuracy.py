@@ -0,0 +1,85 @@
+"""内置日出日落实现与 astral 的对比.
+
+在随机的位置和日期上比较内置的纯 Python 实现、numpy 批量实现和 astral，
+输出最大误差（秒）以及极昼极夜判断不一致的次数。需要安装 astral 和 numpy。
+
+用法：
+
+    python benchmarks/solar_accuracy.py [--samples 5000] [--seed 1]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from custom_components.xiaoshi_theme.solar import (  # noqa: E402
+    SOLAR_BATCH_MAX_ERROR_SECONDS,
+    SOLAR_BATCH_VERIFIED_LATITUDE,
+    batch_solar_state,
+    solar_day,
+)
+from custom_components.xiaoshi_theme.utils import (  # noqa: E402
+    _astral_solar_times,
+    _builtin_solar_times,
+)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """运行对比并输出 JSON，超出误差上限时返回非零."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=5000, help="随机样本数")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    now = time.time()
+    worst = {"verified": 0.0, "high_latitude": 0.0, "batch": 0.0}
+    polar_mismatch = 0
+    for _ in range(args.samples):
+        latitude = rng.uniform(-66.0, 66.0)
+        longitude = rng.uniform(-180.0, 180.0)
+        timestamp = now + rng.uniform(0, 365 * 86400)
+        day = solar_day(longitude, timestamp)
+
+        builtin = _builtin_solar_times(latitude, longitude, day)
+        reference = _astral_solar_times(latitude, longitude, day)
+        if (builtin is None) != (reference is None):
+            polar_mismatch += 1
+            continue
+        if builtin is None:
+            continue
+
+        error = max(
+            abs((builtin[0] - reference[0]).total_seconds()),
+            abs((builtin[1] - reference[1]).total_seconds()),
+        )
+        band = "verified" if abs(latitude) <= SOLAR_BATCH_VERIFIED_LATITUDE else "high_latitude"
+        worst[band] = max(worst[band], error)
+
+        batch = batch_solar_state([latitude], [longitude], timestamp)
+        worst["batch"] = max(
+            worst["batch"],
+            abs(float(batch.sunrise[0]) - builtin[0].timestamp()),
+            abs(float(batch.sunset[0]) - builtin[1].timestamp()),
+        )
+
+    report = {
+        "samples": args.samples,
+        "seed": args.seed,
+        "max_error_seconds": {band: round(error, 3) for band, error in worst.items()},
+        "verified_latitude": SOLAR_BATCH_VERIFIED_LATITUDE,
+        "limit_seconds": SOLAR_BATCH_MAX_ERROR_SECONDS,
+        "polar_mismatch": polar_mismatch,
+    }
+    print(json.dumps(report, indent=2))
+    ok = worst["verified"] <= SOLAR_BATCH_MAX_ERROR_SECONDS and worst["batch"] < 1.0
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,83 +1,137 @@
 """消逝主题集成."""
 import logging
-from datetime import timedelta
+from functools import partial
+from typing import Set
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 
-from .const import DOMAIN, UPDATE_INTERVAL_MINUTES, HUE_UPDATE_INTERVAL_MINUTES
-from .coordinator import async_setup_coordinator
+from .const import (
+    DOMAIN,
+    DATA_ENGINE,
+    DATA_INDEX,
+    DATA_SETTINGS,
+    DATA_METRICS_HOST,
+    DATA_METRICS_RELOAD,
+    DATA_UNLOADING,
+    CONF_DIAGNOSTIC_SENSORS,
+    REFRESH_COOLDOWN_SECONDS,
+    SIGNAL_SETTINGS_UPDATED,
+)
+from .coordinator import XiaoshiThemeEngine
+from .index import ThemeEntryIndex
+from .sensor import async_reload_metric_sensors
+from .services import async_setup_services
+from .settings import ThemeSettings
+from .websocket_api import async_setup_websocket
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = [Platform.SWITCH, Platform.SELECT, Platform.NUMBER]
+PLATFORMS = [Platform.SWITCH, Platform.SELECT, Platform.NUMBER, Platform.SENSOR]
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the 消逝主题 component."""
     hass.data.setdefault(DOMAIN, {})
+    # 集成级设置只在这里读取一次，所有条目共用
+    settings = ThemeSettings(hass)
+    await settings.async_load()
+    hass.data[DOMAIN][DATA_SETTINGS] = settings
+    hass.data[DOMAIN][DATA_UNLOADING] = set()
+    # 诊断传感器的移动在开关或条目卸载之后合并执行，不在卸载过程中重新加载平台
+    metrics_reload = Debouncer(
+        hass,
+        _LOGGER,
+        cooldown=REFRESH_COOLDOWN_SECONDS,
+        immediate=False,
+        function=partial(async_reload_metric_sensors, hass),
+    )
+    hass.data[DOMAIN][DATA_METRICS_RELOAD] = metrics_reload
+
+    @callback
+    def _async_settings_updated(changed: Set[str]) -> None:
+        """开关诊断传感器后只重新加载传感器平台."""
+        if CONF_DIAGNOSTIC_SENSORS in changed:
+            hass.async_create_task(metrics_reload.async_call())
+
+    async_dispatcher_connect(hass, SIGNAL_SETTINGS_UPDATED, _async_settings_updated)
+    async_setup_websocket(hass)
+    async_setup_services(hass)
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up 消逝主题 from a config entry."""
     hass.data.setdefault(DOMAIN, {})
+
+    # 索引在第一个条目加载时建立，之后随条目的添加和删除增量更新
+    index = hass.data[DOMAIN].get(DATA_INDEX)
+    if index is None:
+        index = ThemeEntryIndex(hass)
+        hass.data[DOMAIN][DATA_INDEX] = index
+        index.async_load()
+    index.async_add(entry)
+
     hass.data[DOMAIN][entry.entry_id] = entry.data
 
+    # 所有条目共享同一个引擎，由第一个条目创建，实体加入时向引擎登记
+    engine = hass.data[DOMAIN].get(DATA_ENGINE)
+    if engine is None:
+        _LOGGER.info("设置消逝主题引擎")
+        engine = XiaoshiThemeEngine(hass, index, hass.data[DOMAIN][DATA_SETTINGS])
+        hass.data[DOMAIN][DATA_ENGINE] = engine
+        engine.async_start()
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    # 无论是否是第一个条目，都重新设置协调器
-    _LOGGER.info("设置消逝主题协调器")
-    await async_setup_coordinator(hass)
+    await engine.async_register_entry(entry)
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
 
     return True
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """删除配置条目时释放其槽位."""
+    index = hass.data.get(DOMAIN, {}).get(DATA_INDEX)
+    if index is not None:
+        index.async_remove(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    unloading = hass.data[DOMAIN][DATA_UNLOADING]
+    unloading.add(entry.entry_id)
+    try:
+        unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    finally:
+        unloading.discard(entry.entry_id)
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
-        
-        # 如果是最后一个条目，清理定时任务
-        remaining_entries = [k for k in hass.data[DOMAIN].keys() 
-                            if k not in ["update_remove", "hue_update_remove", "update_callback"]]
-        
-        if not remaining_entries:
-            _LOGGER.info("移除所有消逝主题条目，清理定时任务")
-            
-            if "update_remove" in hass.data[DOMAIN]:
-                _LOGGER.info("移除主题更新定时任务")
-                hass.data[DOMAIN]["update_remove"]()
-                hass.data[DOMAIN].pop("update_remove")
-            
-            if "hue_update_remove" in hass.data[DOMAIN]:
-                _LOGGER.info("移除色相更新定时任务")
-                hass.data[DOMAIN]["hue_update_remove"]()
-                hass.data[DOMAIN].pop("hue_update_remove")
-                
-            _LOGGER.info("消逝主题定时任务已清理")
+
+        was_host = hass.data[DOMAIN].get(DATA_METRICS_HOST) == entry.entry_id
+        if was_host:
+            hass.data[DOMAIN].pop(DATA_METRICS_HOST)
+
+        engine = hass.data[DOMAIN].get(DATA_ENGINE)
+        if engine is not None:
+            engine.async_unregister_entry(entry)
+
+            # 如果是最后一个条目，停止引擎并清理定时任务
+            if engine.ref_count == 0:
+                _LOGGER.info("移除所有消逝主题条目，清理定时任务")
+                engine.async_stop()
+                hass.data[DOMAIN].pop(DATA_ENGINE)
+                hass.data[DOMAIN].pop(DATA_METRICS_HOST, None)
+                hass.data[DOMAIN][DATA_METRICS_RELOAD].async_cancel()
+                _LOGGER.info("消逝主题定时任务已清理")
+            # 诊断传感器所在的条目卸载后，稍后由其他已加载的条目接替
+            elif was_host and hass.data[DOMAIN][DATA_SETTINGS].diagnostic_sensors:
+                await hass.data[DOMAIN][DATA_METRICS_RELOAD].async_call()
 
     return unload_ok
 
-async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """重新加载配置条目."""
-    _LOGGER.info("重新加载消逝主题集成")
-    
-    # 清理定时任务
-    if "update_remove" in hass.data[DOMAIN]:
-        _LOGGER.info("移除主题更新定时任务")
-        hass.data[DOMAIN]["update_remove"]()
-        hass.data[DOMAIN].pop("update_remove")
-    
-    if "hue_update_remove" in hass.data[DOMAIN]:
-        _LOGGER.info("移除色相更新定时任务")
-        hass.data[DOMAIN]["hue_update_remove"]()
-        hass.data[DOMAIN].pop("hue_update_remove")
-    
-    # 先卸载
-    await async_unload_entry(hass, entry)
-    
-    # 再重新加载
-    await async_setup_entry(hass, entry)
-    
-    _LOGGER.info("消逝主题集成重新加载完成")
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """条目的数据或选项变化后直接更新运行中的引擎，不重新加载平台和实体."""
+    hass.data[DOMAIN][entry.entry_id] = entry.data
+    engine = hass.data[DOMAIN].get(DATA_ENGINE)
+    if engine is not None:
+        engine.async_update_entry(entry)
@@ -1,31 +1,62 @@
 """Config flow for 消逝主题 integration."""
 import logging
+from typing import Optional
+
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.const import ATTR_LATITUDE, ATTR_LONGITUDE
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
-from homeassistant.helpers import selector
+from homeassistant.helpers import entity_registry as er, selector
 import homeassistant.helpers.config_validation as cv
 
 from .const import (
     DOMAIN,
+    DATA_SETTINGS,
     CONF_INTEGRATION_TYPE,
     INTEGRATION_TYPE_PAD,
     INTEGRATION_TYPE_PHONE,
     CONF_LOCATION_SOURCE,
     CONF_LOCATION_SOURCE_ID,
+    CONF_LOCATION_MOVE_THRESHOLD,
+    DEFAULT_LOCATION_MOVE_THRESHOLD_METERS,
+    CONF_DIAGNOSTIC_SENSORS,
+    CONF_SOLAR_BACKEND,
+    SOLAR_BACKEND_BUILTIN,
+    SOLAR_BACKEND_ASTRAL,
+    CONF_HUE_MODE,
+    HUE_MODE_STEP,
+    HUE_MODE_CLOCK,
+    CONF_HUE_PERIOD_MINUTES,
+    DEFAULT_HUE_PERIOD_MINUTES,
+    CONF_HUE_MIN_WRITE_SECONDS,
+    DEFAULT_HUE_MIN_WRITE_SECONDS,
+    CONF_TRANSITION_RULES,
 )
+from .rules import compile_transition_rules
 
 _LOGGER = logging.getLogger(__name__)
 
-async def _async_has_pad_theme(hass: HomeAssistant) -> bool:
-    """检查是否已经添加了平板主题."""
-    existing_entries = hass.config_entries.async_entries(DOMAIN)
-    for entry in existing_entries:
-        if entry.data.get(CONF_INTEGRATION_TYPE) == INTEGRATION_TYPE_PAD:
-            return True
-    return False
+LOCATION_SOURCE_DOMAINS = ["zone", "device_tracker"]
+
+# 集成级设置的字段，旧版本保存在条目选项中
+SETTINGS_KEYS = (CONF_SOLAR_BACKEND, CONF_DIAGNOSTIC_SENSORS)
+
+@callback
+def _async_validate_location_source(hass: HomeAssistant, entity_id: str) -> Optional[str]:
+    """检查位置源是否可用，返回错误代码."""
+    entry = er.async_get(hass).async_get(entity_id)
+    if entry is not None and entry.disabled:
+        return "location_source_disabled"
+    state = hass.states.get(entity_id)
+    if (
+        state is None
+        or state.attributes.get(ATTR_LATITUDE) is None
+        or state.attributes.get(ATTR_LONGITUDE) is None
+    ):
+        return "location_source_no_coordinates"
+    return None
 
 class XiaoshiThemeConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for 消逝主题."""
@@ -38,14 +69,7 @@ class XiaoshiThemeConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_user(self, user_input=None) -> FlowResult:
         """Handle the initial step."""
-        # 检查是否已经添加了平板主题
-        has_pad_theme = await _async_has_pad_theme(self.hass)
-
-        # 如果已经添加了平板主题，只显示手机主题选项
-        if has_pad_theme:
-            return await self.async_step_integration_type({CONF_INTEGRATION_TYPE: INTEGRATION_TYPE_PHONE})
-
-        # 否则显示选择集成类型的选项
+        # 显示选择集成类型的选项，平板主题和手机主题都可以添加多个
         if user_input is None:
             return self.async_show_form(
                 step_id="user",
@@ -74,12 +98,6 @@ class XiaoshiThemeConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         integration_type = user_input[CONF_INTEGRATION_TYPE]
         self._integration_type = integration_type
 
-        # 如果选择了平板主题，但已经添加过，则显示错误
-        if integration_type == INTEGRATION_TYPE_PAD:
-            has_pad_theme = await _async_has_pad_theme(self.hass)
-            if has_pad_theme:
-                return self.async_abort(reason="pad_theme_already_exists")
-
         # 进入位置源选择步骤
         return await self.async_step_location_source()
 
@@ -93,50 +111,38 @@ class XiaoshiThemeConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         if user_input is not None and CONF_LOCATION_SOURCE_ID in user_input:
             location_source_id = user_input[CONF_LOCATION_SOURCE_ID]
-
-            # 创建配置条目
-            title = "消逝主题 - 平板" if integration_type == INTEGRATION_TYPE_PAD else f"消逝主题 - 手机"
+            error = _async_validate_location_source(self.hass, location_source_id)
+            if error:
+                errors[CONF_LOCATION_SOURCE_ID] = error
+            else:
+                # 创建配置条目
+                title = "消逝主题 - 平板" if integration_type == INTEGRATION_TYPE_PAD else f"消逝主题 - 手机"
             
-            # 如果是手机主题，添加设备名称到标题
-            if integration_type == INTEGRATION_TYPE_PHONE and location_source_id:
-                entity = self.hass.states.get(location_source_id)
-                if entity and entity.attributes.get("friendly_name"):
-                    title = f"消逝主题 - 手机 - {entity.attributes.get('friendly_name')}"
+                # 添加设备名称到标题，区分多个平板主题和手机主题
+                if location_source_id:
+                    entity = self.hass.states.get(location_source_id)
+                    if entity and entity.attributes.get("friendly_name"):
+                        title = f"{title} - {entity.attributes.get('friendly_name')}"
             
-            return self.async_create_entry(
-                title=title,
-                data={
-                    CONF_INTEGRATION_TYPE: integration_type,
-                    CONF_LOCATION_SOURCE_ID: location_source_id,
-                },
-            )
+                return self.async_create_entry(
+                    title=title,
+                    data={
+                        CONF_INTEGRATION_TYPE: integration_type,
+                        CONF_LOCATION_SOURCE_ID: location_source_id,
+                    },
+                )
 
-        # 构建位置源选择表单
-        source_types = ["zone", "device_tracker"]
-        source_options = []
-        
-        for source_type in source_types:
-            entities = self.hass.states.async_entity_ids(source_type)
-            for entity_id in entities:
-                entity = self.hass.states.get(entity_id)
-                if entity:
-                    friendly_name = entity.attributes.get("friendly_name", entity_id)
-                    source_options.append(
-                        {"label": f"{friendly_name} ({entity_id})", "value": entity_id}
-                    )
-
-        if not source_options:
+        # 使用实体选择器，由前端负责列表和搜索，不再为每次渲染复制或扫描所有状态；
+        # 没有坐标的设备追踪器在提交时由 _async_validate_location_source 拒绝
+        if not self.hass.states.async_entity_ids_count(LOCATION_SOURCE_DOMAINS):
             return self.async_abort(reason="no_location_sources")
 
         return self.async_show_form(
             step_id="location_source",
             data_schema=vol.Schema(
                 {
-                    vol.Required(CONF_LOCATION_SOURCE_ID): selector.SelectSelector(
-                        selector.SelectSelectorConfig(
-                            options=source_options,
-                            mode=selector.SelectSelectorMode.DROPDOWN,
-                        )
+                    vol.Required(CONF_LOCATION_SOURCE_ID): selector.EntitySelector(
+                        selector.EntitySelectorConfig(domain=LOCATION_SOURCE_DOMAINS)
                     ),
                 }
             ),
@@ -150,4 +156,163 @@ class XiaoshiThemeConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     @callback
     def async_get_options_flow(config_entry):
         """Get the options flow for this handler."""
-        return OptionsFlowHandler(config_entry)
\ No newline at end of file
+        return OptionsFlowHandler()
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """消逝主题选项.
+
+    保存后由更新监听器直接应用到运行中的引擎，不重新加载平台和实体。
+    位置源保存在条目数据中，其余设置保存在条目选项中；日出日落计算实现和诊断传感器
+    是集成级设置，在单独的步骤中修改，保存在共用的设置中。
+    """
+
+    @property
+    def _entry(self) -> config_entries.ConfigEntry:
+        """正在编辑的配置条目，选项流程的 handler 即为 entry_id."""
+        return self.hass.config_entries.async_get_entry(self.handler)
+
+    async def async_step_init(self, user_input=None) -> FlowResult:
+        """选择修改条目的选项还是集成级设置."""
+        return self.async_show_menu(step_id="init", menu_options=["entry", "settings"])
+
+    async def async_step_settings(self, user_input=None) -> FlowResult:
+        """修改作用于所有条目的集成级设置."""
+        settings = self.hass.data[DOMAIN][DATA_SETTINGS]
+        if user_input is not None:
+            await settings.async_update(user_input)
+            # 条目选项保持不变
+            return self.async_create_entry(title="", data=dict(self._entry.options))
+
+        schema = {
+            vol.Required(
+                CONF_SOLAR_BACKEND, default=settings.solar_backend
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=[
+                        {"label": "内置", "value": SOLAR_BACKEND_BUILTIN},
+                        {"label": "astral", "value": SOLAR_BACKEND_ASTRAL},
+                    ],
+                    mode=selector.SelectSelectorMode.DROPDOWN,
+                )
+            ),
+            vol.Required(
+                CONF_DIAGNOSTIC_SENSORS, default=settings.diagnostic_sensors
+            ): selector.BooleanSelector(),
+        }
+        return self.async_show_form(step_id="settings", data_schema=vol.Schema(schema))
+
+    async def async_step_entry(self, user_input=None) -> FlowResult:
+        """编辑条目的选项."""
+        entry = self._entry
+        is_pad = entry.data.get(CONF_INTEGRATION_TYPE) == INTEGRATION_TYPE_PAD
+        errors = {}
+
+        if user_input is not None:
+            location_source_id = user_input.pop(CONF_LOCATION_SOURCE_ID)
+            if location_source_id != entry.data.get(CONF_LOCATION_SOURCE_ID):
+                error = _async_validate_location_source(self.hass, location_source_id)
+                if error:
+                    errors[CONF_LOCATION_SOURCE_ID] = error
+
+            rules = user_input.get(CONF_TRANSITION_RULES)
+            if rules:
+                try:
+                    compile_transition_rules(rules, str if is_pad else int)
+                except (AttributeError, ValueError):
+                    errors[CONF_TRANSITION_RULES] = "invalid_transition_rules"
+
+            if not errors:
+                # 清空的规则恢复默认规则，旧版本写在条目选项中的集成级设置一并移除
+                options = {**entry.options, **user_input}
+                for key in SETTINGS_KEYS:
+                    options.pop(key, None)
+                if not rules:
+                    options.pop(CONF_TRANSITION_RULES, None)
+                for key in (CONF_HUE_PERIOD_MINUTES, CONF_HUE_MIN_WRITE_SECONDS):
+                    if key in options:
+                        options[key] = int(options[key])
+                # 数据和选项一次写入，只触发一次更新
+                self.hass.config_entries.async_update_entry(
+                    entry,
+                    data={**entry.data, CONF_LOCATION_SOURCE_ID: location_source_id},
+                    options=options,
+                )
+                return self.async_create_entry(title="", data=options)
+
+        options = entry.options
+        schema = {
+            vol.Required(
+                CONF_LOCATION_SOURCE_ID, default=entry.data.get(CONF_LOCATION_SOURCE_ID)
+            ): selector.EntitySelector(
+                selector.EntitySelectorConfig(domain=LOCATION_SOURCE_DOMAINS)
+            ),
+            vol.Required(
+                CONF_LOCATION_MOVE_THRESHOLD,
+                default=options.get(
+                    CONF_LOCATION_MOVE_THRESHOLD, DEFAULT_LOCATION_MOVE_THRESHOLD_METERS
+                ),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=0,
+                    max=100000,
+                    step=100,
+                    unit_of_measurement="m",
+                    mode=selector.NumberSelectorMode.BOX,
+                )
+            ),
+        }
+        if is_pad:
+            schema.update(
+                {
+                    vol.Required(
+                        CONF_HUE_MODE, default=options.get(CONF_HUE_MODE, HUE_MODE_STEP)
+                    ): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=[
+                                {"label": "逐分钟加一", "value": HUE_MODE_STEP},
+                                {"label": "按时钟计算", "value": HUE_MODE_CLOCK},
+                            ],
+                            mode=selector.SelectSelectorMode.DROPDOWN,
+                        )
+                    ),
+                    vol.Required(
+                        CONF_HUE_PERIOD_MINUTES,
+                        default=options.get(CONF_HUE_PERIOD_MINUTES, DEFAULT_HUE_PERIOD_MINUTES),
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=1,
+                            max=10080,
+                            step=1,
+                            unit_of_measurement="min",
+                            mode=selector.NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Required(
+                        CONF_HUE_MIN_WRITE_SECONDS,
+                        default=options.get(
+                            CONF_HUE_MIN_WRITE_SECONDS, DEFAULT_HUE_MIN_WRITE_SECONDS
+                        ),
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=0,
+                            max=3600,
+                            step=1,
+                            unit_of_measurement="s",
+                            mode=selector.NumberSelectorMode.BOX,
+                        )
+                    ),
+                }
+            )
+        schema[
+            vol.Optional(
+                CONF_TRANSITION_RULES,
+                description={"suggested_value": options.get(CONF_TRANSITION_RULES)},
+            )
+        ] = selector.ObjectSelector()
+
+        return self.async_show_form(
+            step_id="entry",
+            data_schema=vol.Schema(schema),
+            errors=errors,
+        )
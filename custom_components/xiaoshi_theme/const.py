@@ -2,32 +2,142 @@
 
 DOMAIN = "xiaoshi_theme"
 
+# hass.data[DOMAIN] 中保存共享引擎的键
+DATA_ENGINE = "engine"
+DATA_INDEX = "index"
+DATA_SETTINGS = "settings"
+# 创建诊断传感器的条目、移动诊断传感器的防抖器和正在卸载的条目
+DATA_METRICS_HOST = "metrics_host"
+DATA_METRICS_RELOAD = "metrics_reload"
+DATA_UNLOADING = "unloading"
+
 # 集成类型
 CONF_INTEGRATION_TYPE = "integration_type"
 INTEGRATION_TYPE_PAD = "pad"
 INTEGRATION_TYPE_PHONE = "phone"
 
+# 手机主题和平板主题的槽位，决定实体 ID 的序号
+CONF_PHONE_SLOT = "phone_slot"
+CONF_PAD_SLOT = "pad_slot"
+
 # 位置来源
 CONF_LOCATION_SOURCE = "location_source"
 CONF_LOCATION_SOURCE_ID = "location_source_id"
 
-# 平板主题实体
+# 平板主题实体：第一个槽位沿用这些实体 ID，之后的槽位加上 "_序号" 后缀
 SWITCH_THEME_PAD_FULL = "switch.theme_pad_full"
 SWITCH_THEME_PAD_MODE = "switch.theme_pad_mode"
 SELECT_THEME_PAD_MODE = "select.theme_pad_mode"
 SWITCH_THEME_PAD_HUE = "switch.theme_pad_hue"
 NUMBER_THEME_PAD_HUE = "number.theme_pad_hue"
 
+# 实体在引擎中的角色
+ROLE_FULL_SWITCH = "full_switch"
+ROLE_MODE_SWITCH = "mode_switch"
+ROLE_MODE_SELECT = "mode_select"
+ROLE_MODE_NUMBER = "mode_number"
+ROLE_HUE_SWITCH = "hue_switch"
+ROLE_HUE_NUMBER = "hue_number"
+
 # 平板主题模式选项
 PAD_MODE_COLOR = "彩平图"
 PAD_MODE_BLACK = "黑平图"
 PAD_MODE_OPTIONS = [PAD_MODE_COLOR, PAD_MODE_BLACK]
 
+# 模式切换规则：每个模式对应白天和黑夜的目标模式，可在条目选项中修改
+CONF_TRANSITION_RULES = "transition_rules"
+# 平板主题：白天彩平图，黑夜黑平图
+DEFAULT_PAD_MODE_PAIRS = [(PAD_MODE_COLOR, PAD_MODE_BLACK)]
+# 手机主题：奇数为白天模式，偶数为对应的黑夜模式
+DEFAULT_PHONE_MODE_PAIRS = [(1, 2), (3, 4), (5, 6), (7, 8)]
+
 # 手机主题实体前缀
 SWITCH_THEME_PHONE_FULL_PREFIX = "switch.theme_phone_full_"
 SWITCH_THEME_PHONE_MODE_PREFIX = "switch.theme_phone_mode_"
 NUMBER_THEME_PHONE_MODE_PREFIX = "number.theme_phone_mode_"
 
 # 更新间隔
-UPDATE_INTERVAL_MINUTES = 5
-HUE_UPDATE_INTERVAL_MINUTES = 1
\ No newline at end of file
+HUE_UPDATE_INTERVAL_MINUTES = 1
+
+# 色相模式：逐分钟加一，或按时钟计算
+CONF_HUE_MODE = "hue_mode"
+HUE_MODE_STEP = "step"
+HUE_MODE_CLOCK = "clock"
+CONF_HUE_PERIOD_MINUTES = "hue_period_minutes"
+# 默认周期与逐分钟加一的速度相同
+DEFAULT_HUE_PERIOD_MINUTES = 360
+# 时钟色相模式下写入状态的间隔，前端根据属性在本地插值
+HUE_CLOCK_WRITE_INTERVAL_MINUTES = 15
+
+# 色相的最小写入间隔（秒），间隔内引擎推送的变化合并为一次写入；
+# 默认 0 表示不限制，需要在选项中开启，用户设置的值总是立即写入
+CONF_HUE_MIN_WRITE_SECONDS = "hue_min_write_seconds"
+DEFAULT_HUE_MIN_WRITE_SECONDS = 0
+
+# 时钟色相属性
+ATTR_HUE_MODE = "hue_mode"
+ATTR_HUE_PERIOD = "hue_period_seconds"
+ATTR_HUE_PHASE = "hue_phase"
+ATTR_HUE_EPOCH = "hue_epoch"
+
+# 色相调色板属性
+ATTR_PALETTE_MODE = "palette_mode"
+ATTR_PALETTE_PRIMARY = "palette_primary"
+ATTR_PALETTE_ACCENT = "palette_accent"
+ATTR_PALETTE_BACKGROUND = "palette_background"
+ATTR_PALETTE_TEXT = "palette_text"
+
+# 日出日落调度
+CLOCK_CHECK_INTERVAL_MINUTES = 60
+CLOCK_JUMP_TOLERANCE_SECONDS = 60
+REFRESH_COOLDOWN_SECONDS = 1
+
+# 条目连续失败后的重试退避（秒）：从基础值开始每次翻倍，不超过上限
+FAILURE_BACKOFF_BASE_SECONDS = 60
+FAILURE_BACKOFF_MAX_SECONDS = 3600
+
+# 主题评估耗时直方图的桶上限（毫秒）
+TICK_DURATION_BUCKETS_MS = (1, 5, 10, 50, 100, 500)
+
+# 是否创建诊断传感器，作用于整个集成，只创建一组
+CONF_DIAGNOSTIC_SENSORS = "diagnostic_sensors"
+
+# 位置源移动超过该距离（米）才重新计算日出日落，过滤 GPS 抖动
+CONF_LOCATION_MOVE_THRESHOLD = "location_move_threshold"
+DEFAULT_LOCATION_MOVE_THRESHOLD_METERS = 5000
+
+# 日出日落缓存：经纬度保留的小数位数（3 位约 100 米）和最大条目数
+SOLAR_CACHE_PRECISION = 3
+SOLAR_CACHE_MAX_SIZE = 2048
+
+# 日出日落年表：覆盖的天数、剩余天数少于多少时重建、保存的延迟（秒）
+SOLAR_TABLE_DAYS = 366
+SOLAR_TABLE_REBUILD_MARGIN_DAYS = 30
+SOLAR_TABLE_SAVE_DELAY_SECONDS = 10
+
+# 日出日落计算实现：内置的纯 Python 实现，或按需加载的 astral，作用于整个集成
+CONF_SOLAR_BACKEND = "solar_backend"
+SOLAR_BACKEND_BUILTIN = "builtin"
+SOLAR_BACKEND_ASTRAL = "astral"
+DEFAULT_SOLAR_BACKEND = SOLAR_BACKEND_BUILTIN
+
+# 调度器信号：实体状态被用户修改后请求重新评估，参数为 entry_id
+SIGNAL_THEME_REFRESH = f"{DOMAIN}_refresh"
+# 主题实体的值变化，参数为 entry_id、角色和新值
+SIGNAL_THEME_CHANGED = f"{DOMAIN}_changed"
+# 单个条目的主题实体值变化，按 entry_id 格式化，参数为角色和新值
+SIGNAL_THEME_ENTRY_CHANGED = f"{DOMAIN}_changed_{{}}"
+# 集成级设置被修改，参数为变化的键
+SIGNAL_SETTINGS_UPDATED = f"{DOMAIN}_settings_updated"
+# 批量设置服务及其字段
+SERVICE_APPLY = "apply"
+ATTR_ENTRY_ID = "entry_id"
+ATTR_PHONE_MODE = "phone_mode"
+ATTR_PAD_MODE = "pad_mode"
+ATTR_HUE = "hue"
+ATTR_FULL_SWITCH = "full_switch"
+ATTR_MODE_SWITCH = "mode_switch"
+ATTR_HUE_SWITCH = "hue_switch"
+
+# 评估追踪：内存中保留的最近事件数
+TRACE_BUFFER_SIZE = 500
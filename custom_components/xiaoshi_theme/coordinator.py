@@ -1,313 +1,959 @@
 """消逝主题定时任务协调器."""
 import logging
+import time
 import datetime
 from datetime import timedelta
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EVENT_CORE_CONFIG_UPDATE
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.dispatcher import async_dispatcher_connect, async_dispatcher_send
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.start import async_at_started
+from homeassistant.helpers.event import (
+    async_track_point_in_time,
+    async_track_state_change_event,
+    async_track_time_change,
+    async_track_time_interval,
+)
+from homeassistant.util import dt as dt_util
+from homeassistant.util.location import distance
 
 from .const import (
     DOMAIN,
-    CONF_INTEGRATION_TYPE,
-    CONF_LOCATION_SOURCE_ID,
-    INTEGRATION_TYPE_PAD,
-    INTEGRATION_TYPE_PHONE,
-    SWITCH_THEME_PAD_MODE,
-    SELECT_THEME_PAD_MODE,
-    SWITCH_THEME_PAD_HUE,
-    NUMBER_THEME_PAD_HUE,
-    SWITCH_THEME_PHONE_MODE_PREFIX,
-    NUMBER_THEME_PHONE_MODE_PREFIX,
-    PAD_MODE_COLOR,
-    PAD_MODE_BLACK,
-    UPDATE_INTERVAL_MINUTES,
+    ROLE_MODE_SWITCH,
+    ROLE_MODE_SELECT,
+    ROLE_MODE_NUMBER,
+    ROLE_HUE_SWITCH,
+    ROLE_HUE_NUMBER,
     HUE_UPDATE_INTERVAL_MINUTES,
+    HUE_CLOCK_WRITE_INTERVAL_MINUTES,
+    CONF_HUE_MODE,
+    HUE_MODE_CLOCK,
+    CLOCK_CHECK_INTERVAL_MINUTES,
+    CLOCK_JUMP_TOLERANCE_SECONDS,
+    REFRESH_COOLDOWN_SECONDS,
+    SIGNAL_THEME_REFRESH,
+    SIGNAL_THEME_CHANGED,
+    CONF_LOCATION_MOVE_THRESHOLD,
+    DEFAULT_LOCATION_MOVE_THRESHOLD_METERS,
+    CONF_SOLAR_BACKEND,
+    SIGNAL_SETTINGS_UPDATED,
+)
+from .health import TASK_HUE, EntryHealth
+from .index import ThemeEntryIndex, ThemeEntrySlot
+from .metrics import ThemeMetrics
+from .settings import ThemeSettings
+from .tables import SolarTableManager
+from .trace import (
+    DECISION_BACKOFF,
+    DECISION_DISABLED,
+    DECISION_ERROR,
+    DECISION_INCOMPLETE,
+    DECISION_KEEP,
+    DECISION_NO_LOCATION,
+    DECISION_SWITCH,
+    KIND_HUE,
+    KIND_MODE,
+    KIND_SWEEP,
+    TickTracer,
+)
+from .utils import (
+    SOLAR_CACHE,
+    is_daytime,
+    get_location_from_entity,
+    get_next_solar_change,
 )
-from .utils import is_daytime, get_location_from_entity
 
 _LOGGER = logging.getLogger(__name__)
 
-async def async_setup_coordinator(hass: HomeAssistant) -> None:
-    """设置定时任务协调器."""
-    
-    async def update_theme_logic(now=None) -> None:
-        """更新主题逻辑."""
+RefreshCallback = Callable[..., Awaitable[Any]]
+SourcesCallback = Callable[[], Set[str]]
+ThresholdCallback = Callable[[str], float]
+LocationsCallback = Callable[[Iterable[Tuple[float, float]]], None]
+
+
+class ThemeChange(NamedTuple):
+    """一次待写入的实体变更."""
+
+    entry_id: str
+    role: str
+    value: Any
+
+
+class SolarScheduler:
+    """日出日落事件调度器.
+
+    为每个位置源只安排一个 async_track_point_in_time，在下一次日出或日落时
+    触发该位置源相关条目的重新评估，随后立即安排下一次事件。
+    位置源的坐标在安排事件时记录下来，之后只有移动超过阈值才更新，
+    评估时也使用记录的坐标，GPS 抖动不会引起任何计算。
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        refresh: RefreshCallback,
+        get_sources: SourcesCallback,
+        get_move_threshold: ThresholdCallback,
+        locations_changed: LocationsCallback,
+    ) -> None:
+        """初始化调度器."""
+        self.hass = hass
+        self._refresh = refresh
+        self._get_sources = get_sources
+        self._get_move_threshold = get_move_threshold
+        self._locations_changed = locations_changed
+        self._point_unsubs: Dict[str, CALLBACK_TYPE] = {}
+        self._locations: Dict[str, Tuple[float, float]] = {}
+        self._sources: Set[str] = set()
+        self._source_unsub: Optional[CALLBACK_TYPE] = None
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._clock_drift: Optional[float] = None
+        self._utc_offset: Optional[timedelta] = None
+
+    def get_location(self, source_id: str) -> Tuple[Optional[float], Optional[float]]:
+        """位置源记录的坐标，尚未记录时读取实体状态."""
+        location = self._locations.get(source_id)
+        if location is not None:
+            return location
+        return get_location_from_entity(self.hass, source_id)
+
+    @callback
+    def async_start(self) -> None:
+        """启动调度器."""
+        self._clock_drift = time.time() - time.monotonic()
+        self._utc_offset = dt_util.now().utcoffset()
+
+        self._listeners.append(
+            async_track_time_interval(
+                self.hass,
+                self._async_check_clock,
+                timedelta(minutes=CLOCK_CHECK_INTERVAL_MINUTES),
+            )
+        )
+        self._listeners.append(
+            self.hass.bus.async_listen(
+                EVENT_CORE_CONFIG_UPDATE, self._async_handle_config_update
+            )
+        )
+        self.async_rearm()
+
+    @callback
+    def async_stop(self) -> None:
+        """停止调度器并取消所有定时任务."""
+        for unsub in self._listeners:
+            unsub()
+        self._listeners.clear()
+
+        if self._source_unsub:
+            self._source_unsub()
+            self._source_unsub = None
+
+        for unsub in self._point_unsubs.values():
+            unsub()
+        self._point_unsubs.clear()
+        self._locations.clear()
+        self._sources.clear()
+
+    @callback
+    def async_rearm(self, force: bool = False) -> None:
+        """根据当前的配置条目安排位置源的事件.
+
+        默认只为新增的位置源安排事件，force 为 True 时重新安排所有位置源。
+        """
+        sources = self._get_sources()
+
+        for source_id in self._sources - sources:
+            self._async_cancel_source(source_id)
+
+        if sources != self._sources:
+            if self._source_unsub:
+                self._source_unsub()
+                self._source_unsub = None
+            if sources:
+                self._source_unsub = async_track_state_change_event(
+                    self.hass, list(sources), self._async_handle_source_change
+                )
+            self._sources = sources
+
+        for source_id in sources:
+            if force or source_id not in self._point_unsubs:
+                self._async_arm_source(source_id)
+        self._locations_changed(self._locations.values())
+
+    @callback
+    def _async_cancel_source(self, source_id: str) -> None:
+        """取消某个位置源的事件."""
+        unsub = self._point_unsubs.pop(source_id, None)
+        if unsub:
+            unsub()
+        self._locations.pop(source_id, None)
+
+    @callback
+    def _async_arm_source(self, source_id: str) -> None:
+        """为位置源安排下一次日出或日落事件."""
+        self._async_cancel_source(source_id)
+
+        latitude, longitude = get_location_from_entity(self.hass, source_id)
+        if latitude is None or longitude is None:
+            # 位置源恢复后由状态变化事件重新安排
+            return
+        self._locations[source_id] = (latitude, longitude)
+
+        next_change = get_next_solar_change(latitude, longitude)
+        if next_change is None:
+            # 极昼或极夜期间没有日出日落，到极昼或极夜结束那天再检查
+            now = dt_util.utcnow()
+            season = SOLAR_CACHE.polar_season(latitude, longitude, now.timestamp())
+            next_change = max(
+                dt_util.utc_from_timestamp(season.end_timestamp(longitude)),
+                now + timedelta(minutes=1),
+            )
+            _LOGGER.debug(
+                "位置源 %s 处于%s，将于 %s 重新检查",
+                source_id,
+                "极昼" if season.is_day else "极夜",
+                next_change,
+            )
+        else:
+            _LOGGER.debug("位置源 %s 的下一次日出日落时间：%s", source_id, next_change)
+
+        self._point_unsubs[source_id] = async_track_point_in_time(
+            self.hass, partial(self._async_handle_point, source_id), next_change
+        )
+
+    async def _async_handle_point(self, source_id: str, now: datetime.datetime) -> None:
+        """日出或日落时刻到达."""
+        _LOGGER.debug("位置源 %s 的日出日落事件被触发，时间：%s", source_id, now)
+        self._point_unsubs.pop(source_id, None)
+        await self._refresh({source_id})
+        if source_id in self._sources:
+            self._async_arm_source(source_id)
+            # 每天检查一次年表是否快要用完
+            self._locations_changed(self._locations.values())
+
+    async def _async_handle_source_change(self, event: Event) -> None:
+        """位置源状态变化时，如果移动超过阈值则重新评估并重新安排."""
+        source_id = event.data["entity_id"]
+        latitude, longitude = get_location_from_entity(self.hass, source_id)
+        previous = self._locations.get(source_id)
+        if (latitude, longitude) == previous:
+            return
+        if previous is not None and latitude is not None and longitude is not None:
+            moved = distance(previous[0], previous[1], latitude, longitude)
+            if moved is not None and moved < self._get_move_threshold(source_id):
+                _LOGGER.debug("位置源 %s 移动 %.0f 米，未超过阈值", source_id, moved)
+                return
+
+        _LOGGER.debug("位置源 %s 的位置发生变化: %s, %s", source_id, latitude, longitude)
+        self._async_arm_source(source_id)
+        self._locations_changed(self._locations.values())
+        # 位置变化可能修复了失败的条目，立即重试
+        await self._refresh({source_id}, retry=True)
+
+    async def _async_check_clock(self, now: datetime.datetime) -> None:
+        """检测系统时钟跳变或夏令时切换."""
+        drift = time.time() - time.monotonic()
+        utc_offset = dt_util.now().utcoffset()
+        jumped = (
+            self._clock_drift is not None
+            and abs(drift - self._clock_drift) > CLOCK_JUMP_TOLERANCE_SECONDS
+        )
+        shifted = utc_offset != self._utc_offset
+        self._clock_drift = drift
+        self._utc_offset = utc_offset
+
+        if jumped or shifted:
+            _LOGGER.info("检测到系统时钟跳变或时区偏移变化，重新安排日出日落事件")
+            self.async_rearm(force=True)
+            await self._refresh(None)
+
+    async def _async_handle_config_update(self, event: Event) -> None:
+        """Home Assistant 核心配置（如时区）变化时重新安排."""
+        self._utc_offset = dt_util.now().utcoffset()
+        self.async_rearm(force=True)
+        await self._refresh(None)
+
+
+class XiaoshiThemeEngine:
+    """消逝主题引擎.
+
+    每个 hass 实例只创建一个，由第一个配置条目创建，记录使用它的条目数，
+    最后一个条目卸载时才停止。定时任务数量与条目数量无关。
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, index: ThemeEntryIndex, settings: ThemeSettings
+    ) -> None:
+        """初始化引擎."""
+        self.hass = hass
+        self._index = index
+        self._settings = settings
+        self._entries: Dict[str, ThemeEntrySlot] = {}
+        # 日出日落年表，缓存未命中时优先读取
+        self._tables = SolarTableManager(hass)
+        self._scheduler = SolarScheduler(
+            hass,
+            self.async_refresh,
+            self._async_location_sources,
+            self._location_move_threshold,
+            self._tables.async_update,
+        )
+        # 用户修改开关或模式、新条目加载后，合并短时间内的多次请求为一次更新
+        self._refresh_debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=REFRESH_COOLDOWN_SECONDS,
+            immediate=False,
+            function=self._async_flush_refresh,
+        )
+        # 待评估的位置源，None 表示评估全部条目
+        self._pending_sources: Optional[Set[str]] = set()
+        self._pending_hue = False
+        # Home Assistant 启动完成前只登记条目，启动完成后统一安排和评估一次
+        self._started = False
+        self._start_unsub: Optional[CALLBACK_TYPE] = None
+        self._remove_dispatcher: Optional[CALLBACK_TYPE] = None
+        self._remove_settings_dispatcher: Optional[CALLBACK_TYPE] = None
+        self._hue_update_remove: Optional[CALLBACK_TYPE] = None
+        self._hue_interval: Optional[int] = None
+        # 引擎直接持有的实体，按 entry_id 和角色查找
+        self._entities: Dict[str, Dict[str, Entity]] = {}
+        self.metrics = ThemeMetrics()
+        # 连续失败的条目按指数退避跳过，避免每次评估都记录错误
+        self.health = EntryHealth()
+        # 每次评估的结构化事件，取代逐条目的调试日志
+        self.tracer = TickTracer()
+
+    @property
+    def ref_count(self) -> int:
+        """使用引擎的配置条目数量."""
+        return len(self._entries)
+
+    @callback
+    def async_start(self) -> None:
+        """启动引擎."""
+        # 按日出日落时间安排主题更新，取代固定间隔的轮询
+        _LOGGER.info("正在启动消逝主题引擎")
+        SOLAR_CACHE.tables = self._tables.tables
+        self._remove_dispatcher = async_dispatcher_connect(
+            self.hass, SIGNAL_THEME_REFRESH, self._async_request_refresh
+        )
+        self._remove_settings_dispatcher = async_dispatcher_connect(
+            self.hass, SIGNAL_SETTINGS_UPDATED, self._async_settings_updated
+        )
+        self._start_unsub = async_at_started(self.hass, self._async_hass_started)
+
+    @callback
+    def _async_hass_started(self, _hass: HomeAssistant) -> None:
+        """Home Assistant 启动完成后启动调度器，并在后台执行第一次评估."""
+        self._start_unsub = None
+        self._started = True
+        _LOGGER.debug("Home Assistant 已启动，开始评估 %s 个条目", self.ref_count)
+        self._scheduler.async_start()
+        self.hass.async_create_background_task(
+            self._async_flush_refresh(), f"{DOMAIN}_initial_refresh"
+        )
+
+    @callback
+    def async_stop(self) -> None:
+        """停止引擎并取消所有定时任务."""
+        _LOGGER.info("正在停止消逝主题引擎")
+        if self._start_unsub:
+            self._start_unsub()
+            self._start_unsub = None
+        if self._remove_dispatcher:
+            self._remove_dispatcher()
+            self._remove_dispatcher = None
+        if self._remove_settings_dispatcher:
+            self._remove_settings_dispatcher()
+            self._remove_settings_dispatcher = None
+        self._refresh_debouncer.async_cancel()
+        self._scheduler.async_stop()
+        self._async_stop_hue_timer()
+        self._entries.clear()
+        SOLAR_CACHE.tables = {}
+
+    async def async_register_entry(self, entry: ConfigEntry) -> None:
+        """注册配置条目.
+
+        不在加载路径上评估：该条目所用的位置源加入待评估集合，
+        启动期间等 Home Assistant 启动完成后统一评估，之后与相近的请求合并评估。
+        """
+        # 先加载保存的年表，重启后的第一次评估不需要计算日出日落
+        await self._tables.async_load()
+        entry_slot = self._index.async_add(entry)
+        self._entries[entry.entry_id] = entry_slot
+        _LOGGER.debug("注册条目 %s，当前条目数：%s", entry.entry_id, self.ref_count)
+
+        changed = self._async_update_solar_backend()
+        if self._started:
+            self._scheduler.async_rearm(force=changed)
+
+        if entry_slot.is_pad:
+            self._async_update_hue_timer()
+            self._pending_hue = True
+        if entry_slot.location_source_id and self._pending_sources is not None:
+            self._pending_sources.add(entry_slot.location_source_id)
+        if self._started:
+            self.hass.async_create_task(self._refresh_debouncer.async_call())
+
+    @callback
+    def async_unregister_entry(self, entry: ConfigEntry) -> None:
+        """注销配置条目."""
+        if self._entries.pop(entry.entry_id, None) is None:
+            return
+        _LOGGER.debug("注销条目 %s，当前条目数：%s", entry.entry_id, self.ref_count)
+        self.health.discard(entry.entry_id)
+        async_dispatcher_send(self.hass, f"{SIGNAL_THEME_CHANGED}_removed", entry.entry_id)
+
+        self._async_update_hue_timer()
+        if self._entries and self._started:
+            self._scheduler.async_rearm()
+
+    @callback
+    def async_update_entry(self, entry: ConfigEntry) -> None:
+        """条目的数据或选项变化后更新运行中的引擎，不重新加载平台.
+
+        重新编译切换规则，通知该条目的实体，调整位置源事件和色相定时任务；
+        只有位置源或切换规则变化时才重新评估，且只评估该条目所用的位置源。
+        """
+        old_slot = self._entries.get(entry.entry_id)
+        if old_slot is None:
+            return
+        entry_slot = self._index.async_update(entry)
+        self._entries[entry.entry_id] = entry_slot
+        _LOGGER.debug("更新条目 %s 的配置", entry.entry_id)
+
+        for entity in self._entities.get(entry.entry_id, {}).values():
+            entity.async_entry_updated(entry_slot)
+
+        if self._started and entry_slot.location_source_id != old_slot.location_source_id:
+            self._scheduler.async_rearm()
+        if entry_slot.is_pad:
+            self._async_update_hue_timer()
+
+        if entry_slot == old_slot:
+            return
+        self.health.reset((entry.entry_id,))
+        if entry_slot.location_source_id and self._pending_sources is not None:
+            self._pending_sources.add(entry_slot.location_source_id)
+        if self._started:
+            self.hass.async_create_task(self._refresh_debouncer.async_call())
+
+    @callback
+    def _async_update_solar_backend(self) -> bool:
+        """使用集成设置中的日出日落计算实现，返回是否发生切换."""
+        return SOLAR_CACHE.set_backend(self._settings.solar_backend)
+
+    @callback
+    def _async_settings_updated(self, changed: Set[str]) -> None:
+        """集成设置变化后更新引擎，只有计算实现真正切换时才清空缓存并重新安排."""
+        if CONF_SOLAR_BACKEND not in changed:
+            return
+        if self._async_update_solar_backend() and self._started:
+            self._scheduler.async_rearm(force=True)
+
+    @callback
+    def async_add_entity(self, entry_id: str, role: str, entity: Entity) -> None:
+        """登记实体，引擎直接读取和更新它的状态."""
+        self._entities.setdefault(entry_id, {})[role] = entity
+        # 实体不完整导致的失败可能已经解决
+        self.health.reset((entry_id,))
+
+    @callback
+    def async_remove_entity(self, entry_id: str, role: str) -> None:
+        """移除实体."""
+        entities = self._entities.get(entry_id)
+        if entities is not None:
+            entities.pop(role, None)
+            if not entities:
+                del self._entities[entry_id]
+
+    def get_entity(self, entry_id: str, role: str) -> Optional[Entity]:
+        """按 entry_id 和角色查找实体."""
+        return self._entities.get(entry_id, {}).get(role)
+
+    @property
+    def entry_slots(self) -> List[ThemeEntrySlot]:
+        """已注册条目的槽位."""
+        return list(self._entries.values())
+
+    def get_entry_slot(self, entry_id: str) -> Optional[ThemeEntrySlot]:
+        """按 entry_id 查找已注册条目的槽位."""
+        return self._entries.get(entry_id)
+
+    @property
+    def suppressed_writes(self) -> int:
+        """写入预算合并掉的状态写入次数."""
+        return sum(
+            entity.suppressed_writes
+            for entities in self._entities.values()
+            for entity in entities.values()
+        )
+
+    @callback
+    def async_snapshot(self, entry_ids: Optional[Set[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """所有（或指定）条目的主题状态快照."""
+        snapshot: Dict[str, Dict[str, Any]] = {}
+        for entry_id, entry_slot in self._entries.items():
+            if entry_ids is not None and entry_id not in entry_ids:
+                continue
+            snapshot[entry_id] = {
+                "type": entry_slot.integration_type,
+                "slot": entry_slot.slot,
+                "location_source_id": entry_slot.location_source_id,
+                "values": {
+                    role: entity.theme_value
+                    for role, entity in self._entities.get(entry_id, {}).items()
+                },
+            }
+        return snapshot
+
+    @callback
+    def async_get_metrics(self) -> Dict[str, Any]:
+        """运行指标，供诊断信息和诊断传感器使用."""
+        solar_cache = SOLAR_CACHE.stats
+        return {
+            **self.metrics.as_dict(),
+            "suppressed_writes": self.suppressed_writes,
+            "solar_computations": solar_cache["misses"],
+            "solar_cache": solar_cache,
+            "solar_tables": len(self._tables.tables),
+            "failing_entries": self.health.failing,
+            "backoff_skipped": self.health.skipped,
+            "trace_events": self.tracer.recorded,
+            "entries": self.ref_count,
+            "location_sources": len(self._async_location_sources()),
+        }
+
+    @callback
+    def _async_location_sources(self) -> Set[str]:
+        """已注册条目使用的位置源."""
+        return {
+            entry_slot.location_source_id
+            for entry_slot in self._entries.values()
+            if entry_slot.location_source_id
+        }
+
+    def _location_move_threshold(self, source_id: str) -> float:
+        """位置源的移动阈值（米），取使用它的条目中最小的设置."""
+        thresholds = [
+            entry.options.get(CONF_LOCATION_MOVE_THRESHOLD, DEFAULT_LOCATION_MOVE_THRESHOLD_METERS)
+            for entry in (
+                self.hass.config_entries.async_get_entry(entry_id)
+                for entry_id in self._index.entry_ids_for_sources((source_id,))
+                if entry_id in self._entries
+            )
+            if entry is not None
+        ]
+        return min(thresholds, default=DEFAULT_LOCATION_MOVE_THRESHOLD_METERS)
+
+    def get_location(self, source_id: str) -> Tuple[Optional[float], Optional[float]]:
+        """位置源当前使用的坐标."""
+        return self._scheduler.get_location(source_id)
+
+    @callback
+    def _async_update_hue_timer(self) -> None:
+        """按平板主题的色相模式注册、调整或移除色相更新定时任务.
+
+        所有平板主题共用一个对齐整分钟的定时任务；全部平板主题都使用时钟色相时，
+        色相由时间直接算出，只在写入间隔的整数倍分钟触发。
+        """
+        pad_slots = [entry_slot for entry_slot in self._entries.values() if entry_slot.is_pad]
+        if not pad_slots:
+            self._async_stop_hue_timer()
+            return
+
+        interval = HUE_CLOCK_WRITE_INTERVAL_MINUTES
+        for pad_slot in pad_slots:
+            entry = self.hass.config_entries.async_get_entry(pad_slot.entry_id)
+            if entry is None or entry.options.get(CONF_HUE_MODE) != HUE_MODE_CLOCK:
+                interval = HUE_UPDATE_INTERVAL_MINUTES
+                break
+        if self._hue_update_remove and interval == self._hue_interval:
+            return
+
+        self._async_stop_hue_timer()
+        _LOGGER.info("正在注册色相更新定时任务，间隔：%s 分钟", interval)
+        self._hue_interval = interval
+        self._hue_update_remove = async_track_time_change(
+            self.hass,
+            self.async_update_hue,
+            minute=f"/{interval}" if interval > 1 else None,
+            second=0,
+        )
+
+    @callback
+    def async_hue_switch_changed(self, entry_id: str) -> None:
+        """色相开关变化时启动或停止时钟色相，保持当前色相不跳变."""
+        pad_hue_switch = self.get_entity(entry_id, ROLE_HUE_SWITCH)
+        pad_hue_number = self.get_entity(entry_id, ROLE_HUE_NUMBER)
+        if pad_hue_switch is None or pad_hue_number is None:
+            return
+        if not pad_hue_number.hue_clock_enabled:
+            return
+        if pad_hue_switch.is_on:
+            pad_hue_number.async_start_clock()
+        else:
+            pad_hue_number.async_stop_clock()
+
+    @callback
+    def _async_stop_hue_timer(self) -> None:
+        """移除色相更新定时任务."""
+        if self._hue_update_remove:
+            _LOGGER.info("移除色相更新定时任务")
+            self._hue_update_remove()
+            self._hue_update_remove = None
+
+    @callback
+    def _async_request_refresh(self, entry_id: str) -> None:
+        """用户修改条目后，请求一次合并后的主题更新.
+
+        只评估该条目所用的位置源，与相近的请求合并；失败的条目立即重试。
+        """
+        entry_slot = self._entries.get(entry_id)
+        if entry_slot is None:
+            return
+        self.health.reset((entry_id,))
+        if entry_slot.location_source_id and self._pending_sources is not None:
+            self._pending_sources.add(entry_slot.location_source_id)
+        if self._started:
+            self.hass.async_create_task(self._refresh_debouncer.async_call())
+
+    async def _async_flush_refresh(self) -> None:
+        """评估所有待评估的位置源，以及待更新的色相."""
+        sources, self._pending_sources = self._pending_sources, set()
+        update_hue, self._pending_hue = self._pending_hue, False
+        if sources is None or sources:
+            await self.async_refresh(sources)
+        if update_hue:
+            await self.async_update_hue()
+
+    async def async_refresh(
+        self, location_source_ids: Optional[Set[str]] = None, retry: bool = False
+    ) -> int:
+        """更新主题逻辑，返回写入的实体数.
+
+        指定 location_source_ids 时只处理使用这些位置源的条目。
+        retry 为 True 时取消这些条目的失败退避。
+        """
+        start = time.perf_counter()
         try:
-            if now:
-                _LOGGER.debug("开始执行主题更新逻辑，时间：%s", now)
+            if location_source_ids is None:
+                entry_slots = list(self._entries.values())
             else:
-                _LOGGER.debug("开始执行主题更新逻辑，时间未提供")
-                
-            # 处理平板主题逻辑
-            await update_pad_theme_logic(hass)
-            
-            # 处理手机主题逻辑
-            await update_phone_theme_logic(hass)
-            
-            _LOGGER.debug("主题更新定时任务执行完成，时间：%s", now)
+                entry_slots = self._index.slots(
+                    entry_id
+                    for entry_id in self._index.entry_ids_for_sources(location_source_ids)
+                    if entry_id in self._entries
+                )
+            if retry:
+                self.health.reset(entry_slot.entry_id for entry_slot in entry_slots)
+
+            # 先计算所有变更，再一次性写入
+            changes = compute_pad_theme_changes(
+                self, [entry_slot for entry_slot in entry_slots if entry_slot.is_pad]
+            )
+            changes.extend(
+                compute_phone_theme_changes(
+                    self, [entry_slot for entry_slot in entry_slots if entry_slot.is_phone]
+                )
+            )
+            touched = self.async_apply_changes(changes)
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.metrics.record_tick(duration_ms, len(entry_slots))
+            self.tracer.record(
+                None,
+                KIND_SWEEP,
+                {
+                    "sources": sorted(location_source_ids) if location_source_ids is not None else None,
+                    "entries": len(entry_slots),
+                },
+                DECISION_SWITCH if touched else DECISION_KEEP,
+                touched,
+                duration_ms,
+            )
+            return touched
+        except Exception as e:
+            self.metrics.record_error(e)
+            _LOGGER.error("主题更新执行出错: %s", e)
+            return 0
+
+    @callback
+    def async_apply_changes(self, changes: List[ThemeChange]) -> int:
+        """在同一次事件循环中批量写入变更，返回实际写入的实体数.
+
+        同一实体的多个变更只保留最后一个，值没有变化的实体不写入。
+        """
+        pending: Dict[Tuple[str, str], ThemeChange] = {}
+        for change in changes:
+            pending[(change.entry_id, change.role)] = change
+
+        touched = 0
+        for change in pending.values():
+            entity = self.get_entity(change.entry_id, change.role)
+            if entity is None or entity.theme_value == change.value:
+                continue
+            entity.async_push_value(change.value)
+            touched += 1
+        self.metrics.record_writes(touched, len(pending) - touched)
+        return touched
+
+    @callback
+    def async_set_values(self, changes: List[ThemeChange]) -> List[ThemeChange]:
+        """批量设置用户指定的值，返回实际写入的变更.
+
+        与 async_apply_changes 不同，写入不受写入预算限制，效果与逐个调用实体的服务相同。
+        """
+        applied = []
+        for change in changes:
+            entity = self.get_entity(change.entry_id, change.role)
+            if entity is None or entity.theme_value == change.value:
+                continue
+            entity.async_set_theme_value(change.value)
+            applied.append(change)
+        self.metrics.record_writes(len(applied), len(changes) - len(applied))
+        return applied
+
+    async def async_update_hue(self, now: Optional[datetime.datetime] = None) -> None:
+        """更新所有平板主题的色相.
+
+        所有平板主题在同一次定时任务中计算，变更一次性写入。
+        时钟色相的平板主题只在写入间隔的整数倍分钟写入，now 为空时立即写入。
+        """
+        try:
+            pad_slots = [entry_slot for entry_slot in self._entries.values() if entry_slot.is_pad]
+            if not pad_slots:
+                return
+            self.metrics.hue_ticks += 1
+
+            timestamp = dt_util.utcnow().timestamp()
+            # 定时任务只在写入间隔触发时，每次触发都写入时钟色相
+            clock_due = (
+                now is None
+                or self._hue_interval == HUE_CLOCK_WRITE_INTERVAL_MINUTES
+                or now.minute % HUE_CLOCK_WRITE_INTERVAL_MINUTES == 0
+            )
+            changes: List[ThemeChange] = []
+            for pad_slot in pad_slots:
+                change = self._evaluate_hue(pad_slot, timestamp, clock_due)
+                if change is not None:
+                    changes.append(change)
+            self.async_apply_changes(changes)
         except Exception as e:
-            _LOGGER.error("主题更新定时任务执行出错: %s", e)
-    
-    # 注册色相更新定时任务 - 每1分钟执行一次
-    async def update_hue_logic(now=None) -> None:
-        """更新色相逻辑."""
+            self.metrics.record_error(e)
+            _LOGGER.error("色相更新定时任务执行出错: %s", e)
+
+    @callback
+    def _evaluate_hue(
+        self, pad_slot: ThemeEntrySlot, timestamp: float, clock_due: bool
+    ) -> Optional[ThemeChange]:
+        """计算单个平板主题的下一个色相，出错不影响其他平板主题."""
+        entry_id = pad_slot.entry_id
+        if self.health.should_skip(entry_id, TASK_HUE):
+            self.tracer.record(entry_id, KIND_HUE, None, DECISION_BACKOFF)
+            return None
+
+        start = time.perf_counter()
         try:
-            if now:
-                _LOGGER.debug("开始执行色相更新逻辑，时间：%s", now)
-            else:
-                _LOGGER.debug("开始执行色相更新逻辑，时间未提供")
-                
             # 获取平板主题实体
-            pad_hue_switch = hass.states.get(SWITCH_THEME_PAD_HUE)
-            pad_hue_number = hass.states.get(NUMBER_THEME_PAD_HUE)
-            
+            pad_hue_switch = self.get_entity(entry_id, ROLE_HUE_SWITCH)
+            pad_hue_number = self.get_entity(entry_id, ROLE_HUE_NUMBER)
+
             if not all([pad_hue_switch, pad_hue_number]):
-                _LOGGER.warning("平板主题色相实体不完整")
-                return
-                
-            _LOGGER.debug("平板主题色相开关状态: %s, 当前色相: %s", 
-                         pad_hue_switch.state, pad_hue_number.state)
-                
+                self.health.record_failure(entry_id, "平板主题色相实体不完整", TASK_HUE)
+                self.tracer.record(entry_id, KIND_HUE, None, DECISION_INCOMPLETE)
+                return None
+
+            inputs = {"enabled": pad_hue_switch.is_on, "hue": pad_hue_number.native_value}
+            new_hue = None
+            decision = DECISION_DISABLED
             # 处理逻辑3和逻辑4：色相自动变化
-            if pad_hue_switch.state == "on":
-                current_hue = int(float(pad_hue_number.state))
-                new_hue = current_hue + 1
-                if new_hue > 360:
-                    new_hue = 1
-                
-                _LOGGER.debug("更新平板主题色相: %s -> %s", current_hue, new_hue)
-                
-                await hass.services.async_call(
-                    "number", "set_value",
-                    {"entity_id": NUMBER_THEME_PAD_HUE, "value": new_hue},
-                )
-                _LOGGER.debug("平板主题色相已更新为 %s，时间：%s", new_hue, now)
-            else:
-                _LOGGER.debug("平板主题色相开关已关闭，不执行更新")
-            
-            _LOGGER.debug("色相更新定时任务执行完成，时间：%s", now)
+            if pad_hue_switch.is_on:
+                if pad_hue_number.hue_clock_enabled:
+                    # 时钟色相：按时间直接计算，不依赖上一次的值
+                    if not pad_hue_number.hue_clock_running:
+                        pad_hue_number.async_start_clock()
+                    if clock_due:
+                        new_hue = pad_hue_number.clock_hue(timestamp)
+                else:
+                    new_hue = int(pad_hue_number.native_value) + 1
+                    if new_hue > 360:
+                        new_hue = 1
+                decision = DECISION_SWITCH if new_hue is not None else DECISION_KEEP
+
+            self.health.record_success(entry_id, TASK_HUE)
+            self.tracer.record(
+                entry_id,
+                KIND_HUE,
+                inputs,
+                decision,
+                new_hue,
+                (time.perf_counter() - start) * 1000,
+            )
+            return ThemeChange(entry_id, ROLE_HUE_NUMBER, new_hue) if new_hue is not None else None
         except Exception as e:
-            _LOGGER.error("色相更新定时任务执行出错: %s", e)
-    
-    # 使用 async_track_time_interval 注册定时任务
-    _LOGGER.info("正在注册主题更新定时任务，间隔：%s 分钟", UPDATE_INTERVAL_MINUTES)
-    update_interval = timedelta(minutes=UPDATE_INTERVAL_MINUTES)
-    
-    # 包装回调函数，确保时间参数正确传递
-    async def theme_callback(now):
-        _LOGGER.debug("主题更新定时任务被触发，时间：%s", now)
-        await update_theme_logic(now)
-    
-    hass.data[DOMAIN]["update_remove"] = async_track_time_interval(
-        hass, theme_callback, update_interval
-    )
-    
-    _LOGGER.info("正在注册色相更新定时任务，间隔：%s 分钟", HUE_UPDATE_INTERVAL_MINUTES)
-    hue_update_interval = timedelta(minutes=HUE_UPDATE_INTERVAL_MINUTES)
-    
-    # 包装回调函数，确保时间参数正确传递
-    async def hue_callback(now):
-        _LOGGER.debug("色相更新定时任务被触发，时间：%s", now)
-        await update_hue_logic(now)
-    
-    hass.data[DOMAIN]["hue_update_remove"] = async_track_time_interval(
-        hass, hue_callback, hue_update_interval
-    )
-    
-    # 初始执行一次
-    _LOGGER.info("初始执行主题更新和色相更新")
-    now = datetime.datetime.now()
-    _LOGGER.debug("初始执行时间：%s", now)
-    await update_theme_logic(now)
-    await update_hue_logic(now)
+            self.metrics.record_error(e)
+            self.health.record_failure(entry_id, f"色相更新出错: {e}", TASK_HUE)
+            self.tracer.record(entry_id, KIND_HUE, None, DECISION_ERROR, str(e))
+            return None
+
+
+# 评估模式切换需要的实体
+_PAD_ROLES = (ROLE_MODE_SWITCH, ROLE_MODE_SELECT, ROLE_HUE_SWITCH, ROLE_HUE_NUMBER)
+_PHONE_ROLES = (ROLE_MODE_SWITCH, ROLE_MODE_NUMBER)
+
 
+def _evaluate_entry(
+    engine: XiaoshiThemeEngine,
+    entry_slot: ThemeEntrySlot,
+    label: str,
+    mode_role: str,
+    required_roles: Tuple[str, ...],
+    location: Tuple[Optional[float], Optional[float]],
+) -> Optional[ThemeChange]:
+    """评估单个条目的模式切换.
 
-async def update_pad_theme_logic(hass: HomeAssistant) -> None:
-    """更新平板主题逻辑."""
+    结果记录在条目的失败跟踪和追踪缓冲区中，出错不影响其他条目。
+    """
+    start = time.perf_counter()
+    entry_id = entry_slot.entry_id
+    inputs: Optional[Dict[str, Any]] = None
+    change: Optional[ThemeChange] = None
     try:
-        _LOGGER.debug("开始执行平板主题更新逻辑")
-        
-        # 查找平板主题配置
-        pad_entry = None
-        for entry in hass.config_entries.async_entries(DOMAIN):
-            if entry.data.get(CONF_INTEGRATION_TYPE) == INTEGRATION_TYPE_PAD:
-                pad_entry = entry
-                break
-        
-        if not pad_entry:
-            _LOGGER.debug("未找到平板主题配置")
-            return
-        
-        # 获取平板主题实体
-        pad_mode_switch = hass.states.get(SWITCH_THEME_PAD_MODE)
-        pad_mode_select = hass.states.get(SELECT_THEME_PAD_MODE)
-        pad_hue_switch = hass.states.get(SWITCH_THEME_PAD_HUE)
-        pad_hue_number = hass.states.get(NUMBER_THEME_PAD_HUE)
-        
-        if not all([pad_mode_switch, pad_mode_select, pad_hue_switch, pad_hue_number]):
-            _LOGGER.error("平板主题实体不完整")
-            return
-        
-        _LOGGER.debug("平板主题模式开关状态: %s, 当前模式: %s", 
-                     pad_mode_switch.state, pad_mode_select.state)
-        
-        # 处理逻辑1和逻辑2：根据白天黑夜切换模式
-        if pad_mode_switch.state == "on":
-            location_source_id = pad_entry.data.get(CONF_LOCATION_SOURCE_ID)
-            _LOGGER.debug("使用位置源: %s", location_source_id)
-            
-            latitude, longitude = get_location_from_entity(hass, location_source_id)
-            
-            if latitude is not None and longitude is not None:
-                _LOGGER.debug("获取到位置: 纬度 %s, 经度 %s", latitude, longitude)
-                is_day = is_daytime(hass, latitude, longitude)
-                _LOGGER.debug("当前是%s", "白天" if is_day else "黑夜")
-                
-                # 设置模式
-                if is_day and pad_mode_select.state != PAD_MODE_COLOR:
-                    await hass.services.async_call(
-                        "select", "select_option",
-                        {"entity_id": SELECT_THEME_PAD_MODE, "option": PAD_MODE_COLOR},
-                    )
-                    _LOGGER.info("平板主题模式已切换为彩平图（白天模式）")
-                elif not is_day and pad_mode_select.state != PAD_MODE_BLACK:
-                    await hass.services.async_call(
-                        "select", "select_option",
-                        {"entity_id": SELECT_THEME_PAD_MODE, "option": PAD_MODE_BLACK},
+        entities = {role: engine.get_entity(entry_id, role) for role in required_roles}
+        if not all(entities.values()):
+            engine.health.record_failure(entry_id, f"{label}实体不完整")
+            decision = DECISION_INCOMPLETE
+        elif not entities[ROLE_MODE_SWITCH].is_on:
+            # 模式开关已关闭，不执行切换
+            engine.health.record_success(entry_id)
+            decision = DECISION_DISABLED
+        else:
+            latitude, longitude = location
+            inputs = {
+                "source": entry_slot.location_source_id,
+                "latitude": latitude,
+                "longitude": longitude,
+            }
+            if latitude is None or longitude is None:
+                engine.health.record_failure(
+                    entry_id, f"{label}无法获取位置源 {entry_slot.location_source_id} 的位置信息"
+                )
+                decision = DECISION_NO_LOCATION
+            else:
+                current = entities[mode_role].theme_value
+                if entry_slot.is_phone:
+                    current = int(current)
+                is_day = is_daytime(engine.hass, latitude, longitude)
+                inputs["mode"] = current
+                inputs["is_day"] = is_day
+
+                # 按切换规则查表得到目标模式
+                new_mode = entry_slot.transitions.target(current, is_day)
+                engine.health.record_success(entry_id)
+                if new_mode != current:
+                    change = ThemeChange(entry_id, mode_role, new_mode)
+                    decision = DECISION_SWITCH
+                    _LOGGER.info(
+                        "%s模式将切换为 %s（%s模式）", label, new_mode, "白天" if is_day else "黑夜"
                     )
-                    _LOGGER.info("平板主题模式已切换为黑平图（黑夜模式）")
                 else:
-                    _LOGGER.debug("平板主题模式无需切换")
-            else:
-                _LOGGER.warning("无法获取位置信息")
-        else:
-            _LOGGER.debug("平板主题模式开关已关闭，不执行切换")
-        
-        _LOGGER.debug("平板主题更新逻辑执行完成")
+                    decision = DECISION_KEEP
     except Exception as e:
-        _LOGGER.error("平板主题更新逻辑执行出错: %s", e)
+        engine.metrics.record_error(e)
+        engine.health.record_failure(entry_id, f"{label}更新逻辑执行出错: {e}")
+        decision = DECISION_ERROR
+
+    engine.tracer.record(
+        entry_id,
+        KIND_MODE,
+        inputs,
+        decision,
+        change.value if change is not None else None,
+        (time.perf_counter() - start) * 1000,
+    )
+    return change
+
+
+def _compute_mode_changes(
+    engine: XiaoshiThemeEngine,
+    entry_slots: List[ThemeEntrySlot],
+    label: str,
+    mode_role: str,
+    required_roles: Tuple[str, ...],
+) -> List[ThemeChange]:
+    """计算一组同类条目的模式变更.
 
+    失败的条目按退避跳过；每个位置源只读取一次位置，并批量计算所有位置的日出日落时间。
+    """
+    changes: List[ThemeChange] = []
+
+    pending = []
+    for entry_slot in entry_slots:
+        if engine.health.should_skip(entry_slot.entry_id):
+            engine.tracer.record(entry_slot.entry_id, KIND_MODE, None, DECISION_BACKOFF)
+        else:
+            pending.append(entry_slot)
+    if not pending:
+        return changes
+
+    locations = {}
+    for entry_slot in pending:
+        location_source_id = entry_slot.location_source_id
+        if location_source_id not in locations:
+            locations[location_source_id] = engine.get_location(location_source_id)
 
-async def update_phone_theme_logic(hass: HomeAssistant) -> None:
-    """更新手机主题逻辑."""
     try:
-        _LOGGER.debug("开始执行手机主题更新逻辑")
-        
-        # 查找所有手机主题配置
-        phone_entries = []
-        for entry in hass.config_entries.async_entries(DOMAIN):
-            if entry.data.get(CONF_INTEGRATION_TYPE) == INTEGRATION_TYPE_PHONE:
-                phone_entries.append(entry)
-        
-        if not phone_entries:
-            _LOGGER.debug("未找到手机主题配置")
-            return
-        
-        _LOGGER.debug("找到 %s 个手机主题配置", len(phone_entries))
-        
-        # 处理每个手机主题
-        for i, entry in enumerate(phone_entries, 1):
-            mode_switch_id = f"{SWITCH_THEME_PHONE_MODE_PREFIX}{i}"
-            mode_number_id = f"{NUMBER_THEME_PHONE_MODE_PREFIX}{i}"
-            
-            _LOGGER.debug("处理手机主题 %s: 开关=%s, 数值=%s", 
-                         i, mode_switch_id, mode_number_id)
-            
-            mode_switch = hass.states.get(mode_switch_id)
-            mode_number = hass.states.get(mode_number_id)
-            
-            if not mode_switch or not mode_number:
-                continue
-                
-            _LOGGER.debug("手机主题 %s 开关状态: %s, 当前模式: %s", 
-                         i, mode_switch.state, mode_number.state)
-        
-            # 处理逻辑1、2和3：根据白天黑夜切换模式
-            if mode_switch.state == "on":
-                location_source_id = entry.data.get(CONF_LOCATION_SOURCE_ID)
-                _LOGGER.debug("手机主题 %s 使用位置源: %s", i, location_source_id)
-                
-                latitude, longitude = get_location_from_entity(hass, location_source_id)
-                
-                if latitude is not None and longitude is not None:
-                    _LOGGER.debug("手机主题 %s 获取到位置: 纬度 %s, 经度 %s", i, latitude, longitude)
-                    is_day = is_daytime(hass, latitude, longitude)
-                    _LOGGER.debug("手机主题 %s 当前是%s", i, "白天" if is_day else "黑夜")
-                    
-                    current_mode = int(float(mode_number.state))
-                    _LOGGER.debug("手机主题 %s 当前模式: %s", i, current_mode)
-                    
-                    # 白天模式处理 - 逻辑1
-                    if is_day:
-                        # 白天时如果是偶数模式，转换为奇数模式
-                        if current_mode == 2:
-                            new_mode = 1
-                            await hass.services.async_call(
-                                "number", "set_value",
-                                {"entity_id": mode_number_id, "value": new_mode},
-                            )
-                            _LOGGER.info("手机主题 %s 模式已切换为 %s（白天模式）", i, new_mode)
-                        elif current_mode == 4:
-                            new_mode = 3
-                            await hass.services.async_call(
-                                "number", "set_value",
-                                {"entity_id": mode_number_id, "value": new_mode},
-                            )
-                            _LOGGER.info("手机主题 %s 模式已切换为 %s（白天模式）", i, new_mode)
-                        elif current_mode == 6:
-                            new_mode = 5
-                            await hass.services.async_call(
-                                "number", "set_value",
-                                {"entity_id": mode_number_id, "value": new_mode},
-                            )
-                            _LOGGER.info("手机主题 %s 模式已切换为 %s（白天模式）", i, new_mode)
-                        elif current_mode == 8:
-                            new_mode = 7
-                            await hass.services.async_call(
-                                "number", "set_value",
-                                {"entity_id": mode_number_id, "value": new_mode},
-                            )
-                            _LOGGER.info("手机主题 %s 模式已切换为 %s（白天模式）", i, new_mode)
-                        else:
-                            _LOGGER.debug("手机主题 %s 当前为奇数模式 %s，白天无需切换", i, current_mode)
-                    # 黑夜模式处理 - 逻辑2
-                    else:
-                        # 黑夜时如果是奇数模式，转换为偶数模式
-                        if current_mode == 1:
-                            new_mode = 2
-                            await hass.services.async_call(
-                                "number", "set_value",
-                                {"entity_id": mode_number_id, "value": new_mode},
-                            )
-                            _LOGGER.info("手机主题 %s 模式已切换为 %s（黑夜模式）", i, new_mode)
-                        elif current_mode == 3:
-                            new_mode = 4
-                            await hass.services.async_call(
-                                "number", "set_value",
-                                {"entity_id": mode_number_id, "value": new_mode},
-                            )
-                            _LOGGER.info("手机主题 %s 模式已切换为 %s（黑夜模式）", i, new_mode)
-                        elif current_mode == 5:
-                            new_mode = 6
-                            await hass.services.async_call(
-                                "number", "set_value",
-                                {"entity_id": mode_number_id, "value": new_mode},
-                            )
-                            _LOGGER.info("手机主题 %s 模式已切换为 %s（黑夜模式）", i, new_mode)
-                        elif current_mode == 7:
-                            new_mode = 8
-                            await hass.services.async_call(
-                                "number", "set_value",
-                                {"entity_id": mode_number_id, "value": new_mode},
-                            )
-                            _LOGGER.info("手机主题 %s 模式已切换为 %s（黑夜模式）", i, new_mode)
-                        else:
-                            _LOGGER.debug("手机主题 %s 当前为偶数模式 %s，黑夜无需切换", i, current_mode)
-                else:
-                    _LOGGER.warning("手机主题 %s 无法获取位置信息", i)
-            else:
-                _LOGGER.debug("手机主题 %s 模式开关已关闭，不执行切换", i)
-        
-        _LOGGER.debug("手机主题更新逻辑执行完成")
+        SOLAR_CACHE.prefetch(
+            (
+                location
+                for location in locations.values()
+                if location[0] is not None and location[1] is not None
+            ),
+            dt_util.utcnow().timestamp(),
+        )
     except Exception as e:
-        _LOGGER.error("手机主题更新逻辑执行出错: %s", e)
+        # 预取失败时由 is_daytime 逐个计算
+        engine.metrics.record_error(e)
+        _LOGGER.debug("批量计算日出日落时间出错: %s", e)
+
+    for entry_slot in pending:
+        change = _evaluate_entry(
+            engine,
+            entry_slot,
+            f"{label} {entry_slot.slot} ",
+            mode_role,
+            required_roles,
+            locations[entry_slot.location_source_id],
+        )
+        if change is not None:
+            changes.append(change)
+    return changes
+
+
+@callback
+def compute_pad_theme_changes(
+    engine: XiaoshiThemeEngine, pad_slots: List[ThemeEntrySlot]
+) -> List[ThemeChange]:
+    """计算平板主题需要的变更，不修改任何实体.
+
+    每个平板主题单独处理，一个条目失败不影响其他条目，失败的条目按退避跳过。
+    """
+    return _compute_mode_changes(engine, pad_slots, "平板主题", ROLE_MODE_SELECT, _PAD_ROLES)
+
+
+@callback
+def compute_phone_theme_changes(
+    engine: XiaoshiThemeEngine, phone_slots: List[ThemeEntrySlot]
+) -> List[ThemeChange]:
+    """计算手机主题需要的变更，不修改任何实体.
+
+    每个条目单独处理，一个条目失败不影响其他条目，失败的条目按退避跳过。
+    """
+    return _compute_mode_changes(engine, phone_slots, "手机主题", ROLE_MODE_NUMBER, _PHONE_ROLES)
@@ -0,0 +1,43 @@
+"""消逝主题诊断信息."""
+from dataclasses import fields
+from typing import Any, Dict, Optional
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, DATA_ENGINE, DATA_INDEX, DATA_SETTINGS
+from .index import ThemeEntrySlot
+
+
+def _slot_as_dict(entry_slot: Optional[ThemeEntrySlot]) -> Optional[Dict[str, Any]]:
+    """槽位的诊断信息，模式切换规则导出为编译后的规则."""
+    if entry_slot is None:
+        return None
+    data = {field.name: getattr(entry_slot, field.name) for field in fields(entry_slot)}
+    if entry_slot.transitions is not None:
+        data["transitions"] = entry_slot.transitions.as_dict()
+    return data
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> Dict[str, Any]:
+    """返回配置条目的诊断信息，包括引擎的运行指标."""
+    domain_data = hass.data.get(DOMAIN, {})
+    index = domain_data.get(DATA_INDEX)
+    engine = domain_data.get(DATA_ENGINE)
+    settings = domain_data.get(DATA_SETTINGS)
+    entry_slot = index.get(entry.entry_id) if index is not None else None
+
+    return {
+        "entry": {
+            "title": entry.title,
+            "data": dict(entry.data),
+            "options": dict(entry.options),
+        },
+        "settings": settings.as_dict() if settings is not None else None,
+        "slot": _slot_as_dict(entry_slot),
+        "failures": engine.health.get(entry.entry_id) if engine is not None else None,
+        "metrics": engine.async_get_metrics() if engine is not None else None,
+        "trace": engine.tracer.events(entry.entry_id) if engine is not None else None,
+    }
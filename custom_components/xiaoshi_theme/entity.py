@@ -0,0 +1,124 @@
+"""消逝主题实体基类."""
+import time
+from abc import abstractmethod
+from typing import Any, Optional
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_call_later
+
+from .const import DOMAIN, DATA_ENGINE, SIGNAL_THEME_CHANGED, SIGNAL_THEME_ENTRY_CHANGED
+from .index import ThemeEntrySlot
+
+
+class XiaoshiThemeEntity(Entity):
+    """消逝主题实体基类.
+
+    实体加入时向共享引擎登记，引擎直接读取实体状态并推送新值，
+    不经过 hass.states 查询和服务调用。
+    引擎推送的写入受最小写入间隔限制，间隔内的中间值合并为一次延迟写入。
+    """
+
+    _theme_role: str
+    config_entry: ConfigEntry
+
+    # 最小写入间隔（秒），0 表示不限制
+    _min_write_interval: float = 0
+    _last_write: float = 0.0
+    _pending_write_unsub: Optional[CALLBACK_TYPE] = None
+    suppressed_writes: int = 0
+
+    @property
+    def theme_value(self) -> Any:
+        """引擎比较和写入的当前值."""
+        return None
+
+    @property
+    def min_write_interval(self) -> float:
+        """最小写入间隔（秒）."""
+        return self._min_write_interval
+
+    async def async_added_to_hass(self) -> None:
+        """当实体被添加到 HA 时向引擎登记."""
+        await super().async_added_to_hass()
+        engine = self.hass.data[DOMAIN].get(DATA_ENGINE)
+        if engine is not None:
+            engine.async_add_entity(self.config_entry.entry_id, self._theme_role, self)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """当实体被移除时从引擎注销."""
+        self._async_cancel_pending_write()
+        engine = self.hass.data[DOMAIN].get(DATA_ENGINE)
+        if engine is not None:
+            engine.async_remove_entity(self.config_entry.entry_id, self._theme_role)
+        await super().async_will_remove_from_hass()
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """写入状态，并通知 websocket 订阅者.
+
+        每次写入都带上最新值，因此取消尚未执行的延迟写入并记为最近一次写入，
+        用户直接设置的值也计入写入预算。
+        """
+        self._async_cancel_pending_write()
+        self._last_write = time.monotonic()
+        super().async_write_ha_state()
+        async_dispatcher_send(
+            self.hass,
+            SIGNAL_THEME_CHANGED,
+            self.config_entry.entry_id,
+            self._theme_role,
+            self.theme_value,
+        )
+        # 同一条目的其他实体只订阅本条目的信号，不接收其他条目的变化
+        async_dispatcher_send(
+            self.hass,
+            SIGNAL_THEME_ENTRY_CHANGED.format(self.config_entry.entry_id),
+            self._theme_role,
+            self.theme_value,
+        )
+
+    @abstractmethod
+    @callback
+    def async_set_theme_value(self, value: Any) -> None:
+        """设置用户指定的新值并立即写入，不受写入预算限制，也不请求重新评估."""
+
+    @callback
+    def async_entry_updated(self, entry_slot: ThemeEntrySlot) -> None:
+        """条目的选项变化后更新实体，不重新创建实体."""
+
+    @callback
+    def async_write_theme_state(self) -> None:
+        """按写入预算写入状态.
+
+        距上次写入不足最小间隔时推迟到间隔结束再写入，期间的多次写入只保留最新值。
+        """
+        interval = self.min_write_interval
+        now = time.monotonic()
+        if interval <= 0 or now - self._last_write >= interval:
+            self.async_write_ha_state()
+            return
+
+        # 推迟或并入已有的延迟写入，都算作一次被合并的写入
+        self.suppressed_writes += 1
+        if self._pending_write_unsub is not None:
+            # 已有延迟写入，本次的值会随它一起写入
+            return
+        self._pending_write_unsub = async_call_later(
+            self.hass, self._last_write + interval - now, self._async_flush_write
+        )
+
+    @callback
+    def _async_flush_write(self, _now: Any) -> None:
+        """执行延迟写入."""
+        self._pending_write_unsub = None
+        self.async_write_ha_state()
+
+    @callback
+    def _async_cancel_pending_write(self) -> None:
+        """取消延迟写入."""
+        if self._pending_write_unsub is not None:
+            self._pending_write_unsub()
+            self._pending_write_unsub = None
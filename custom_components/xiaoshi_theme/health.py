@@ -0,0 +1,103 @@
+"""消逝主题条目失败跟踪."""
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .const import FAILURE_BACKOFF_BASE_SECONDS, FAILURE_BACKOFF_MAX_SECONDS
+
+_LOGGER = logging.getLogger(__name__)
+
+# 失败按条目和任务区分：主题模式评估和色相更新互不影响
+TASK_MODE = "mode"
+TASK_HUE = "hue"
+
+FailureKey = Tuple[str, str]
+
+
+@dataclass
+class EntryFailure:
+    """条目某项任务的连续失败."""
+
+    reason: str
+    count: int
+    retry_at: float
+
+
+class EntryHealth:
+    """条目失败跟踪.
+
+    连续失败的条目按指数退避跳过评估，日志只在状态变化时记录一次：
+    开始失败或失败原因改变时记录警告，恢复时记录信息，重复的同一失败只记录调试日志。
+    """
+
+    def __init__(
+        self,
+        base_seconds: float = FAILURE_BACKOFF_BASE_SECONDS,
+        max_seconds: float = FAILURE_BACKOFF_MAX_SECONDS,
+    ) -> None:
+        """初始化失败跟踪."""
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self._failures: Dict[FailureKey, EntryFailure] = {}
+        self.skipped = 0
+
+    def should_skip(self, entry_id: str, task: str = TASK_MODE) -> bool:
+        """条目是否仍在退避中，跳过时计数."""
+        failure = self._failures.get((entry_id, task))
+        if failure is None or time.monotonic() >= failure.retry_at:
+            return False
+        self.skipped += 1
+        return True
+
+    def record_failure(self, entry_id: str, reason: str, task: str = TASK_MODE) -> None:
+        """记录一次失败并安排下一次重试."""
+        key = (entry_id, task)
+        failure = self._failures.get(key)
+        count = failure.count + 1 if failure is not None and failure.reason == reason else 1
+        delay = min(self.base_seconds * 2 ** (count - 1), self.max_seconds)
+        self._failures[key] = EntryFailure(reason, count, time.monotonic() + delay)
+
+        if count == 1:
+            _LOGGER.warning("条目 %s 更新失败: %s，%.0f 秒后重试", entry_id, reason, delay)
+        else:
+            _LOGGER.debug(
+                "条目 %s 连续第 %s 次更新失败: %s，%.0f 秒后重试", entry_id, count, reason, delay
+            )
+
+    def record_success(self, entry_id: str, task: str = TASK_MODE) -> None:
+        """记录一次成功，之前失败的条目记录恢复."""
+        failure = self._failures.pop((entry_id, task), None)
+        if failure is not None:
+            _LOGGER.info("条目 %s 已恢复，此前连续失败 %s 次", entry_id, failure.count)
+
+    def reset(self, entry_ids: Optional[Iterable[str]] = None) -> None:
+        """取消条目（默认全部）的退避，下一次评估立即重试，不清除失败记录."""
+        if entry_ids is not None:
+            entry_ids = set(entry_ids)
+        for (entry_id, _task), failure in self._failures.items():
+            if entry_ids is None or entry_id in entry_ids:
+                failure.retry_at = 0.0
+
+    def discard(self, entry_id: str) -> None:
+        """删除条目的失败记录."""
+        for key in [key for key in self._failures if key[0] == entry_id]:
+            del self._failures[key]
+
+    def get(self, entry_id: str) -> Dict[str, Dict[str, Any]]:
+        """条目各项任务的失败信息."""
+        now = time.monotonic()
+        return {
+            task: {
+                "reason": failure.reason,
+                "count": failure.count,
+                "retry_in": round(max(failure.retry_at - now, 0.0), 1),
+            }
+            for (failed_entry_id, task), failure in self._failures.items()
+            if failed_entry_id == entry_id
+        }
+
+    @property
+    def failing(self) -> int:
+        """正在失败的条目数."""
+        return len({entry_id for entry_id, _task in self._failures})
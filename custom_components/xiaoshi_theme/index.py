@@ -0,0 +1,248 @@
+"""消逝主题配置条目索引."""
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+
+from .const import (
+    DOMAIN,
+    CONF_INTEGRATION_TYPE,
+    CONF_LOCATION_SOURCE_ID,
+    CONF_PHONE_SLOT,
+    CONF_PAD_SLOT,
+    INTEGRATION_TYPE_PAD,
+    INTEGRATION_TYPE_PHONE,
+    SWITCH_THEME_PAD_FULL,
+    SWITCH_THEME_PAD_MODE,
+    SELECT_THEME_PAD_MODE,
+    SWITCH_THEME_PAD_HUE,
+    NUMBER_THEME_PAD_HUE,
+    SWITCH_THEME_PHONE_FULL_PREFIX,
+    SWITCH_THEME_PHONE_MODE_PREFIX,
+    NUMBER_THEME_PHONE_MODE_PREFIX,
+    CONF_TRANSITION_RULES,
+    DEFAULT_PAD_MODE_PAIRS,
+    DEFAULT_PHONE_MODE_PAIRS,
+)
+from .rules import TransitionTable, compile_transition_rules, pair_rules
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def pad_entity_id(entity_id: str, slot: int) -> str:
+    """平板主题槽位的实体 ID，第一个槽位沿用原来的实体 ID."""
+    return entity_id if slot == 1 else f"{entity_id}_{slot}"
+
+
+@dataclass
+class ThemeEntrySlot:
+    """配置条目对应的槽位和实体 ID."""
+
+    entry_id: str
+    integration_type: str
+    location_source_id: Optional[str]
+    slot: Optional[int]
+    full_switch_id: str
+    mode_switch_id: str
+    mode_select_id: Optional[str] = None
+    mode_number_id: Optional[str] = None
+    hue_switch_id: Optional[str] = None
+    hue_number_id: Optional[str] = None
+    transitions: Optional[TransitionTable] = None
+
+    @property
+    def is_pad(self) -> bool:
+        """是否为平板主题."""
+        return self.integration_type == INTEGRATION_TYPE_PAD
+
+    @property
+    def is_phone(self) -> bool:
+        """是否为手机主题."""
+        return self.integration_type == INTEGRATION_TYPE_PHONE
+
+
+def compile_entry_transitions(entry: ConfigEntry) -> TransitionTable:
+    """编译条目的模式切换规则，选项中的规则无效时使用默认规则."""
+    if entry.data.get(CONF_INTEGRATION_TYPE) == INTEGRATION_TYPE_PHONE:
+        defaults, coerce = DEFAULT_PHONE_MODE_PAIRS, int
+    else:
+        defaults, coerce = DEFAULT_PAD_MODE_PAIRS, str
+
+    rules = entry.options.get(CONF_TRANSITION_RULES)
+    if rules:
+        try:
+            return compile_transition_rules(rules, coerce)
+        except ValueError as e:
+            _LOGGER.error("条目 %s 的模式切换规则无效，使用默认规则: %s", entry.entry_id, e)
+    return compile_transition_rules(pair_rules(defaults), coerce)
+
+
+class ThemeEntryIndex:
+    """配置条目索引.
+
+    记录 entry_id 到槽位和实体 ID 的映射，条目添加和删除时增量更新，
+    评估和创建实体时只需常数时间查找，不依赖条目的遍历顺序。
+    手机主题和平板主题的槽位保存在条目数据中，重启后保持不变。
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """初始化索引."""
+        self.hass = hass
+        self._slots: Dict[str, ThemeEntrySlot] = {}
+        self._by_source: Dict[str, Set[str]] = {}
+        # 按主题类型记录已使用的槽位
+        self._used_slots: Dict[str, Set[int]] = {
+            INTEGRATION_TYPE_PAD: set(),
+            INTEGRATION_TYPE_PHONE: set(),
+        }
+
+    @callback
+    def async_load(self) -> None:
+        """从现有的配置条目建立索引.
+
+        先登记已保存或可从实体注册表恢复的槽位，再为其余条目分配空闲槽位，
+        避免新条目占用尚未加载的旧条目的实体 ID。
+        """
+        entries = self.hass.config_entries.async_entries(DOMAIN)
+        pending = []
+        for entry in entries:
+            slot = self._async_known_slot(entry)
+            if slot is not None:
+                self._async_index(entry, slot)
+            else:
+                pending.append(entry)
+        for entry in pending:
+            self.async_add(entry)
+
+    @callback
+    def async_add(self, entry: ConfigEntry) -> ThemeEntrySlot:
+        """添加配置条目，返回其槽位."""
+        if entry.entry_id in self._slots:
+            return self._slots[entry.entry_id]
+
+        slot = self._async_known_slot(entry)
+        if slot is None:
+            used = self._used_slots.get(entry.data.get(CONF_INTEGRATION_TYPE), set())
+            slot = 1
+            while slot in used:
+                slot += 1
+        return self._async_index(entry, slot)
+
+    @callback
+    def async_remove(self, entry_id: str) -> None:
+        """删除配置条目并释放其槽位."""
+        entry_slot = self._slots.pop(entry_id, None)
+        if entry_slot is None:
+            return
+        if entry_slot.slot is not None:
+            self._used_slots.get(entry_slot.integration_type, set()).discard(entry_slot.slot)
+        if entry_slot.location_source_id:
+            entry_ids = self._by_source.get(entry_slot.location_source_id)
+            if entry_ids is not None:
+                entry_ids.discard(entry_id)
+                if not entry_ids:
+                    del self._by_source[entry_slot.location_source_id]
+
+    @callback
+    def async_update(self, entry: ConfigEntry) -> Optional[ThemeEntrySlot]:
+        """条目的数据或选项变化后重新登记，保留原来的槽位."""
+        entry_slot = self._slots.get(entry.entry_id)
+        if entry_slot is None:
+            return None
+        self.async_remove(entry.entry_id)
+        return self._async_index(entry, entry_slot.slot)
+
+    def get(self, entry_id: str) -> Optional[ThemeEntrySlot]:
+        """按 entry_id 查找槽位."""
+        return self._slots.get(entry_id)
+
+    def entry_ids_for_sources(self, location_source_ids: Iterable[str]) -> Set[str]:
+        """查找使用指定位置源的条目."""
+        entry_ids: Set[str] = set()
+        for location_source_id in location_source_ids:
+            entry_ids.update(self._by_source.get(location_source_id, ()))
+        return entry_ids
+
+    def slots(self, entry_ids: Iterable[str]) -> List[ThemeEntrySlot]:
+        """按 entry_id 批量查找槽位."""
+        return [self._slots[entry_id] for entry_id in entry_ids if entry_id in self._slots]
+
+    @callback
+    def _async_known_slot(self, entry: ConfigEntry) -> Optional[int]:
+        """读取条目已保存的槽位，旧条目从实体注册表中恢复."""
+        integration_type = entry.data.get(CONF_INTEGRATION_TYPE)
+        if integration_type == INTEGRATION_TYPE_PHONE:
+            conf_slot = CONF_PHONE_SLOT
+            domain, unique_id = "number", f"{entry.entry_id}_phone_mode_number"
+            prefix = NUMBER_THEME_PHONE_MODE_PREFIX
+        elif integration_type == INTEGRATION_TYPE_PAD:
+            conf_slot = CONF_PAD_SLOT
+            domain, unique_id = "select", f"{entry.entry_id}_pad_mode_select"
+            prefix = f"{SELECT_THEME_PAD_MODE}_"
+        else:
+            return None
+
+        slot = entry.data.get(conf_slot)
+        if slot is not None:
+            return slot
+
+        used = self._used_slots[integration_type]
+        entity_id = er.async_get(self.hass).async_get_entity_id(domain, DOMAIN, unique_id)
+        if entity_id is None:
+            return None
+        if integration_type == INTEGRATION_TYPE_PAD and entity_id == SELECT_THEME_PAD_MODE:
+            # 只支持一个平板主题时创建的条目
+            return 1 if 1 not in used else None
+        if entity_id.startswith(prefix):
+            suffix = entity_id[len(prefix):]
+            if suffix.isdigit() and int(suffix) not in used:
+                return int(suffix)
+        return None
+
+    @callback
+    def _async_index(self, entry: ConfigEntry, slot: int) -> ThemeEntrySlot:
+        """登记条目，必要时把槽位写入条目数据."""
+        integration_type = entry.data.get(CONF_INTEGRATION_TYPE)
+        location_source_id = entry.data.get(CONF_LOCATION_SOURCE_ID)
+
+        if integration_type == INTEGRATION_TYPE_PAD:
+            conf_slot = CONF_PAD_SLOT
+            entry_slot = ThemeEntrySlot(
+                entry_id=entry.entry_id,
+                integration_type=integration_type,
+                location_source_id=location_source_id,
+                slot=slot,
+                full_switch_id=pad_entity_id(SWITCH_THEME_PAD_FULL, slot),
+                mode_switch_id=pad_entity_id(SWITCH_THEME_PAD_MODE, slot),
+                mode_select_id=pad_entity_id(SELECT_THEME_PAD_MODE, slot),
+                hue_switch_id=pad_entity_id(SWITCH_THEME_PAD_HUE, slot),
+                hue_number_id=pad_entity_id(NUMBER_THEME_PAD_HUE, slot),
+                transitions=compile_entry_transitions(entry),
+            )
+        else:
+            conf_slot = CONF_PHONE_SLOT
+            entry_slot = ThemeEntrySlot(
+                entry_id=entry.entry_id,
+                integration_type=integration_type,
+                location_source_id=location_source_id,
+                slot=slot,
+                full_switch_id=f"{SWITCH_THEME_PHONE_FULL_PREFIX}{slot}",
+                mode_switch_id=f"{SWITCH_THEME_PHONE_MODE_PREFIX}{slot}",
+                mode_number_id=f"{NUMBER_THEME_PHONE_MODE_PREFIX}{slot}",
+                transitions=compile_entry_transitions(entry),
+            )
+
+        self._used_slots.setdefault(integration_type, set()).add(slot)
+        if entry.data.get(conf_slot) != slot:
+            _LOGGER.debug("为条目 %s 分配槽位 %s", entry.entry_id, slot)
+            self.hass.config_entries.async_update_entry(
+                entry, data={**entry.data, conf_slot: slot}
+            )
+
+        self._slots[entry.entry_id] = entry_slot
+        if location_source_id:
+            self._by_source.setdefault(location_source_id, set()).add(entry.entry_id)
+        return entry_slot
@@ -0,0 +1,94 @@
+"""消逝主题运行指标."""
+import bisect
+from collections import Counter
+from typing import Any, Dict, Optional, Sequence
+
+from .const import TICK_DURATION_BUCKETS_MS
+
+
+class DurationHistogram:
+    """耗时直方图，按固定的桶上限（毫秒）计数."""
+
+    def __init__(self, buckets: Sequence[float] = TICK_DURATION_BUCKETS_MS) -> None:
+        """初始化直方图."""
+        self.buckets = tuple(buckets)
+        # 最后一个桶记录超过所有上限的耗时
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms: Optional[float] = None
+
+    def observe(self, duration_ms: float) -> None:
+        """记录一次耗时."""
+        self.counts[bisect.bisect_left(self.buckets, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.last_ms = duration_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出为字典."""
+        labels = [f"le_{bucket:g}" for bucket in self.buckets] + ["inf"]
+        return {
+            "count": self.count,
+            "last_ms": round(self.last_ms, 3) if self.last_ms is not None else None,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class ThemeMetrics:
+    """引擎的运行计数器.
+
+    只做整数累加和一次二分查找，开销可以忽略，不需要打开调试日志就能查看。
+    """
+
+    def __init__(self) -> None:
+        """初始化计数器."""
+        self.ticks = 0
+        self.tick_duration = DurationHistogram()
+        self.hue_ticks = 0
+        self.entries_evaluated = 0
+        self.state_writes = 0
+        self.service_calls_avoided = 0
+        self.unchanged_skipped = 0
+        self.errors: Counter = Counter()
+
+    def record_tick(self, duration_ms: float, entries: int) -> None:
+        """记录一次主题评估."""
+        self.ticks += 1
+        self.entries_evaluated += entries
+        self.tick_duration.observe(duration_ms)
+
+    def record_writes(self, written: int, skipped: int) -> None:
+        """记录一次批量写入.
+
+        每次直接写入都取代了过去的一次服务调用。
+        """
+        self.state_writes += written
+        self.service_calls_avoided += written
+        self.unchanged_skipped += skipped
+
+    def record_error(self, err: BaseException) -> None:
+        """按异常类型记录错误."""
+        self.errors[type(err).__name__] += 1
+
+    @property
+    def error_count(self) -> int:
+        """错误总数."""
+        return sum(self.errors.values())
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出为字典."""
+        return {
+            "ticks": self.ticks,
+            "tick_duration": self.tick_duration.as_dict(),
+            "hue_ticks": self.hue_ticks,
+            "entries_evaluated": self.entries_evaluated,
+            "state_writes": self.state_writes,
+            "service_calls_avoided": self.service_calls_avoided,
+            "unchanged_skipped": self.unchanged_skipped,
+            "errors": dict(self.errors),
+        }
@@ -5,9 +5,11 @@ from typing import Any, Dict, Optional
 from homeassistant.components.number import NumberEntity, NumberMode
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect, async_dispatcher_send
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.util import dt as dt_util
 
 from .const import (
     DOMAIN,
@@ -15,9 +17,35 @@ from .const import (
     CONF_LOCATION_SOURCE_ID,
     INTEGRATION_TYPE_PAD,
     INTEGRATION_TYPE_PHONE,
-    NUMBER_THEME_PAD_HUE,
-    NUMBER_THEME_PHONE_MODE_PREFIX,
+    SIGNAL_THEME_REFRESH,
+    DATA_INDEX,
+    ROLE_HUE_NUMBER,
+    ROLE_MODE_NUMBER,
+    CONF_HUE_MODE,
+    CONF_HUE_PERIOD_MINUTES,
+    DEFAULT_HUE_PERIOD_MINUTES,
+    HUE_MODE_CLOCK,
+    HUE_MODE_STEP,
+    ATTR_HUE_MODE,
+    ATTR_HUE_PERIOD,
+    ATTR_HUE_PHASE,
+    ATTR_HUE_EPOCH,
+    CONF_HUE_MIN_WRITE_SECONDS,
+    DEFAULT_HUE_MIN_WRITE_SECONDS,
+    DATA_ENGINE,
+    ROLE_MODE_SELECT,
+    PAD_MODE_COLOR,
+    SIGNAL_THEME_ENTRY_CHANGED,
+    ATTR_PALETTE_MODE,
+    ATTR_PALETTE_PRIMARY,
+    ATTR_PALETTE_ACCENT,
+    ATTR_PALETTE_BACKGROUND,
+    ATTR_PALETTE_TEXT,
 )
+from .entity import XiaoshiThemeEntity
+from .index import ThemeEntrySlot
+from .palette import palette_for, palette_tables
+from .utils import clock_hue
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -33,8 +61,9 @@ async def async_setup_entry(
     entities = []
     
     if integration_type == INTEGRATION_TYPE_PAD:
-        # 平板主题数值
-        entities.append(XiaoshiThemePadHueNumber(hass, config_entry))
+        # 平板主题数值，实体 ID 的序号来自条目索引
+        entry_slot = hass.data[DOMAIN][DATA_INDEX].get(config_entry.entry_id)
+        entities.append(XiaoshiThemePadHueNumber(hass, config_entry, entry_slot))
     elif integration_type == INTEGRATION_TYPE_PHONE:
         # 获取设备名称
         entity = hass.states.get(location_source_id)
@@ -42,13 +71,16 @@ async def async_setup_entry(
         if entity and entity.attributes.get("friendly_name"):
             device_name = entity.attributes.get("friendly_name")
         
-        # 手机主题数值
-        entities.append(XiaoshiThemePhoneModeNumber(hass, config_entry, device_name))
+        # 手机主题数值，实体 ID 的序号来自条目索引
+        entry_slot = hass.data[DOMAIN][DATA_INDEX].get(config_entry.entry_id)
+        entities.append(
+            XiaoshiThemePhoneModeNumber(hass, config_entry, device_name, entry_slot)
+        )
     
     async_add_entities(entities)
 
 
-class XiaoshiThemePadHueNumber(NumberEntity, RestoreEntity):
+class XiaoshiThemePadHueNumber(XiaoshiThemeEntity, NumberEntity, RestoreEntity):
     """平板端色相数值."""
 
     def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
@@ -66,12 +98,29 @@ class XiaoshiThemePadHueNumber(NumberEntity, RestoreEntity):
 
     _attr_has_entity_name = True
     _attr_should_poll = False
+    _theme_role = ROLE_HUE_NUMBER
+    # 时钟色相和调色板的属性变化频繁，不写入历史记录
+    _unrecorded_attributes = frozenset(
+        {
+            ATTR_HUE_MODE,
+            ATTR_HUE_PERIOD,
+            ATTR_HUE_PHASE,
+            ATTR_HUE_EPOCH,
+            ATTR_PALETTE_MODE,
+            ATTR_PALETTE_PRIMARY,
+            ATTR_PALETTE_ACCENT,
+            ATTR_PALETTE_BACKGROUND,
+            ATTR_PALETTE_TEXT,
+        }
+    )
     _attr_native_min_value = 1
     _attr_native_max_value = 360
     _attr_native_step = 1
     _attr_mode = NumberMode.SLIDER
 
-    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    def __init__(
+        self, hass: HomeAssistant, config_entry: ConfigEntry, entry_slot: ThemeEntrySlot
+    ) -> None:
         """初始化平板端色相数值."""
         self.hass = hass
         self.config_entry = config_entry
@@ -84,7 +133,13 @@ class XiaoshiThemePadHueNumber(NumberEntity, RestoreEntity):
             model="Xiaoshi Theme Number",
         )
         self._attr_native_value = 1
-        self.entity_id = NUMBER_THEME_PAD_HUE
+        self._hue_phase = 1
+        self._hue_epoch: Optional[float] = None
+        # 从 _hue_epoch 开始使用的周期，选项中的周期变化后据此换算出当前色相
+        self._hue_period: Optional[float] = None
+        self.entity_id = entry_slot.hue_number_id
+        # 启动时一次性计算所有模式的调色板
+        palette_tables()
 
     async def async_added_to_hass(self) -> None:
         """当实体被添加到 HA 时调用."""
@@ -96,9 +151,9 @@ class XiaoshiThemePadHueNumber(NumberEntity, RestoreEntity):
             try:
                 restored_value = float(last_state.state)
                 self._attr_native_value = int(restored_value)
-                _LOGGER.debug(f"恢复 {self.entity_id} 的状态为: {self._attr_native_value}")
+                _LOGGER.debug("恢复 %s 的状态为: %s", self.entity_id, self._attr_native_value)
             except (ValueError, TypeError) as ex:
-                _LOGGER.warning(f"无法恢复 {self.entity_id} 的状态: {ex}")
+                _LOGGER.warning("无法恢复 %s 的状态: %s", self.entity_id, ex)
     
     async def async_added_to_hass(self) -> None:
         """当实体被添加到 HA 时调用."""
@@ -110,20 +165,165 @@ class XiaoshiThemePadHueNumber(NumberEntity, RestoreEntity):
             try:
                 restored_value = float(last_state.state)
                 self._attr_native_value = int(restored_value)
-                _LOGGER.debug(f"恢复 {self.entity_id} 的状态为: {self._attr_native_value}")
+                _LOGGER.debug("恢复 %s 的状态为: %s", self.entity_id, self._attr_native_value)
             except (ValueError, TypeError) as ex:
-                _LOGGER.warning(f"无法恢复 {self.entity_id} 的状态: {ex}")
+                _LOGGER.warning("无法恢复 %s 的状态: %s", self.entity_id, ex)
+
+            # 恢复时钟色相的起点，重启后色相不跳变
+            phase = last_state.attributes.get(ATTR_HUE_PHASE)
+            epoch = last_state.attributes.get(ATTR_HUE_EPOCH)
+            if phase is not None and epoch is not None:
+                self._hue_phase = int(phase)
+                self._hue_epoch = float(epoch)
+                period = last_state.attributes.get(ATTR_HUE_PERIOD)
+                self._hue_period = float(period) if period else None
+
+        # 平板模式变化时更新调色板属性
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_THEME_ENTRY_CHANGED.format(self.config_entry.entry_id),
+                self._async_theme_changed,
+            )
+        )
+
+    @callback
+    def _async_theme_changed(self, role: str, value: Any) -> None:
+        """同一条目的平板模式变化时重新写入状态."""
+        if role == ROLE_MODE_SELECT:
+            self.async_write_ha_state()
+
+    @property
+    def pad_mode(self) -> str:
+        """当前的平板模式，决定使用哪一套调色板."""
+        engine = self.hass.data[DOMAIN].get(DATA_ENGINE)
+        if engine is not None:
+            select = engine.get_entity(self.config_entry.entry_id, ROLE_MODE_SELECT)
+            if select is not None and select.current_option:
+                return select.current_option
+        return PAD_MODE_COLOR
     
+    @property
+    def min_write_interval(self) -> float:
+        """色相的最小写入间隔（秒），来自配置选项."""
+        return self.config_entry.options.get(
+            CONF_HUE_MIN_WRITE_SECONDS, DEFAULT_HUE_MIN_WRITE_SECONDS
+        )
+
+    @property
+    def hue_clock_enabled(self) -> bool:
+        """是否由时钟计算色相."""
+        return self.config_entry.options.get(CONF_HUE_MODE, HUE_MODE_STEP) == HUE_MODE_CLOCK
+
+    @property
+    def hue_period_seconds(self) -> float:
+        """色相变化一整圈的周期（秒）."""
+        return self.config_entry.options.get(
+            CONF_HUE_PERIOD_MINUTES, DEFAULT_HUE_PERIOD_MINUTES
+        ) * 60
+
+    @property
+    def hue_clock_running(self) -> bool:
+        """时钟色相是否正在运行."""
+        return self.hue_clock_enabled and self._hue_epoch is not None
+
+    @property
+    def extra_state_attributes(self) -> Optional[Dict[str, Any]]:
+        """发布当前色相的调色板；时钟色相模式下还发布周期和相位，前端可以在本地插值."""
+        mode = self.pad_mode
+        palette = palette_for(self._attr_native_value, mode)
+        attributes = {
+            ATTR_PALETTE_MODE: mode,
+            ATTR_PALETTE_PRIMARY: palette.primary,
+            ATTR_PALETTE_ACCENT: palette.accent,
+            ATTR_PALETTE_BACKGROUND: palette.background,
+            ATTR_PALETTE_TEXT: palette.text,
+        }
+        if self.hue_clock_running:
+            attributes.update(
+                {
+                    ATTR_HUE_MODE: HUE_MODE_CLOCK,
+                    ATTR_HUE_PERIOD: self._hue_period or self.hue_period_seconds,
+                    ATTR_HUE_PHASE: self._hue_phase,
+                    ATTR_HUE_EPOCH: self._hue_epoch,
+                }
+            )
+        return attributes
+
+    def clock_hue(self, timestamp: float) -> int:
+        """计算时钟色相在指定时刻的值."""
+        return clock_hue(
+            self._hue_phase, self._hue_epoch, self._hue_period or self.hue_period_seconds, timestamp
+        )
+
+    @callback
+    def async_start_clock(self) -> None:
+        """以当前色相为起点启动时钟色相，避免跳变."""
+        self._hue_phase = int(self._attr_native_value)
+        self._hue_epoch = dt_util.utcnow().timestamp()
+        self._hue_period = self.hue_period_seconds
+        self.async_write_ha_state()
+
+    @callback
+    def async_stop_clock(self) -> None:
+        """停止时钟色相，并保留停止时刻的色相."""
+        if self._hue_epoch is not None:
+            self._attr_native_value = self.clock_hue(dt_util.utcnow().timestamp())
+        self._hue_epoch = None
+        self.async_write_ha_state()
+
+    @callback
+    def async_entry_updated(self, entry_slot: ThemeEntrySlot) -> None:
+        """色相选项变化后，时钟色相从当前色相按新的周期继续，关闭时钟色相时停在当前色相."""
+        if self._hue_epoch is None:
+            return
+        period = self.hue_period_seconds
+        if self.hue_clock_enabled and period == self._hue_period:
+            return
+        now = dt_util.utcnow().timestamp()
+        self._attr_native_value = self.clock_hue(now)
+        self._hue_phase = int(self._attr_native_value)
+        self._hue_epoch = now if self.hue_clock_enabled else None
+        self._hue_period = period
+        self.async_write_ha_state()
+
+    @property
+    def theme_value(self) -> Any:
+        """引擎比较和写入的当前值."""
+        return self.native_value
+
+    @callback
+    def async_set_theme_value(self, value: Any) -> None:
+        """设置色相."""
+        self._attr_native_value = int(value)
+        if self.hue_clock_running:
+            # 手动设置后从新色相继续变化
+            self._hue_phase = int(value)
+            self._hue_epoch = dt_util.utcnow().timestamp()
+            self._hue_period = self.hue_period_seconds
+        self.async_write_ha_state()
+
     async def async_set_native_value(self, value: float) -> None:
         """设置数值."""
+        self.async_set_theme_value(value)
+
+    @callback
+    def async_push_value(self, value: int) -> None:
+        """由引擎直接推送新数值，受写入预算限制."""
         self._attr_native_value = int(value)
-        self.async_write_ha_state()
+        self.async_write_theme_state()
 
 
-class XiaoshiThemePhoneModeNumber(NumberEntity, RestoreEntity):
+class XiaoshiThemePhoneModeNumber(XiaoshiThemeEntity, NumberEntity, RestoreEntity):
     """手机端模式数值."""
 
-    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry, device_name: str) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        device_name: str,
+        entry_slot: ThemeEntrySlot,
+    ) -> None:
         """初始化手机端模式数值."""
         self.hass = hass
         self.config_entry = config_entry
@@ -138,12 +338,19 @@ class XiaoshiThemePhoneModeNumber(NumberEntity, RestoreEntity):
 
     _attr_has_entity_name = True
     _attr_should_poll = False
+    _theme_role = ROLE_MODE_NUMBER
     _attr_native_min_value = 1
     _attr_native_max_value = 8
     _attr_native_step = 1
     _attr_mode = NumberMode.SLIDER
 
-    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry, device_name: str) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        device_name: str,
+        entry_slot: ThemeEntrySlot,
+    ) -> None:
         """初始化手机端模式数值."""
         self.hass = hass
         self.config_entry = config_entry
@@ -155,18 +362,12 @@ class XiaoshiThemePhoneModeNumber(NumberEntity, RestoreEntity):
             manufacturer="Xiaoshi Theme Integration",
             model="Xiaoshi Theme Number",
         )
-        self._attr_native_value = 1
-        
-        # 获取已有的手机主题数量，用于生成实体ID
-        count = self._get_phone_theme_count()
-        self.entity_id = f"{NUMBER_THEME_PHONE_MODE_PREFIX}{count}"
-    
-    def _get_phone_theme_count(self) -> int:
-        """获取已有的手机主题数量."""
-        count = 1
-        while self.hass.states.get(f"{NUMBER_THEME_PHONE_MODE_PREFIX}{count}"):
-            count += 1
-        return count
+        # 取值范围覆盖切换规则中的所有模式
+        modes = entry_slot.transitions.modes
+        self._attr_native_min_value = min(modes)
+        self._attr_native_max_value = max(modes)
+        self._attr_native_value = min(modes)
+        self.entity_id = entry_slot.mode_number_id
 
     async def async_added_to_hass(self) -> None:
         """当实体被添加到 HA 时调用."""
@@ -178,9 +379,9 @@ class XiaoshiThemePhoneModeNumber(NumberEntity, RestoreEntity):
             try:
                 restored_value = float(last_state.state)
                 self._attr_native_value = int(restored_value)
-                _LOGGER.debug(f"恢复 {self.entity_id} 的状态为: {self._attr_native_value}")
+                _LOGGER.debug("恢复 %s 的状态为: %s", self.entity_id, self._attr_native_value)
             except (ValueError, TypeError) as ex:
-                _LOGGER.warning(f"无法恢复 {self.entity_id} 的状态: {ex}")
+                _LOGGER.warning("无法恢复 %s 的状态: %s", self.entity_id, ex)
     
     async def async_added_to_hass(self) -> None:
         """当实体被添加到 HA 时调用."""
@@ -192,11 +393,37 @@ class XiaoshiThemePhoneModeNumber(NumberEntity, RestoreEntity):
             try:
                 restored_value = float(last_state.state)
                 self._attr_native_value = int(restored_value)
-                _LOGGER.debug(f"恢复 {self.entity_id} 的状态为: {self._attr_native_value}")
+                _LOGGER.debug("恢复 %s 的状态为: %s", self.entity_id, self._attr_native_value)
             except (ValueError, TypeError) as ex:
-                _LOGGER.warning(f"无法恢复 {self.entity_id} 的状态: {ex}")
+                _LOGGER.warning("无法恢复 %s 的状态: %s", self.entity_id, ex)
     
+    @property
+    def theme_value(self) -> Any:
+        """引擎比较和写入的当前值."""
+        return self.native_value
+
+    @callback
+    def async_set_theme_value(self, value: Any) -> None:
+        """设置模式."""
+        self._attr_native_value = int(value)
+        self.async_write_ha_state()
+
     async def async_set_native_value(self, value: float) -> None:
         """设置数值."""
+        self.async_set_theme_value(value)
+        async_dispatcher_send(self.hass, SIGNAL_THEME_REFRESH, self.config_entry.entry_id)
+
+    @callback
+    def async_entry_updated(self, entry_slot: ThemeEntrySlot) -> None:
+        """切换规则变化后更新取值范围."""
+        modes = entry_slot.transitions.modes
+        if (min(modes), max(modes)) != (self._attr_native_min_value, self._attr_native_max_value):
+            self._attr_native_min_value = min(modes)
+            self._attr_native_max_value = max(modes)
+            self.async_write_ha_state()
+
+    @callback
+    def async_push_value(self, value: int) -> None:
+        """由引擎直接推送新数值，不再请求重新评估."""
         self._attr_native_value = int(value)
-        self.async_write_ha_state()
+        self.async_write_theme_state()
@@ -0,0 +1,73 @@
+"""消逝主题色相调色板.
+
+为每个平板模式预先计算 360 个色相对应的主色、强调色、背景色和文字色，
+前端直接读取，不需要每次色相变化都自己换算颜色。
+"""
+import colorsys
+from functools import lru_cache
+from typing import Dict, NamedTuple, Tuple
+
+from .const import PAD_MODE_COLOR, PAD_MODE_BLACK
+
+# 强调色相对主色的色相偏移（度）
+ACCENT_HUE_OFFSET = 30
+
+# 各模式下每种颜色的亮度和饱和度；未列出的模式按彩平图处理
+_PALETTE_LIGHTNESS_SATURATION = {
+    PAD_MODE_COLOR: {
+        "primary": (0.45, 0.65),
+        "accent": (0.55, 0.75),
+        "background": (0.96, 0.30),
+        "text": (0.15, 0.20),
+    },
+    PAD_MODE_BLACK: {
+        "primary": (0.60, 0.60),
+        "accent": (0.65, 0.70),
+        "background": (0.08, 0.15),
+        "text": (0.92, 0.10),
+    },
+}
+
+
+class HuePalette(NamedTuple):
+    """一个色相对应的颜色（#rrggbb）."""
+
+    primary: str
+    accent: str
+    background: str
+    text: str
+
+
+def _hex(hue: float, lightness: float, saturation: float) -> str:
+    """HLS 转换为 #rrggbb."""
+    red, green, blue = colorsys.hls_to_rgb((hue % 360) / 360.0, lightness, saturation)
+    return "#{:02x}{:02x}{:02x}".format(
+        round(red * 255), round(green * 255), round(blue * 255)
+    )
+
+
+@lru_cache(maxsize=None)
+def palette_table(mode: str) -> Tuple[HuePalette, ...]:
+    """某个模式的调色板，第 i 个元素对应色相 i + 1（1-360），每个模式只计算一次."""
+    levels = _PALETTE_LIGHTNESS_SATURATION.get(
+        mode, _PALETTE_LIGHTNESS_SATURATION[PAD_MODE_COLOR]
+    )
+    return tuple(
+        HuePalette(
+            primary=_hex(hue, *levels["primary"]),
+            accent=_hex(hue + ACCENT_HUE_OFFSET, *levels["accent"]),
+            background=_hex(hue, *levels["background"]),
+            text=_hex(hue, *levels["text"]),
+        )
+        for hue in range(1, 361)
+    )
+
+
+def palette_for(hue: int, mode: str) -> HuePalette:
+    """查找色相（1-360）在某个模式下的颜色."""
+    return palette_table(mode)[(int(hue) - 1) % 360]
+
+
+def palette_tables() -> Dict[str, Tuple[HuePalette, ...]]:
+    """所有平板模式的调色板."""
+    return {mode: palette_table(mode) for mode in _PALETTE_LIGHTNESS_SATURATION}
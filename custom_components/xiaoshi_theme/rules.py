@@ -0,0 +1,82 @@
+"""消逝主题模式切换规则.
+
+规则以数据描述：每个模式对应白天和黑夜的目标模式，例如
+``{1: {"day": 1, "night": 2}, 2: {"day": 1, "night": 2}}``。
+规则在条目加载时编译成查找表，评估时每个条目只需一次字典查找；
+新增模式只需修改规则，不需要修改代码。
+"""
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Tuple
+
+RULE_DAY = "day"
+RULE_NIGHT = "night"
+
+
+class TransitionTable:
+    """编译后的模式切换查找表."""
+
+    __slots__ = ("_targets",)
+
+    def __init__(self, targets: Dict[Hashable, Tuple[Hashable, Hashable]]) -> None:
+        """初始化查找表."""
+        self._targets = targets
+
+    def __eq__(self, other: object) -> bool:
+        """规则相同的查找表相等，选项更新时据此判断是否需要重新评估."""
+        if not isinstance(other, TransitionTable):
+            return NotImplemented
+        return self._targets == other._targets
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def target(self, mode: Hashable, is_day: bool) -> Hashable:
+        """当前模式在白天或黑夜应切换到的模式，规则中没有的模式保持不变."""
+        targets = self._targets.get(mode)
+        if targets is None:
+            return mode
+        return targets[0] if is_day else targets[1]
+
+    def as_dict(self) -> Dict[Hashable, Dict[str, Hashable]]:
+        """以规则的格式导出查找表，用于诊断信息."""
+        return {
+            mode: {RULE_DAY: day, RULE_NIGHT: night}
+            for mode, (day, night) in self._targets.items()
+        }
+
+    @property
+    def modes(self) -> List[Hashable]:
+        """规则中出现的所有模式，按首次出现的顺序排列."""
+        modes: Dict[Hashable, None] = {}
+        for mode, (day, night) in self._targets.items():
+            modes[mode] = None
+            modes[day] = None
+            modes[night] = None
+        return list(modes)
+
+
+def compile_transition_rules(
+    rules: Mapping[Any, Mapping[str, Any]],
+    coerce: Callable[[Any], Hashable] = str,
+) -> TransitionTable:
+    """把规则编译成查找表.
+
+    coerce 用于统一模式的类型，例如选项以 JSON 保存后手机主题的数字模式会变成字符串键。
+    规则格式不正确时抛出 ValueError。
+    """
+    targets: Dict[Hashable, Tuple[Hashable, Hashable]] = {}
+    for mode, rule in rules.items():
+        try:
+            targets[coerce(mode)] = (coerce(rule[RULE_DAY]), coerce(rule[RULE_NIGHT]))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"模式 {mode} 的切换规则无效: {rule}") from e
+    if not targets:
+        raise ValueError("切换规则为空")
+    return TransitionTable(targets)
+
+
+def pair_rules(pairs: List[Tuple[Any, Any]]) -> Dict[Any, Dict[str, Any]]:
+    """由白天/黑夜模式对生成规则，同一对中的两个模式互相切换."""
+    rules: Dict[Any, Dict[str, Any]] = {}
+    for day, night in pairs:
+        rules[day] = {RULE_DAY: day, RULE_NIGHT: night}
+        rules[night] = {RULE_DAY: day, RULE_NIGHT: night}
+    return rules
@@ -5,6 +5,7 @@ from typing import Any, Dict, List, Optional
 from homeassistant.components.select import SelectEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.restore_state import RestoreEntity
@@ -13,10 +14,14 @@ from .const import (
     DOMAIN,
     CONF_INTEGRATION_TYPE,
     INTEGRATION_TYPE_PAD,
-    SELECT_THEME_PAD_MODE,
     PAD_MODE_OPTIONS,
     PAD_MODE_COLOR,
+    SIGNAL_THEME_REFRESH,
+    ROLE_MODE_SELECT,
+    DATA_INDEX,
 )
+from .entity import XiaoshiThemeEntity
+from .index import ThemeEntrySlot
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -31,25 +36,31 @@ async def async_setup_entry(
     entities = []
     
     if integration_type == INTEGRATION_TYPE_PAD:
-        # 平板主题选择器
-        entities.append(XiaoshiThemePadModeSelect(hass, config_entry))
+        # 平板主题选择器，选项包含切换规则中的所有模式
+        entry_slot = hass.data[DOMAIN][DATA_INDEX].get(config_entry.entry_id)
+        entities.append(XiaoshiThemePadModeSelect(hass, config_entry, entry_slot))
     
     async_add_entities(entities)
 
 
-class XiaoshiThemePadModeSelect(SelectEntity, RestoreEntity):
+class XiaoshiThemePadModeSelect(XiaoshiThemeEntity, SelectEntity, RestoreEntity):
     """平板端模式选择器."""
 
     _attr_has_entity_name = True
     _attr_should_poll = False
+    _theme_role = ROLE_MODE_SELECT
 
-    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    def __init__(
+        self, hass: HomeAssistant, config_entry: ConfigEntry, entry_slot: ThemeEntrySlot
+    ) -> None:
         """初始化平板端模式选择器."""
         self.hass = hass
         self.config_entry = config_entry
         self._attr_unique_id = f"{config_entry.entry_id}_pad_mode_select"
         self._attr_name = "平板端模式"
-        self._attr_options = PAD_MODE_OPTIONS
+        self._attr_options = list(
+            dict.fromkeys([*PAD_MODE_OPTIONS, *entry_slot.transitions.modes])
+        )
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, f"xiaoshi_theme_{config_entry.entry_id}")},
             name="消逝主题-平板",
@@ -57,7 +68,7 @@ class XiaoshiThemePadModeSelect(SelectEntity, RestoreEntity):
             model="Xiaoshi Theme Select",
         )
         self._attr_current_option = PAD_MODE_COLOR
-        self.entity_id = SELECT_THEME_PAD_MODE
+        self.entity_id = entry_slot.mode_select_id
         
     async def async_added_to_hass(self) -> None:
         """当实体被添加到 HA 时调用."""
@@ -65,11 +76,36 @@ class XiaoshiThemePadModeSelect(SelectEntity, RestoreEntity):
         
         # 尝试恢复之前的状态
         last_state = await self.async_get_last_state()
-        if last_state and last_state.state in PAD_MODE_OPTIONS:
+        if last_state and last_state.state in self.options:
             self._attr_current_option = last_state.state
-            _LOGGER.debug(f"恢复 {self.entity_id} 的状态为: {self._attr_current_option}")
+            _LOGGER.debug("恢复 %s 的状态为: %s", self.entity_id, self._attr_current_option)
+
+    @property
+    def theme_value(self) -> Any:
+        """引擎比较和写入的当前值."""
+        return self.current_option
+
+    @callback
+    def async_set_theme_value(self, option: Any) -> None:
+        """设置选项."""
+        self._attr_current_option = option
+        self.async_write_ha_state()
 
     async def async_select_option(self, option: str) -> None:
         """更改选项."""
+        self.async_set_theme_value(option)
+        async_dispatcher_send(self.hass, SIGNAL_THEME_REFRESH, self.config_entry.entry_id)
+
+    @callback
+    def async_entry_updated(self, entry_slot: ThemeEntrySlot) -> None:
+        """切换规则变化后更新选项."""
+        options = list(dict.fromkeys([*PAD_MODE_OPTIONS, *entry_slot.transitions.modes]))
+        if options != self._attr_options:
+            self._attr_options = options
+            self.async_write_ha_state()
+
+    @callback
+    def async_push_value(self, option: str) -> None:
+        """由引擎直接推送新选项，不再请求重新评估."""
         self._attr_current_option = option
-        self.async_write_ha_state()
+        self.async_write_theme_state()
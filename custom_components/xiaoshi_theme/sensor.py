@@ -0,0 +1,171 @@
+"""消逝主题诊断传感器."""
+import logging
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional
+
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.const import PERCENTAGE, Platform, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.entity import EntityCategory, DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import (
+    DOMAIN,
+    DATA_ENGINE,
+    DATA_SETTINGS,
+    DATA_METRICS_HOST,
+    DATA_UNLOADING,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# 诊断传感器读取引擎计数器的间隔
+SCAN_INTERVAL = timedelta(seconds=60)
+
+MetricGetter = Callable[[Dict[str, Any]], Any]
+
+# 键、名称、单位、状态类别、取值函数
+METRIC_SENSORS = (
+    ("tick_duration", "主题评估耗时", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT,
+     lambda metrics: metrics["tick_duration"]["last_ms"]),
+    ("entries_evaluated", "评估条目数", None, SensorStateClass.TOTAL_INCREASING,
+     lambda metrics: metrics["entries_evaluated"]),
+    ("state_writes", "状态写入次数", None, SensorStateClass.TOTAL_INCREASING,
+     lambda metrics: metrics["state_writes"]),
+    ("service_calls_avoided", "省去的服务调用", None, SensorStateClass.TOTAL_INCREASING,
+     lambda metrics: metrics["service_calls_avoided"]),
+    ("solar_computations", "日出日落计算次数", None, SensorStateClass.TOTAL_INCREASING,
+     lambda metrics: metrics["solar_computations"]),
+    ("solar_cache_hit_rate", "日出日落缓存命中率", PERCENTAGE, SensorStateClass.MEASUREMENT,
+     lambda metrics: round(metrics["solar_cache"]["hit_rate"] * 100, 1)),
+    ("errors", "错误次数", None, SensorStateClass.TOTAL_INCREASING,
+     lambda metrics: sum(metrics["errors"].values())),
+)
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up the 消逝主题 diagnostic sensors."""
+    domain_data = hass.data[DOMAIN]
+    enabled = domain_data[DATA_SETTINGS].diagnostic_sensors
+    _async_remove_stale_sensors(hass, config_entry, enabled)
+    if not enabled:
+        return
+
+    # 指标是整个引擎共享的，只由一个条目创建一组；原来的条目已经卸载时由该条目接替
+    host = domain_data.get(DATA_METRICS_HOST)
+    if host not in (None, config_entry.entry_id) and _async_can_host(
+        hass, host, ConfigEntryState.LOADED, ConfigEntryState.SETUP_IN_PROGRESS
+    ):
+        return
+    domain_data[DATA_METRICS_HOST] = config_entry.entry_id
+
+    async_add_entities(
+        XiaoshiThemeMetricSensor(hass, key, name, unit, state_class, getter)
+        for key, name, unit, state_class, getter in METRIC_SENSORS
+    )
+
+
+@callback
+def _async_can_host(
+    hass: HomeAssistant, entry_id: str, *states: ConfigEntryState
+) -> bool:
+    """条目处于给定的状态且没有正在卸载时才能承载诊断传感器."""
+    entry = hass.config_entries.async_get_entry(entry_id)
+    return (
+        entry is not None
+        and entry.state in states
+        and entry_id not in hass.data[DOMAIN][DATA_UNLOADING]
+    )
+
+
+async def async_reload_metric_sensors(hass: HomeAssistant) -> None:
+    """重新加载诊断传感器所在条目的传感器平台.
+
+    由防抖器在开关诊断传感器或所在条目卸载之后调用，不在卸载过程中执行。
+    所在的条目不可用时选一个已加载且没有正在卸载的条目接替。
+    """
+    domain_data = hass.data[DOMAIN]
+    host = domain_data.pop(DATA_METRICS_HOST, None)
+    if host is None or not _async_can_host(hass, host, ConfigEntryState.LOADED):
+        if not domain_data[DATA_SETTINGS].diagnostic_sensors:
+            return
+        host = next(
+            (
+                entry.entry_id
+                for entry in hass.config_entries.async_entries(DOMAIN)
+                if _async_can_host(hass, entry.entry_id, ConfigEntryState.LOADED)
+            ),
+            None,
+        )
+        if host is None:
+            return
+    entry = hass.config_entries.async_get_entry(host)
+    await hass.config_entries.async_unload_platforms(entry, [Platform.SENSOR])
+    # 卸载传感器平台期间该条目可能开始卸载
+    if _async_can_host(hass, host, ConfigEntryState.LOADED):
+        await hass.config_entries.async_forward_entry_setups(entry, [Platform.SENSOR])
+
+
+@callback
+def _async_remove_stale_sensors(
+    hass: HomeAssistant, config_entry: ConfigEntry, enabled: bool
+) -> None:
+    """删除该条目下不再提供的诊断传感器.
+
+    包括旧版本按条目创建的传感器，以及关闭诊断传感器后留在实体注册表中的传感器。
+    """
+    stale = {f"{config_entry.entry_id}_metric_{key}" for key, *_ in METRIC_SENSORS}
+    if not enabled:
+        stale.update(f"metric_{key}" for key, *_ in METRIC_SENSORS)
+    registry = er.async_get(hass)
+    for entity in er.async_entries_for_config_entry(registry, config_entry.entry_id):
+        if entity.domain == "sensor" and entity.unique_id in stale:
+            registry.async_remove(entity.entity_id)
+
+
+class XiaoshiThemeMetricSensor(SensorEntity):
+    """引擎运行指标传感器.
+
+    指标是整个引擎共享的，整个集成只有一组，定期读取计数器，不随每次评估写入状态。
+    """
+
+    _attr_has_entity_name = True
+    _attr_should_poll = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        key: str,
+        name: str,
+        unit: Optional[str],
+        state_class: SensorStateClass,
+        getter: MetricGetter,
+    ) -> None:
+        """初始化诊断传感器."""
+        self.hass = hass
+        self._getter = getter
+        self._attr_unique_id = f"metric_{key}"
+        self._attr_name = name
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, "xiaoshi_theme_metrics")},
+            name="消逝主题-运行指标",
+            manufacturer="Xiaoshi Theme Integration",
+            model="Xiaoshi Theme Metrics",
+        )
+
+    async def async_update(self) -> None:
+        """读取引擎计数器."""
+        engine = self.hass.data[DOMAIN].get(DATA_ENGINE)
+        if engine is None:
+            self._attr_available = False
+            return
+        self._attr_available = True
+        self._attr_native_value = self._getter(engine.async_get_metrics())
@@ -0,0 +1,223 @@
+"""消逝主题服务.
+
+``xiaoshi_theme.apply`` 一次设置多个条目的模式、色相和开关：参数只校验一次，
+所有变更在同一次事件循环中写入，每个条目的结果作为服务响应返回。
+条目可以按 entry_id、条目的任意实体或主题类型选择；不适用于某个条目的字段，
+以及对应实体已在实体注册表中禁用的字段会被忽略并列在 ignored 中，
+例如同一次调用中的 pad_mode 只作用于平板主题，phone_mode 只作用于手机主题。
+"""
+import logging
+from typing import Any, Dict, List, Set, Tuple
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .const import (
+    DOMAIN,
+    DATA_ENGINE,
+    CONF_INTEGRATION_TYPE,
+    INTEGRATION_TYPE_PAD,
+    INTEGRATION_TYPE_PHONE,
+    PAD_MODE_OPTIONS,
+    ROLE_FULL_SWITCH,
+    ROLE_MODE_SWITCH,
+    ROLE_MODE_SELECT,
+    ROLE_MODE_NUMBER,
+    ROLE_HUE_SWITCH,
+    ROLE_HUE_NUMBER,
+    SIGNAL_THEME_REFRESH,
+    SERVICE_APPLY,
+    ATTR_ENTRY_ID,
+    ATTR_PHONE_MODE,
+    ATTR_PAD_MODE,
+    ATTR_HUE,
+    ATTR_FULL_SWITCH,
+    ATTR_MODE_SWITCH,
+    ATTR_HUE_SWITCH,
+)
+from .coordinator import ThemeChange, XiaoshiThemeEngine
+from .index import ThemeEntrySlot
+
+_LOGGER = logging.getLogger(__name__)
+
+# 字段对应的实体角色和适用的主题类型
+_FIELDS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    ATTR_PHONE_MODE: (ROLE_MODE_NUMBER, (INTEGRATION_TYPE_PHONE,)),
+    ATTR_PAD_MODE: (ROLE_MODE_SELECT, (INTEGRATION_TYPE_PAD,)),
+    ATTR_HUE: (ROLE_HUE_NUMBER, (INTEGRATION_TYPE_PAD,)),
+    ATTR_FULL_SWITCH: (ROLE_FULL_SWITCH, (INTEGRATION_TYPE_PAD, INTEGRATION_TYPE_PHONE)),
+    ATTR_MODE_SWITCH: (ROLE_MODE_SWITCH, (INTEGRATION_TYPE_PAD, INTEGRATION_TYPE_PHONE)),
+    ATTR_HUE_SWITCH: (ROLE_HUE_SWITCH, (INTEGRATION_TYPE_PAD,)),
+}
+
+# 这些角色变化后与用户在界面上修改一样，请求一次重新评估
+_REFRESH_ROLES = {ROLE_MODE_SWITCH, ROLE_MODE_SELECT, ROLE_MODE_NUMBER}
+
+APPLY_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Optional(ATTR_ENTRY_ID): vol.All(cv.ensure_list, [cv.string]),
+            vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+            vol.Optional(CONF_INTEGRATION_TYPE): vol.In(
+                [INTEGRATION_TYPE_PAD, INTEGRATION_TYPE_PHONE]
+            ),
+            vol.Optional(ATTR_PHONE_MODE): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(ATTR_PAD_MODE): cv.string,
+            vol.Optional(ATTR_HUE): vol.All(vol.Coerce(int), vol.Range(min=1, max=360)),
+            vol.Optional(ATTR_FULL_SWITCH): cv.boolean,
+            vol.Optional(ATTR_MODE_SWITCH): cv.boolean,
+            vol.Optional(ATTR_HUE_SWITCH): cv.boolean,
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_ENTRY_ID, ATTR_ENTITY_ID, CONF_INTEGRATION_TYPE),
+    cv.has_at_least_one_key(*_FIELDS),
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """注册服务."""
+
+    async def async_apply(call: ServiceCall) -> ServiceResponse:
+        return async_handle_apply(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_APPLY,
+        async_apply,
+        schema=APPLY_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def _select_entries(
+    hass: HomeAssistant, engine: XiaoshiThemeEngine, data: Dict[str, Any]
+) -> Tuple[List[ThemeEntrySlot], List[str]]:
+    """按 entry_id、实体和主题类型选择条目，返回选中的条目和无法匹配的选择."""
+    entry_ids: Dict[str, None] = {}
+    unmatched: List[str] = []
+
+    for entry_id in data.get(ATTR_ENTRY_ID, []):
+        if engine.get_entry_slot(entry_id) is None:
+            unmatched.append(entry_id)
+        else:
+            entry_ids[entry_id] = None
+
+    registry = er.async_get(hass)
+    for entity_id in data.get(ATTR_ENTITY_ID, []):
+        registry_entry = registry.async_get(entity_id)
+        if (
+            registry_entry is None
+            or registry_entry.platform != DOMAIN
+            or engine.get_entry_slot(registry_entry.config_entry_id) is None
+        ):
+            unmatched.append(entity_id)
+        else:
+            entry_ids[registry_entry.config_entry_id] = None
+
+    integration_type = data.get(CONF_INTEGRATION_TYPE)
+    if integration_type is not None:
+        for entry_slot in engine.entry_slots:
+            if entry_slot.integration_type == integration_type:
+                entry_ids[entry_slot.entry_id] = None
+
+    return [engine.get_entry_slot(entry_id) for entry_id in entry_ids], unmatched
+
+
+def _validate_value(
+    engine: XiaoshiThemeEngine, entry_slot: ThemeEntrySlot, field: str, value: Any
+) -> None:
+    """检查值是否在条目的取值范围内，超出时抛出 ValueError."""
+    if field == ATTR_PHONE_MODE:
+        modes = entry_slot.transitions.modes
+        if not min(modes) <= value <= max(modes):
+            raise ValueError(f"模式 {value} 超出范围 {min(modes)}-{max(modes)}")
+    elif field == ATTR_PAD_MODE:
+        select = engine.get_entity(entry_slot.entry_id, ROLE_MODE_SELECT)
+        options = select.options if select is not None else PAD_MODE_OPTIONS
+        if value not in options:
+            raise ValueError(f"模式 {value} 不在选项 {options} 中")
+
+
+@callback
+def async_handle_apply(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """批量设置条目的值."""
+    engine = hass.data.get(DOMAIN, {}).get(DATA_ENGINE)
+    if engine is None:
+        raise ServiceValidationError("没有已加载的消逝主题条目")
+
+    entry_slots, unmatched = _select_entries(hass, engine, call.data)
+    if not entry_slots:
+        raise ServiceValidationError(f"没有匹配的消逝主题条目: {unmatched}")
+
+    fields = {field: call.data[field] for field in _FIELDS if field in call.data}
+    registry = er.async_get(hass)
+    results: Dict[str, Dict[str, Any]] = {}
+    changes: List[ThemeChange] = []
+    for entry_slot in entry_slots:
+        result: Dict[str, Any] = {
+            "type": entry_slot.integration_type,
+            "applied": {},
+            "unchanged": [],
+            "ignored": [],
+            "errors": {},
+        }
+        results[entry_slot.entry_id] = result
+        for field, value in fields.items():
+            role, integration_types = _FIELDS[field]
+            if entry_slot.integration_type not in integration_types:
+                result["ignored"].append(field)
+                continue
+            entity = engine.get_entity(entry_slot.entry_id, role)
+            if entity is None:
+                # 用户禁用的实体不会加入引擎，忽略该字段；其余情况是实体还没有加载
+                registry_entry = registry.async_get(getattr(entry_slot, f"{role}_id"))
+                if registry_entry is not None and registry_entry.disabled:
+                    result["ignored"].append(field)
+                else:
+                    result["errors"][field] = "实体不可用"
+                continue
+            try:
+                _validate_value(engine, entry_slot, field, value)
+            except ValueError as e:
+                result["errors"][field] = str(e)
+                continue
+            changes.append(ThemeChange(entry_slot.entry_id, role, value))
+
+    applied = engine.async_set_values(changes)
+    fields_by_role = {role: field for field, (role, _types) in _FIELDS.items()}
+    applied_keys: Set[Tuple[str, str]] = set()
+    for change in applied:
+        applied_keys.add((change.entry_id, change.role))
+        results[change.entry_id]["applied"][fields_by_role[change.role]] = change.value
+    for change in changes:
+        if (change.entry_id, change.role) not in applied_keys:
+            results[change.entry_id]["unchanged"].append(fields_by_role[change.role])
+
+    _LOGGER.debug(
+        "批量设置 %s 个条目，写入 %s 个实体，无法匹配：%s",
+        len(entry_slots),
+        len(applied),
+        unmatched,
+    )
+    # 只重新评估模式或模式开关发生变化的条目
+    for entry_id in dict.fromkeys(
+        change.entry_id for change in applied if change.role in _REFRESH_ROLES
+    ):
+        async_dispatcher_send(hass, SIGNAL_THEME_REFRESH, entry_id)
+
+    if not call.return_response:
+        return None
+    return {"entries": results, "unmatched": unmatched}
@@ -0,0 +1,89 @@
+"""消逝主题集成级设置.
+
+日出日落计算实现、诊断传感器等设置作用于整个集成，不属于某个条目。
+它们只保存在 .storage 中的一处，集成加载时读取一次；修改后通过调度器信号通知，不需要重新加载条目。
+"""
+import logging
+from typing import Any, Dict
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    CONF_DIAGNOSTIC_SENSORS,
+    CONF_SOLAR_BACKEND,
+    SOLAR_BACKEND_ASTRAL,
+    DEFAULT_SOLAR_BACKEND,
+    SIGNAL_SETTINGS_UPDATED,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.settings"
+STORAGE_VERSION = 1
+
+DEFAULT_SETTINGS: Dict[str, Any] = {
+    CONF_SOLAR_BACKEND: DEFAULT_SOLAR_BACKEND,
+    CONF_DIAGNOSTIC_SENSORS: False,
+}
+
+
+class ThemeSettings:
+    """整个集成共用的设置."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """初始化设置，加载前使用默认值."""
+        self.hass = hass
+        self._store: Store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._data: Dict[str, Any] = dict(DEFAULT_SETTINGS)
+
+    @property
+    def solar_backend(self) -> str:
+        """日出日落计算实现."""
+        return self._data[CONF_SOLAR_BACKEND]
+
+    @property
+    def diagnostic_sensors(self) -> bool:
+        """是否创建诊断传感器."""
+        return self._data[CONF_DIAGNOSTIC_SENSORS]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """当前的全部设置."""
+        return dict(self._data)
+
+    async def async_load(self) -> None:
+        """读取保存的设置.
+
+        没有保存过时从旧版本写在条目选项中的值迁移：任一条目选择了 astral 就使用 astral，
+        任一条目开启了诊断传感器就开启。
+        """
+        data = await self._store.async_load()
+        if data is None:
+            entries = self.hass.config_entries.async_entries(DOMAIN)
+            if any(
+                entry.options.get(CONF_SOLAR_BACKEND) == SOLAR_BACKEND_ASTRAL
+                for entry in entries
+            ):
+                self._data[CONF_SOLAR_BACKEND] = SOLAR_BACKEND_ASTRAL
+            if any(entry.options.get(CONF_DIAGNOSTIC_SENSORS) for entry in entries):
+                self._data[CONF_DIAGNOSTIC_SENSORS] = True
+            return
+        for key in DEFAULT_SETTINGS:
+            if key in data:
+                self._data[key] = data[key]
+
+    async def async_update(self, changes: Dict[str, Any]) -> None:
+        """修改设置，有变化时保存并发送信号，参数为变化的键."""
+        changed = {
+            key for key, value in changes.items()
+            if key in DEFAULT_SETTINGS and self._data[key] != value
+        }
+        if not changed:
+            return
+        for key in changed:
+            self._data[key] = changes[key]
+        await self._store.async_save(self._data)
+        _LOGGER.debug("集成设置已修改: %s", sorted(changed))
+        async_dispatcher_send(self.hass, SIGNAL_SETTINGS_UPDATED, changed)
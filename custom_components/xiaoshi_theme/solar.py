@@ -0,0 +1,258 @@
+"""消逝主题日出日落计算.
+
+使用 NOAA 太阳位置公式计算日出日落时间和昼夜状态：solar_times 用纯 Python 计算单个位置，
+batch_solar_state 用 numpy 一次计算多个位置，两者公式相同，结果一致。
+日期按各位置的地方平太阳时划分，保证同一天的日出和日落包围当地正午，
+与 Home Assistant 所在时区无关。
+与 astral 对比，纬度 ±SOLAR_BATCH_VERIFIED_LATITUDE° 以内日出日落时间误差不超过
+SOLAR_BATCH_MAX_ERROR_SECONDS 秒；更靠近极圈时太阳贴近地平线移动，误差会增大，极昼极夜前后可达数分钟。
+numpy 在首次批量计算时才导入，不影响集成的加载时间；没有安装 numpy 时批量计算逐个位置调用
+solar_times，结果相同，只是更慢。
+"""
+import math
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy
+
+# 与 astral 的日出日落时间对比的最大误差（秒）及其适用的纬度范围
+SOLAR_BATCH_MAX_ERROR_SECONDS = 60
+SOLAR_BATCH_VERIFIED_LATITUDE = 60
+
+# 日出日落时太阳天顶角（含大气折射和太阳视半径）
+SUNRISE_ZENITH_DEGREES = 90.833
+
+# 2000-01-01 12:00 UTC 的儒略日和 Unix 纪元的儒略日
+_JD_J2000 = 2451545.0
+_JD_UNIX_EPOCH = 2440587.5
+
+# 经度每度对应的地方平太阳时偏移（秒）
+SECONDS_PER_LONGITUDE_DEGREE = 240.0
+
+
+def solar_day(longitude: float, timestamp: float) -> int:
+    """返回时间戳在该经度地方平太阳时下的日期，以 Unix 纪元以来的天数表示."""
+    return math.floor((timestamp + longitude * SECONDS_PER_LONGITUDE_DEGREE) / 86400.0)
+
+
+class BatchSolarResult(NamedTuple):
+    """批量计算结果，数组按输入位置的顺序排列.
+
+    sunrise 和 sunset 为 UTC 时间戳，极昼或极夜时为 NaN。没有安装 numpy 时为列表。
+    """
+
+    sunrise: "numpy.ndarray"
+    sunset: "numpy.ndarray"
+    is_day: "numpy.ndarray"
+
+
+@lru_cache(maxsize=None)
+def _import_numpy():
+    """导入 numpy，没有安装时返回 None."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _solar_params(np, jd):
+    """根据儒略日计算太阳赤纬（弧度）和时差（分钟）."""
+    t = (jd - _JD_J2000) / 36525.0
+
+    geom_mean_long = np.radians((280.46646 + t * (36000.76983 + t * 0.0003032)) % 360.0)
+    geom_mean_anom = np.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+    eccent = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+
+    center = (
+        np.sin(geom_mean_anom) * (1.914602 - t * (0.004817 + 0.000014 * t))
+        + np.sin(2 * geom_mean_anom) * (0.019993 - 0.000101 * t)
+        + np.sin(3 * geom_mean_anom) * 0.000289
+    )
+    true_long = np.degrees(geom_mean_long) + center
+    omega = np.radians(125.04 - 1934.136 * t)
+    apparent_long = np.radians(true_long - 0.00569 - 0.00478 * np.sin(omega))
+
+    mean_obliq = 23.0 + (26.0 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60.0) / 60.0
+    obliq = np.radians(mean_obliq + 0.00256 * np.cos(omega))
+
+    declination = np.arcsin(np.sin(obliq) * np.sin(apparent_long))
+
+    y = np.tan(obliq / 2.0) ** 2
+    eq_time = 4.0 * np.degrees(
+        y * np.sin(2 * geom_mean_long)
+        - 2 * eccent * np.sin(geom_mean_anom)
+        + 4 * eccent * y * np.sin(geom_mean_anom) * np.cos(2 * geom_mean_long)
+        - 0.5 * y * y * np.sin(4 * geom_mean_long)
+        - 1.25 * eccent * eccent * np.sin(2 * geom_mean_anom)
+    )
+    return declination, eq_time
+
+
+class _ScalarMath:
+    """用 math 提供 _solar_params 所需的函数，使其也能计算单个位置."""
+
+    radians = staticmethod(math.radians)
+    degrees = staticmethod(math.degrees)
+    sin = staticmethod(math.sin)
+    cos = staticmethod(math.cos)
+    tan = staticmethod(math.tan)
+    arcsin = staticmethod(math.asin)
+
+
+def _hour_angle_scalar(lat: float, declination: float) -> Optional[float]:
+    """单个位置日出日落时的时角（度），极昼或极夜时为 None."""
+    cos_ha = math.cos(math.radians(SUNRISE_ZENITH_DEGREES)) / (
+        math.cos(lat) * math.cos(declination)
+    ) - math.tan(lat) * math.tan(declination)
+    if abs(cos_ha) > 1.0:
+        return None
+    return math.degrees(math.acos(cos_ha))
+
+
+def solar_times(latitude: float, longitude: float, day: int) -> Optional[Tuple[float, float]]:
+    """用纯 Python 计算单个位置的日出日落时间（UTC 时间戳）.
+
+    day 为该位置地方平太阳时下的日期（见 solar_day），极昼或极夜时返回 None。
+    """
+    lat = math.radians(latitude)
+    jd_midnight = _JD_UNIX_EPOCH + day
+
+    declination, eq_time = _solar_params(_ScalarMath, jd_midnight + (0.5 - longitude / 360.0))
+    noon = 720.0 - 4.0 * longitude - eq_time
+    hour_angle = _hour_angle_scalar(lat, declination)
+    if hour_angle is None:
+        return None
+
+    events = []
+    for sign in (-1, 1):
+        # 在估算的日出日落时刻修正一次
+        declination, eq_time = _solar_params(
+            _ScalarMath, jd_midnight + (noon + sign * 4.0 * hour_angle) / 1440.0
+        )
+        event_hour_angle = _hour_angle_scalar(lat, declination)
+        if event_hour_angle is None:
+            return None
+        minutes = 720.0 - 4.0 * (longitude - sign * event_hour_angle) - eq_time
+        events.append(day * 86400.0 + minutes * 60.0)
+    return events[0], events[1]
+
+
+def is_polar_day(latitude: float, longitude: float, day: int) -> bool:
+    """按正午太阳高度判断没有日出日落的一天是极昼（True）还是极夜（False）."""
+    declination, _ = _solar_params(
+        _ScalarMath, _JD_UNIX_EPOCH + day + (0.5 - longitude / 360.0)
+    )
+    return abs(math.radians(latitude) - declination) < math.radians(SUNRISE_ZENITH_DEGREES)
+
+
+def _hour_angle(np, lat, declination):
+    """日出日落时的时角（度），极昼或极夜时为 NaN."""
+    cos_ha = np.cos(np.radians(SUNRISE_ZENITH_DEGREES)) / (
+        np.cos(lat) * np.cos(declination)
+    ) - np.tan(lat) * np.tan(declination)
+    with np.errstate(invalid="ignore"):
+        return np.degrees(np.arccos(np.where(np.abs(cos_ha) <= 1.0, cos_ha, np.nan)))
+
+
+def _event_minutes(np, jd_midnight, lat, lon, sign, estimate):
+    """在估计时刻重新计算太阳参数，得到日出（sign=-1）或日落（sign=1）距 UTC 零点的分钟数."""
+    declination, eq_time = _solar_params(np, jd_midnight + estimate / 1440.0)
+    hour_angle = _hour_angle(np, lat, declination)
+    return 720.0 - 4.0 * (lon - sign * hour_angle) - eq_time
+
+
+def batch_solar_state(
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+    timestamp: float,
+) -> BatchSolarResult:
+    """批量计算日出日落时间和昼夜状态.
+
+    日出日落按 timestamp 在各位置地方平太阳时下的日期（见 solar_day）计算，
+    is_day 表示 timestamp 时刻是否处于日出和日落之间；极昼时为 True，极夜时为 False。
+    """
+    np = _import_numpy()
+    if np is None:
+        return _batch_solar_state_scalar(latitudes, longitudes, timestamp)
+
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.asarray(longitudes, dtype=float)
+
+    # 各位置当天的 UTC 零点
+    days = np.floor((timestamp + lon * SECONDS_PER_LONGITUDE_DEGREE) / 86400.0)
+    midnight = days * 86400.0
+    jd_midnight = _JD_UNIX_EPOCH + days
+
+    # 第一次在当地太阳正午估算，第二次在估算的日出日落时刻修正
+    declination, eq_time = _solar_params(np, jd_midnight + (0.5 - lon / 360.0))
+    noon = 720.0 - 4.0 * lon - eq_time
+    hour_angle = _hour_angle(np, lat, declination)
+    sunrise_minutes = _event_minutes(np, jd_midnight, lat, lon, -1, noon - 4.0 * hour_angle)
+    sunset_minutes = _event_minutes(np, jd_midnight, lat, lon, 1, noon + 4.0 * hour_angle)
+
+    sunrise = midnight + sunrise_minutes * 60.0
+    sunset = midnight + sunset_minutes * 60.0
+
+    # 极昼极夜按正午太阳高度判断
+    polar_day = np.abs(lat - declination) < np.radians(SUNRISE_ZENITH_DEGREES)
+    is_day = np.where(
+        np.isnan(sunrise) | np.isnan(sunset),
+        polar_day,
+        (sunrise <= timestamp) & (timestamp <= sunset),
+    )
+    return BatchSolarResult(sunrise=sunrise, sunset=sunset, is_day=is_day)
+
+
+def _batch_solar_state_scalar(
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+    timestamp: float,
+) -> BatchSolarResult:
+    """没有安装 numpy 时逐个位置计算，结果与 batch_solar_state 相同."""
+    sunrise: List[float] = []
+    sunset: List[float] = []
+    is_day: List[bool] = []
+    for latitude, longitude in zip(latitudes, longitudes):
+        day = solar_day(longitude, timestamp)
+        times = solar_times(latitude, longitude, day)
+        if times is None:
+            sunrise.append(math.nan)
+            sunset.append(math.nan)
+            is_day.append(is_polar_day(latitude, longitude, day))
+            continue
+        sunrise.append(times[0])
+        sunset.append(times[1])
+        is_day.append(times[0] <= timestamp <= times[1])
+    return BatchSolarResult(sunrise=sunrise, sunset=sunset, is_day=is_day)
+
+
+def solar_table_days(latitude: float, longitude: float, start_day: int, days: int):
+    """计算单个位置连续 days 天的日出日落时间（UTC 时间戳数组）.
+
+    第 i 个元素对应地方平太阳时下的第 start_day + i 天，极昼或极夜时为 NaN。
+    没有安装 numpy 时逐天调用 solar_times，返回列表。
+    """
+    np = _import_numpy()
+    if np is None:
+        sunrise: List[float] = []
+        sunset: List[float] = []
+        for day in range(start_day, start_day + days):
+            times = solar_times(latitude, longitude, day)
+            sunrise.append(math.nan if times is None else times[0])
+            sunset.append(math.nan if times is None else times[1])
+        return sunrise, sunset
+
+    day = start_day + np.arange(days, dtype=float)
+    lat = math.radians(latitude)
+    jd_midnight = _JD_UNIX_EPOCH + day
+
+    declination, eq_time = _solar_params(np, jd_midnight + (0.5 - longitude / 360.0))
+    noon = 720.0 - 4.0 * longitude - eq_time
+    hour_angle = _hour_angle(np, lat, declination)
+    sunrise_minutes = _event_minutes(np, jd_midnight, lat, longitude, -1, noon - 4.0 * hour_angle)
+    sunset_minutes = _event_minutes(np, jd_midnight, lat, longitude, 1, noon + 4.0 * hour_angle)
+
+    midnight = day * 86400.0
+    return midnight + sunrise_minutes * 60.0, midnight + sunset_minutes * 60.0
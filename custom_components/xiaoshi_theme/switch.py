@@ -5,9 +5,9 @@ from typing import Any, Dict, Optional
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.entity import EntityCategory, DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.restore_state import RestoreEntity
 
 from .const import (
@@ -16,12 +16,15 @@ from .const import (
     CONF_LOCATION_SOURCE_ID,
     INTEGRATION_TYPE_PAD,
     INTEGRATION_TYPE_PHONE,
-    SWITCH_THEME_PAD_FULL,
-    SWITCH_THEME_PAD_MODE,
-    SWITCH_THEME_PAD_HUE,
-    SWITCH_THEME_PHONE_FULL_PREFIX,
-    SWITCH_THEME_PHONE_MODE_PREFIX,
+    SIGNAL_THEME_REFRESH,
+    DATA_INDEX,
+    DATA_ENGINE,
+    ROLE_FULL_SWITCH,
+    ROLE_MODE_SWITCH,
+    ROLE_HUE_SWITCH,
 )
+from .entity import XiaoshiThemeEntity
+from .index import ThemeEntrySlot
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -37,11 +40,12 @@ async def async_setup_entry(
     entities = []
     
     if integration_type == INTEGRATION_TYPE_PAD:
-        # 平板主题开关
+        # 平板主题开关，实体 ID 的序号来自条目索引
+        entry_slot = hass.data[DOMAIN][DATA_INDEX].get(config_entry.entry_id)
         entities.extend([
-            XiaoshiThemePadFullSwitch(hass, config_entry),
-            XiaoshiThemePadModeSwitch(hass, config_entry),
-            XiaoshiThemePadHueSwitch(hass, config_entry),
+            XiaoshiThemePadFullSwitch(hass, config_entry, entry_slot),
+            XiaoshiThemePadModeSwitch(hass, config_entry, entry_slot),
+            XiaoshiThemePadHueSwitch(hass, config_entry, entry_slot),
         ])
     elif integration_type == INTEGRATION_TYPE_PHONE:
         # 获取设备名称
@@ -50,20 +54,23 @@ async def async_setup_entry(
         if entity and entity.attributes.get("friendly_name"):
             device_name = entity.attributes.get("friendly_name")
         
-        # 手机主题开关
+        # 手机主题开关，实体 ID 的序号来自条目索引
+        entry_slot = hass.data[DOMAIN][DATA_INDEX].get(config_entry.entry_id)
         entities.extend([
-            XiaoshiThemePhoneFullSwitch(hass, config_entry, device_name),
-            XiaoshiThemePhoneModeSwitch(hass, config_entry, device_name),
+            XiaoshiThemePhoneFullSwitch(hass, config_entry, device_name, entry_slot),
+            XiaoshiThemePhoneModeSwitch(hass, config_entry, device_name, entry_slot),
         ])
     
     async_add_entities(entities)
 
 
-class XiaoshiThemeBaseSwitch(SwitchEntity, RestoreEntity):
+class XiaoshiThemeBaseSwitch(XiaoshiThemeEntity, SwitchEntity, RestoreEntity):
     """消逝主题基础开关类."""
 
     _attr_has_entity_name = True
     _attr_should_poll = False
+    # 打开时是否请求协调器立即重新评估主题
+    _refresh_on_turn_on = False
 
     def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
         """初始化基础开关."""
@@ -79,28 +86,43 @@ class XiaoshiThemeBaseSwitch(SwitchEntity, RestoreEntity):
         last_state = await self.async_get_last_state()
         if last_state:
             self._attr_is_on = last_state.state == "on"
-            _LOGGER.debug(f"恢复 {self.entity_id} 的状态为: {self._attr_is_on}")
+            _LOGGER.debug("恢复 %s 的状态为: %s", self.entity_id, self._attr_is_on)
+
+    @property
+    def theme_value(self) -> Any:
+        """引擎比较和写入的当前值."""
+        return self.is_on
+
+    @callback
+    def async_set_theme_value(self, value: Any) -> None:
+        """设置开关状态."""
+        self._attr_is_on = bool(value)
+        self.async_write_ha_state()
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """打开开关."""
-        self._attr_is_on = True
-        self.async_write_ha_state()
+        self.async_set_theme_value(True)
+        if self._refresh_on_turn_on:
+            async_dispatcher_send(self.hass, SIGNAL_THEME_REFRESH, self.config_entry.entry_id)
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """关闭开关."""
-        self._attr_is_on = False
-        self.async_write_ha_state()
+        self.async_set_theme_value(False)
 
 
 class XiaoshiThemePadFullSwitch(XiaoshiThemeBaseSwitch):
     """平板端全屏切换开关."""
 
-    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    _theme_role = ROLE_FULL_SWITCH
+
+    def __init__(
+        self, hass: HomeAssistant, config_entry: ConfigEntry, entry_slot: ThemeEntrySlot
+    ) -> None:
         """初始化平板端全屏切换开关."""
         super().__init__(hass, config_entry)
         self._attr_unique_id = f"{config_entry.entry_id}_pad_full"
         self._attr_name = "平板端全屏切换"
-        self.entity_id = SWITCH_THEME_PAD_FULL
+        self.entity_id = entry_slot.full_switch_id
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, f"xiaoshi_theme_{config_entry.entry_id}")},
             name="消逝主题-平板",
@@ -112,12 +134,17 @@ class XiaoshiThemePadFullSwitch(XiaoshiThemeBaseSwitch):
 class XiaoshiThemePadModeSwitch(XiaoshiThemeBaseSwitch):
     """平板端模式启用开关."""
 
-    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    _theme_role = ROLE_MODE_SWITCH
+    _refresh_on_turn_on = True
+
+    def __init__(
+        self, hass: HomeAssistant, config_entry: ConfigEntry, entry_slot: ThemeEntrySlot
+    ) -> None:
         """初始化平板端模式启用开关."""
         super().__init__(hass, config_entry)
         self._attr_unique_id = f"{config_entry.entry_id}_pad_mode"
         self._attr_name = "平板端模式启用"
-        self.entity_id = SWITCH_THEME_PAD_MODE
+        self.entity_id = entry_slot.mode_switch_id
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, f"xiaoshi_theme_{config_entry.entry_id}")},
             name="消逝主题-平板",
@@ -129,12 +156,29 @@ class XiaoshiThemePadModeSwitch(XiaoshiThemeBaseSwitch):
 class XiaoshiThemePadHueSwitch(XiaoshiThemeBaseSwitch):
     """平板端色相启用开关."""
 
-    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    _theme_role = ROLE_HUE_SWITCH
+
+    @callback
+    def async_set_theme_value(self, value: Any) -> None:
+        """设置开关状态，打开时时钟色相从当前色相继续，关闭时停在当前色相."""
+        super().async_set_theme_value(value)
+        self._async_notify_engine()
+
+    @callback
+    def _async_notify_engine(self) -> None:
+        """通知引擎色相开关已变化."""
+        engine = self.hass.data[DOMAIN].get(DATA_ENGINE)
+        if engine is not None:
+            engine.async_hue_switch_changed(self.config_entry.entry_id)
+
+    def __init__(
+        self, hass: HomeAssistant, config_entry: ConfigEntry, entry_slot: ThemeEntrySlot
+    ) -> None:
         """初始化平板端色相启用开关."""
         super().__init__(hass, config_entry)
         self._attr_unique_id = f"{config_entry.entry_id}_pad_hue"
         self._attr_name = "平板端色相启用"
-        self.entity_id = SWITCH_THEME_PAD_HUE
+        self.entity_id = entry_slot.hue_switch_id
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, f"xiaoshi_theme_{config_entry.entry_id}")},
             name="消逝主题-平板",
@@ -146,7 +190,15 @@ class XiaoshiThemePadHueSwitch(XiaoshiThemeBaseSwitch):
 class XiaoshiThemePhoneFullSwitch(XiaoshiThemeBaseSwitch):
     """手机端全屏切换开关."""
 
-    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry, device_name: str) -> None:
+    _theme_role = ROLE_FULL_SWITCH
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        device_name: str,
+        entry_slot: ThemeEntrySlot,
+    ) -> None:
         """初始化手机端全屏切换开关."""
         super().__init__(hass, config_entry)
         self._attr_unique_id = f"{config_entry.entry_id}_phone_full"
@@ -157,23 +209,22 @@ class XiaoshiThemePhoneFullSwitch(XiaoshiThemeBaseSwitch):
             manufacturer="Xiaoshi Theme Integration",
             model="Xiaoshi Theme Number",
         )
-        
-        # 获取已有的手机主题数量，用于生成实体ID
-        count = self._get_phone_theme_count()
-        self.entity_id = f"{SWITCH_THEME_PHONE_FULL_PREFIX}{count}"
-    
-    def _get_phone_theme_count(self) -> int:
-        """获取已有的手机主题数量."""
-        count = 1
-        while self.hass.states.get(f"{SWITCH_THEME_PHONE_FULL_PREFIX}{count}"):
-            count += 1
-        return count
+        self.entity_id = entry_slot.full_switch_id
 
 
 class XiaoshiThemePhoneModeSwitch(XiaoshiThemeBaseSwitch):
     """手机端模式启用开关."""
 
-    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry, device_name: str) -> None:
+    _theme_role = ROLE_MODE_SWITCH
+    _refresh_on_turn_on = True
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        device_name: str,
+        entry_slot: ThemeEntrySlot,
+    ) -> None:
         """初始化手机端模式启用开关."""
         super().__init__(hass, config_entry)
         self._attr_unique_id = f"{config_entry.entry_id}_phone_mode"
@@ -184,14 +235,4 @@ class XiaoshiThemePhoneModeSwitch(XiaoshiThemeBaseSwitch):
             manufacturer="Xiaoshi Theme Integration",
             model="Xiaoshi Theme Number",
         )
-        
-        # 获取已有的手机主题数量，用于生成实体ID
-        count = self._get_phone_theme_count()
-        self.entity_id = f"{SWITCH_THEME_PHONE_MODE_PREFIX}{count}"
-    
-    def _get_phone_theme_count(self) -> int:
-        """获取已有的手机主题数量."""
-        count = 1
-        while self.hass.states.get(f"{SWITCH_THEME_PHONE_MODE_PREFIX}{count}"):
-            count += 1
-        return count
+        self.entity_id = entry_slot.mode_switch_id
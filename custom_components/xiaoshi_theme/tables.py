@@ -0,0 +1,207 @@
+"""消逝主题日出日落年表.
+
+为每个位置预先计算未来一年的日出日落时间，以打包的整数数组保存在 .storage 中，
+重启后直接加载，按日期下标 O(1) 读取。只有位置变化或年表快要用完时才在后台重新计算。
+"""
+import base64
+import logging
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    SOLAR_CACHE_PRECISION,
+    SOLAR_TABLE_DAYS,
+    SOLAR_TABLE_REBUILD_MARGIN_DAYS,
+    SOLAR_TABLE_SAVE_DELAY_SECONDS,
+)
+from .solar import solar_day, solar_table_days
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.solar_tables"
+STORAGE_VERSION = 1
+
+# 极昼或极夜时没有日出日落
+NO_EVENT = -(2 ** 31)
+
+TableKey = Tuple[float, float]
+
+
+class SolarTable:
+    """单个位置的日出日落年表.
+
+    第 i 个元素对应地方平太阳时下的第 start_day + i 天，
+    以距当天 UTC 零点的秒数保存，极昼或极夜时为 NO_EVENT。
+    """
+
+    __slots__ = ("start_day", "sunrise", "sunset")
+
+    def __init__(self, start_day: int, sunrise: array, sunset: array) -> None:
+        """初始化年表."""
+        self.start_day = start_day
+        self.sunrise = sunrise
+        self.sunset = sunset
+
+    @property
+    def end_day(self) -> int:
+        """年表覆盖的最后一天之后的一天."""
+        return self.start_day + len(self.sunrise)
+
+    def covers(self, day: int) -> bool:
+        """是否包含该日期."""
+        return self.start_day <= day < self.end_day
+
+    def times(self, day: int) -> Optional[Tuple[float, float]]:
+        """该日期的日出日落时间（UTC 时间戳），极昼或极夜时返回 None."""
+        index = day - self.start_day
+        sunrise = self.sunrise[index]
+        sunset = self.sunset[index]
+        if sunrise == NO_EVENT or sunset == NO_EVENT:
+            return None
+        midnight = day * 86400
+        return float(midnight + sunrise), float(midnight + sunset)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出为可以写入存储的字典."""
+        return {
+            "start_day": self.start_day,
+            "sunrise": base64.b64encode(self.sunrise.tobytes()).decode("ascii"),
+            "sunset": base64.b64encode(self.sunset.tobytes()).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SolarTable":
+        """从存储的字典恢复."""
+        sunrise = array("i")
+        sunrise.frombytes(base64.b64decode(data["sunrise"]))
+        sunset = array("i")
+        sunset.frombytes(base64.b64decode(data["sunset"]))
+        if len(sunrise) != len(sunset):
+            raise ValueError("日出和日落数组长度不一致")
+        return cls(int(data["start_day"]), sunrise, sunset)
+
+
+def build_solar_table(
+    latitude: float, longitude: float, start_day: int, days: int = SOLAR_TABLE_DAYS
+) -> SolarTable:
+    """计算单个位置的年表，在执行器线程中运行."""
+    sunrise_times, sunset_times = solar_table_days(latitude, longitude, start_day, days)
+    sunrise = array("i")
+    sunset = array("i")
+    for offset, (rise, set_) in enumerate(zip(sunrise_times, sunset_times)):
+        if rise != rise or set_ != set_:  # NaN 表示极昼或极夜
+            sunrise.append(NO_EVENT)
+            sunset.append(NO_EVENT)
+            continue
+        midnight = (start_day + offset) * 86400
+        sunrise.append(round(float(rise)) - midnight)
+        sunset.append(round(float(set_)) - midnight)
+    return SolarTable(start_day, sunrise, sunset)
+
+
+def _build_tables(keys: List[TableKey], start_day: int) -> Dict[TableKey, SolarTable]:
+    """批量计算年表."""
+    return {key: build_solar_table(key[0], key[1], start_day) for key in keys}
+
+
+def table_key(latitude: float, longitude: float) -> TableKey:
+    """年表的键，与日出日落缓存使用相同的精度."""
+    return round(latitude, SOLAR_CACHE_PRECISION), round(longitude, SOLAR_CACHE_PRECISION)
+
+
+class SolarTableManager:
+    """日出日落年表的加载、后台重建和保存."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """初始化管理器."""
+        self.hass = hass
+        self.tables: Dict[TableKey, SolarTable] = {}
+        self._store: Store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._loaded = False
+        self._building = False
+        self._wanted: Dict[TableKey, None] = {}
+
+    async def async_load(self) -> None:
+        """从存储中加载年表，只在第一次调用时读取."""
+        if self._loaded:
+            return
+        self._loaded = True
+        data = await self._store.async_load()
+        if not data:
+            return
+        for item in data.get("tables", []):
+            try:
+                key = table_key(item["latitude"], item["longitude"])
+                self.tables[key] = SolarTable.from_dict(item)
+            except (KeyError, TypeError, ValueError) as e:
+                _LOGGER.warning("忽略无法解析的日出日落年表: %s", e)
+        _LOGGER.debug("已加载 %s 个位置的日出日落年表", len(self.tables))
+
+    @callback
+    def async_update(self, locations: Iterable[Tuple[float, float]]) -> None:
+        """按当前使用的位置更新年表.
+
+        删除不再使用的年表，缺少或快要用完的年表在后台重新计算。
+        """
+        wanted = {table_key(latitude, longitude): None for latitude, longitude in locations}
+        removed = [key for key in self.tables if key not in wanted]
+        for key in removed:
+            del self.tables[key]
+        if removed:
+            self._async_schedule_save()
+
+        self._wanted = wanted
+        if not self._building and self._stale_keys():
+            self._building = True
+            self.hass.async_create_background_task(
+                self._async_build(), f"{DOMAIN}_solar_tables"
+            )
+
+    def _stale_keys(self) -> List[TableKey]:
+        """需要重新计算的年表."""
+        today = solar_day(0, time.time())
+        return [
+            key
+            for key in self._wanted
+            if key not in self.tables
+            or not self.tables[key].covers(today - 1)
+            or self.tables[key].end_day - today < SOLAR_TABLE_REBUILD_MARGIN_DAYS
+        ]
+
+    async def _async_build(self) -> None:
+        """在执行器中计算年表，直到没有需要更新的位置."""
+        try:
+            while keys := self._stale_keys():
+                # 从前一天开始，覆盖太阳日比 UTC 日期早一天的位置
+                start_day = solar_day(0, time.time()) - 1
+                _LOGGER.debug("正在计算 %s 个位置的日出日落年表", len(keys))
+                tables = await self.hass.async_add_executor_job(_build_tables, keys, start_day)
+                for key, table in tables.items():
+                    # 计算期间不再使用的位置不写入
+                    if key in self._wanted:
+                        self.tables[key] = table
+                self._async_schedule_save()
+        except Exception as e:
+            _LOGGER.error("计算日出日落年表出错: %s", e)
+        finally:
+            self._building = False
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """延迟保存年表，合并短时间内的多次修改."""
+        self._store.async_delay_save(self._data_to_save, SOLAR_TABLE_SAVE_DELAY_SECONDS)
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Any]:
+        """要保存的数据."""
+        return {
+            "tables": [
+                {"latitude": key[0], "longitude": key[1], **table.as_dict()}
+                for key, table in self.tables.items()
+            ]
+        }
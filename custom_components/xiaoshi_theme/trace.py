@@ -0,0 +1,97 @@
+"""消逝主题评估追踪.
+
+每次评估为每个条目记录一条结构化事件：条目、输入、决定、动作和耗时，
+保存在固定大小的环形缓冲区中，取代逐条目的调试日志。
+记录时只把元组追加到 deque，格式化推迟到读取时，没有人读取时几乎没有开销。
+"""
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Mapping, NamedTuple, Optional
+
+from .const import TRACE_BUFFER_SIZE
+
+# 事件类型
+KIND_SWEEP = "sweep"
+KIND_MODE = "mode"
+KIND_HUE = "hue"
+
+# 条目的评估决定
+DECISION_SWITCH = "switch"
+DECISION_KEEP = "keep"
+DECISION_DISABLED = "disabled"
+DECISION_BACKOFF = "backoff"
+DECISION_INCOMPLETE = "incomplete"
+DECISION_NO_LOCATION = "no_location"
+DECISION_ERROR = "error"
+
+
+class TraceEvent(NamedTuple):
+    """一条评估事件."""
+
+    timestamp: float
+    entry_id: Optional[str]
+    kind: str
+    inputs: Optional[Mapping[str, Any]]
+    decision: str
+    action: Any
+    duration_ms: Optional[float]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出为字典."""
+        return {
+            "timestamp": self.timestamp,
+            "entry_id": self.entry_id,
+            "kind": self.kind,
+            "inputs": dict(self.inputs) if self.inputs is not None else None,
+            "decision": self.decision,
+            "action": self.action,
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+        }
+
+
+class TickTracer:
+    """评估事件的环形缓冲区."""
+
+    def __init__(self, size: int = TRACE_BUFFER_SIZE) -> None:
+        """初始化缓冲区."""
+        # 保存普通元组，读取时才转换为 TraceEvent
+        self._events: Deque[tuple] = deque(maxlen=size)
+        self.recorded = 0
+
+    @property
+    def size(self) -> int:
+        """缓冲区容量."""
+        return self._events.maxlen or 0
+
+    def record(
+        self,
+        entry_id: Optional[str],
+        kind: str,
+        inputs: Optional[Mapping[str, Any]],
+        decision: str,
+        action: Any = None,
+        duration_ms: Optional[float] = None,
+    ) -> None:
+        """记录一条事件，缓冲区满时丢弃最旧的事件."""
+        self._events.append((time.time(), entry_id, kind, inputs, decision, action, duration_ms))
+        self.recorded += 1
+
+    def events(
+        self, entry_id: Optional[str] = None, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """最近的事件，按时间从旧到新排列.
+
+        指定 entry_id 时只返回该条目的事件以及不属于任何条目的整体事件。
+        """
+        events = [
+            TraceEvent._make(event).as_dict()
+            for event in self._events
+            if entry_id is None or event[1] in (entry_id, None)
+        ]
+        if limit is not None:
+            events = events[-limit:]
+        return events
+
+    def clear(self) -> None:
+        """清空缓冲区."""
+        self._events.clear()
@@ -1,49 +1,376 @@
 """消逝主题工具函数."""
 import logging
-from datetime import datetime
-from typing import Optional, Tuple
+import math
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
 
 from homeassistant.const import (
+    ATTR_FRIENDLY_NAME,
     ATTR_LATITUDE,
     ATTR_LONGITUDE,
+    STATE_HOME,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, State
 from homeassistant.util import dt as dt_util
-import astral
-from astral.sun import sun
+
+from .const import (
+    SOLAR_CACHE_MAX_SIZE,
+    SOLAR_CACHE_PRECISION,
+    SOLAR_BACKEND_ASTRAL,
+    DEFAULT_SOLAR_BACKEND,
+    SOLAR_TABLE_DAYS,
+)
+from .solar import (
+    SECONDS_PER_LONGITUDE_DEGREE,
+    batch_solar_state,
+    is_polar_day,
+    solar_day,
+    solar_times,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
-def is_daytime(hass: HomeAssistant, latitude: float, longitude: float) -> bool:
-    """根据经纬度判断是白天还是黑夜."""
+# 向后查找日出日落事件的最大天数（覆盖极昼极夜前后的边界日）
+SOLAR_LOOKAHEAD_DAYS = 3
+
+SolarTimes = Optional[Tuple[datetime, datetime]]
+
+_EPOCH_DATE = date(1970, 1, 1)
+
+
+class PolarSeason(NamedTuple):
+    """一段连续的极昼或极夜.
+
+    start_day 和 end_day 为地方平太阳时下的日期，end_day 是之后第一个有日出日落的日子。
+    """
+
+    is_day: bool
+    start_day: int
+    end_day: int
+
+    def covers(self, day: int) -> bool:
+        """是否包含该日期."""
+        return self.start_day <= day < self.end_day
+
+    def end_timestamp(self, longitude: float) -> float:
+        """极昼或极夜结束那一天的地方平太阳时零点（UTC 时间戳）."""
+        return self.end_day * 86400.0 - longitude * SECONDS_PER_LONGITUDE_DEGREE
+
+
+def _as_datetimes(times: Optional[Tuple[float, float]]) -> SolarTimes:
+    """把日出日落时间戳转换为 UTC 时间."""
+    if times is None:
+        return None
+    return (
+        datetime.fromtimestamp(times[0], timezone.utc),
+        datetime.fromtimestamp(times[1], timezone.utc),
+    )
+
+
+def _builtin_solar_times(latitude: float, longitude: float, day: int) -> SolarTimes:
+    """用内置的纯 Python 实现计算日出日落时间."""
+    return _as_datetimes(solar_times(latitude, longitude, day))
+
+
+def _astral_solar_times(latitude: float, longitude: float, day: int) -> SolarTimes:
+    """用 astral 计算日出日落时间，astral 在首次使用时才导入."""
+    import astral
+    from astral.sun import sunrise, sunset
+
+    # 在该位置的地方平太阳时下计算，日出和日落落在同一天
+    tzinfo = timezone(timedelta(seconds=round(longitude * SECONDS_PER_LONGITUDE_DEGREE)))
+    observer = astral.Observer(latitude=latitude, longitude=longitude)
+    on_date = _EPOCH_DATE + timedelta(days=day)
     try:
-        # 获取当前时间
-        now = dt_util.now()
-        
-        # 使用astral库计算日出日落时间
-        observer = astral.Observer(latitude=latitude, longitude=longitude)
-        s = sun(observer, date=now.date())
-        
-        # 判断当前时间是否在日出和日落之间
-        return s["sunrise"] <= now <= s["sunset"]
-    except Exception as e:
-        _LOGGER.error("计算日出日落时间出错: %s", e)
-        # 出错时默认为白天
+        # 只计算日出日落；astral.sun.sun 还会计算晨昏蒙影，在白夜期间会失败
+        return sunrise(observer, on_date, tzinfo), sunset(observer, on_date, tzinfo)
+    except ValueError:
+        # astral 在极昼或极夜时无法计算日出日落
+        return None
+
+
+class SolarEphemerisCache:
+    """日出日落时间缓存.
+
+    以四舍五入后的经纬度和该位置的太阳日为键，按 LRU 淘汰，跨过零点后丢弃过期的条目。
+    同一位置每天只计算一次。默认使用内置的纯 Python 实现，也可以切换为 astral。
+    使用内置实现时优先读取预先计算的年表（见 tables.py），年表中没有的才计算。
+    极昼极夜按位置记录整段的起止日期，整个季节内不再重复判断。
+    """
+
+    def __init__(
+        self,
+        max_size: int = SOLAR_CACHE_MAX_SIZE,
+        precision: int = SOLAR_CACHE_PRECISION,
+        backend: str = DEFAULT_SOLAR_BACKEND,
+    ) -> None:
+        """初始化缓存."""
+        self.max_size = max_size
+        self.precision = precision
+        self.backend = backend
+        self._data: "OrderedDict[tuple, SolarTimes]" = OrderedDict()
+        self._today: Optional[int] = None
+        # 按四舍五入后的经纬度索引的年表，由引擎设置
+        self.tables: Dict[Tuple[float, float], Any] = {}
+        self._polar: Dict[Tuple[float, float], PolarSeason] = {}
+        self.hits = 0
+        self.misses = 0
+        self.table_hits = 0
+        self.evictions = 0
+
+    def _key(
+        self, latitude: float, longitude: float, timestamp: float, day_offset: int = 0
+    ) -> tuple:
+        """生成缓存键."""
+        latitude = round(latitude, self.precision)
+        longitude = round(longitude, self.precision)
+        return (latitude, longitude, solar_day(longitude, timestamp) + day_offset)
+
+    def set_backend(self, backend: str) -> bool:
+        """切换计算实现，切换后清空缓存，返回是否发生切换."""
+        if backend == self.backend:
+            return False
+        _LOGGER.info("日出日落计算切换为 %s", backend)
+        self.backend = backend
+        self.clear()
         return True
 
+    def _from_table(self, key: tuple) -> Tuple[bool, SolarTimes]:
+        """从年表读取，返回是否找到以及日出日落时间."""
+        if self.backend == SOLAR_BACKEND_ASTRAL:
+            return False, None
+        table = self.tables.get((key[0], key[1]))
+        if table is None or not table.covers(key[2]):
+            return False, None
+        self.table_hits += 1
+        return True, _as_datetimes(table.times(key[2]))
+
+    def get(
+        self, latitude: float, longitude: float, timestamp: float, day_offset: int = 0
+    ) -> SolarTimes:
+        """获取某个位置在 timestamp 所在太阳日（加 day_offset 天）的日出日落时间.
+
+        极昼或极夜时返回 None。
+        """
+        self._expire(timestamp)
+
+        key = self._key(latitude, longitude, timestamp, day_offset)
+        if key in self._data:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+        found, times = self._from_table(key)
+        if found:
+            self._store(key, times)
+            return times
+
+        self.misses += 1
+        if self.backend == SOLAR_BACKEND_ASTRAL:
+            times = _astral_solar_times(*key)
+        else:
+            times = _builtin_solar_times(*key)
+
+        self._store(key, times)
+        return times
+
+    def polar_season(
+        self, latitude: float, longitude: float, timestamp: float
+    ) -> PolarSeason:
+        """获取位置在 timestamp 所在太阳日所处的极昼或极夜.
+
+        只应在该日没有日出日落时调用。向后逐日查找第一个有日出日落的日子，
+        结果按位置缓存到极昼或极夜结束。
+        """
+        latitude = round(latitude, self.precision)
+        longitude = round(longitude, self.precision)
+        day = solar_day(longitude, timestamp)
+        season = self._polar.get((latitude, longitude))
+        if season is not None and season.covers(day):
+            return season
+
+        table = self.tables.get((latitude, longitude))
+        end_day = day + SOLAR_TABLE_DAYS
+        for next_day in range(day + 1, day + SOLAR_TABLE_DAYS):
+            if table is not None and table.covers(next_day):
+                times = table.times(next_day)
+            else:
+                times = solar_times(latitude, longitude, next_day)
+            if times is not None:
+                end_day = next_day
+                break
+
+        season = PolarSeason(is_polar_day(latitude, longitude, day), day, end_day)
+        self._polar[(latitude, longitude)] = season
+        _LOGGER.debug(
+            "位置 %s, %s 处于%s，持续 %s 天",
+            latitude,
+            longitude,
+            "极昼" if season.is_day else "极夜",
+            end_day - day,
+        )
+        return season
+
+    def prefetch(
+        self, locations: Iterable[Tuple[float, float]], timestamp: float
+    ) -> int:
+        """用批量计算一次填充多个位置当天的缓存，返回新计算的位置数.
+
+        批量计算与内置实现使用相同的公式；选择 astral 时不预取，由 get 逐个计算。
+        """
+        if self.backend == SOLAR_BACKEND_ASTRAL:
+            return 0
+        self._expire(timestamp)
+
+        missing = {}
+        for latitude, longitude in locations:
+            key = self._key(latitude, longitude, timestamp)
+            if key in self._data:
+                continue
+            found, times = self._from_table(key)
+            if found:
+                self._store(key, times)
+            else:
+                missing[key] = None
+        if not missing:
+            return 0
+
+        keys = list(missing)
+        result = batch_solar_state(
+            [key[0] for key in keys], [key[1] for key in keys], timestamp
+        )
+        for key, sunrise, sunset in zip(keys, result.sunrise, result.sunset):
+            times: SolarTimes = None
+            if sunrise == sunrise and sunset == sunset:  # NaN 表示极昼或极夜
+                times = (
+                    datetime.fromtimestamp(float(sunrise), timezone.utc),
+                    datetime.fromtimestamp(float(sunset), timezone.utc),
+                )
+            self.misses += 1
+            self._store(key, times)
+        return len(keys)
+
+    def _store(self, key: tuple, times: SolarTimes) -> None:
+        """写入缓存并按 LRU 淘汰."""
+        self._data[key] = times
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _expire(self, timestamp: float) -> None:
+        """跨过零点后丢弃已经过去的太阳日.
+
+        各地太阳日与 UTC 日期最多相差一天，因此保留前一天的条目。
+        """
+        today = solar_day(0, timestamp)
+        if today == self._today:
+            return
+        self._today = today
+        for key in [key for key in self._data if key[2] < today - 1]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        """清空缓存."""
+        self._data.clear()
+        self._polar.clear()
+        self._today = None
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """缓存统计信息."""
+        lookups = self.hits + self.misses + self.table_hits
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "table_hits": self.table_hits,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# 所有平板和手机条目共享同一个缓存
+SOLAR_CACHE = SolarEphemerisCache()
+
+def is_daytime(hass: HomeAssistant, latitude: float, longitude: float) -> bool:
+    """根据经纬度判断是白天还是黑夜.
+
+    极昼时为白天，极夜时为黑夜；计算出错时抛出异常，由调用方记录条目的失败。
+    """
+    # 获取当前时间
+    now = dt_util.now()
+
+    # 从共享缓存获取该位置当天的日出日落时间，与调度器保持一致
+    times = SOLAR_CACHE.get(latitude, longitude, now.timestamp())
+    if times is None:
+        return SOLAR_CACHE.polar_season(latitude, longitude, now.timestamp()).is_day
+    sunrise, sunset = times
+
+    # 判断当前时间是否在日出和日落之间
+    return sunrise <= now <= sunset
+
+def _zone_for_tracker(hass: HomeAssistant, entity: State) -> Optional[State]:
+    """查找设备追踪器当前所在的区域，不在任何区域时返回 None."""
+    if entity.domain != "device_tracker":
+        return None
+    if entity.state == STATE_HOME:
+        return hass.states.get("zone.home")
+    for zone in hass.states.async_all("zone"):
+        if zone.attributes.get(ATTR_FRIENDLY_NAME) == entity.state:
+            return zone
+    return None
+
 def get_location_from_entity(hass: HomeAssistant, entity_id: str) -> Tuple[Optional[float], Optional[float]]:
-    """从实体获取位置信息."""
+    """从实体获取位置信息.
+
+    设备追踪器位于已知区域内时使用区域的坐标，避免 GPS 抖动。
+    """
     entity = hass.states.get(entity_id)
     if not entity:
-        _LOGGER.error("实体 %s 不存在", entity_id)
+        # 由调用方按条目记录失败，这里不重复记录错误
+        _LOGGER.debug("实体 %s 不存在", entity_id)
         return None, None
+
+    zone = _zone_for_tracker(hass, entity)
+    if zone is not None and zone.attributes.get(ATTR_LATITUDE) is not None:
+        entity = zone
     
     # 尝试从实体属性中获取经纬度
     latitude = entity.attributes.get(ATTR_LATITUDE)
     longitude = entity.attributes.get(ATTR_LONGITUDE)
     
     if latitude is None or longitude is None:
-        _LOGGER.error("实体 %s 没有位置信息", entity_id)
+        _LOGGER.debug("实体 %s 没有位置信息", entity_id)
         return None, None
     
-    return latitude, longitude
\ No newline at end of file
+    return latitude, longitude
+
+def get_next_solar_change(
+    latitude: float, longitude: float, now: Optional[datetime] = None
+) -> Optional[datetime]:
+    """计算指定位置下一次日出或日落的时间.
+
+    极昼或极夜期间在查找范围内没有日出日落时返回 None.
+    """
+    if now is None:
+        now = dt_util.now()
+
+    for offset in range(SOLAR_LOOKAHEAD_DAYS):
+        times = SOLAR_CACHE.get(latitude, longitude, now.timestamp(), offset)
+        if times is None:
+            continue
+        for event_time in times:
+            if event_time > now:
+                return dt_util.as_local(event_time)
+
+    return None
+
+def clock_hue(phase: int, epoch: float, period_seconds: float, timestamp: float) -> int:
+    """根据时钟计算色相（1-360）.
+
+    从 epoch 时刻的 phase 开始，每 period_seconds 秒变化一整圈。
+    """
+    steps = (timestamp - epoch) / period_seconds * 360
+    return math.floor(phase - 1 + steps) % 360 + 1
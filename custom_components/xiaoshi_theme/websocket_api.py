@@ -0,0 +1,198 @@
+"""消逝主题 websocket 订阅接口.
+
+``xiaoshi_theme/subscribe`` 先返回所有主题状态的快照，之后只在值变化时推送增量，
+前端只需处理一个消息流，不需要分别订阅每个实体的 state_changed 事件。
+
+请求：``{"type": "xiaoshi_theme/subscribe", "entry_ids": [...]}``，entry_ids 可省略。
+快照事件：``{"snapshot": {entry_id: {"type", "slot", "location_source_id", "values": {角色: 值}}}}``。
+增量事件：``{"changes": {entry_id: {角色: 值}}}``，条目被移除时对应的值为 null。
+同一次事件循环中的多个变化合并为一条消息。
+
+``xiaoshi_theme/palette`` 返回预先计算的色相调色板：指定 hue 和 mode 时返回一个色相的颜色，
+否则返回整张表 ``{mode: [[primary, accent, background, text], ...]}``，第 i 项对应色相 i + 1。
+可用的模式为内置模式加上平板条目切换规则中的模式，指定 entry_id 时只使用该条目的规则。
+
+``xiaoshi_theme/trace`` 返回最近的评估事件（见 trace.py），可按 entry_id 过滤并用 limit 限制条数。
+"""
+from typing import Any, Dict, List, Optional, Set
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from .const import DOMAIN, DATA_ENGINE, SIGNAL_THEME_CHANGED, PAD_MODE_OPTIONS
+from .index import ThemeEntrySlot
+from .palette import palette_for, palette_table
+
+WS_TYPE_SUBSCRIBE = f"{DOMAIN}/subscribe"
+WS_TYPE_PALETTE = f"{DOMAIN}/palette"
+WS_TYPE_TRACE = f"{DOMAIN}/trace"
+
+
+@callback
+def async_setup_websocket(hass: HomeAssistant) -> None:
+    """注册 websocket 命令."""
+    websocket_api.async_register_command(hass, websocket_subscribe)
+    websocket_api.async_register_command(hass, websocket_palette)
+    websocket_api.async_register_command(hass, websocket_trace)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): WS_TYPE_TRACE,
+        vol.Optional("entry_id"): str,
+        vol.Optional("limit"): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    }
+)
+@websocket_api.require_admin
+@callback
+def websocket_trace(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: Dict[str, Any],
+) -> None:
+    """查询最近的评估事件."""
+    engine = hass.data.get(DOMAIN, {}).get(DATA_ENGINE)
+    events = engine.tracer.events(msg.get("entry_id"), msg.get("limit")) if engine is not None else []
+    connection.send_result(msg["id"], {"events": events})
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): WS_TYPE_PALETTE,
+        vol.Optional("entry_id"): str,
+        vol.Optional("mode"): str,
+        vol.Optional("hue"): vol.All(vol.Coerce(int), vol.Range(min=1, max=360)),
+    }
+)
+@callback
+def websocket_palette(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: Dict[str, Any],
+) -> None:
+    """查询色相调色板."""
+    engine = hass.data.get(DOMAIN, {}).get(DATA_ENGINE)
+    entry_slots = engine.entry_slots if engine is not None else []
+    if "entry_id" in msg:
+        entry_slots = [slot for slot in entry_slots if slot.entry_id == msg["entry_id"]]
+        if not entry_slots or not entry_slots[0].is_pad:
+            connection.send_error(
+                msg["id"],
+                websocket_api.const.ERR_NOT_FOUND,
+                f"没有平板主题条目 {msg['entry_id']}",
+            )
+            return
+    modes = _palette_modes(entry_slots)
+
+    if "mode" in msg:
+        if msg["mode"] not in modes:
+            connection.send_error(
+                msg["id"],
+                websocket_api.const.ERR_INVALID_FORMAT,
+                f"模式 {msg['mode']} 不在 {modes} 中",
+            )
+            return
+        if "hue" in msg:
+            connection.send_result(msg["id"], palette_for(msg["hue"], msg["mode"])._asdict())
+            return
+        modes = [msg["mode"]]
+
+    connection.send_result(
+        msg["id"],
+        {mode: [list(palette) for palette in palette_table(mode)] for mode in modes},
+    )
+
+
+def _palette_modes(entry_slots: List[ThemeEntrySlot]) -> List[str]:
+    """内置模式加上平板条目编译后的切换规则中出现的模式."""
+    modes: Dict[str, None] = dict.fromkeys(PAD_MODE_OPTIONS)
+    for entry_slot in entry_slots:
+        if entry_slot.is_pad and entry_slot.transitions is not None:
+            modes.update(dict.fromkeys(entry_slot.transitions.modes))
+    return list(modes)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): WS_TYPE_SUBSCRIBE,
+        vol.Optional("entry_ids"): [str],
+    }
+)
+@callback
+def websocket_subscribe(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: Dict[str, Any],
+) -> None:
+    """订阅主题状态：先发送快照，之后发送增量."""
+    msg_id = msg["id"]
+    entry_ids: Optional[Set[str]] = set(msg["entry_ids"]) if "entry_ids" in msg else None
+
+    engine = hass.data.get(DOMAIN, {}).get(DATA_ENGINE)
+    snapshot = engine.async_snapshot(entry_ids) if engine is not None else {}
+    # 已发送给前端的值，只有与之不同的变化才推送
+    sent: Dict[str, Dict[str, Any]] = {
+        entry_id: dict(entry["values"]) for entry_id, entry in snapshot.items()
+    }
+    pending: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    @callback
+    def async_flush() -> None:
+        """发送合并后的增量."""
+        if msg_id not in connection.subscriptions or not pending:
+            pending.clear()
+            return
+        changes = dict(pending)
+        pending.clear()
+        connection.send_message(websocket_api.event_message(msg_id, {"changes": changes}))
+
+    @callback
+    def async_queue(entry_id: str, values: Optional[Dict[str, Any]]) -> None:
+        """加入待发送的增量，本次事件循环结束时发送."""
+        if not pending:
+            hass.loop.call_soon(async_flush)
+        if values is None:
+            pending[entry_id] = None
+            return
+        entry_changes = pending.get(entry_id)
+        if entry_changes is None:
+            entry_changes = pending[entry_id] = {}
+        entry_changes.update(values)
+
+    @callback
+    def async_changed(entry_id: str, role: str, value: Any) -> None:
+        """实体的值发生变化."""
+        if entry_ids is not None and entry_id not in entry_ids:
+            return
+        # 同一次事件循环中条目已被移除，丢弃之后的变化，保证订阅者收到移除
+        if entry_id in pending and pending[entry_id] is None:
+            return
+        entry_sent = sent.setdefault(entry_id, {})
+        if role in entry_sent and entry_sent[role] == value:
+            return
+        entry_sent[role] = value
+        async_queue(entry_id, {role: value})
+
+    @callback
+    def async_removed(entry_id: str) -> None:
+        """条目被移除."""
+        if sent.pop(entry_id, None) is not None:
+            async_queue(entry_id, None)
+
+    unsub_changed = async_dispatcher_connect(hass, SIGNAL_THEME_CHANGED, async_changed)
+    unsub_removed = async_dispatcher_connect(
+        hass, f"{SIGNAL_THEME_CHANGED}_removed", async_removed
+    )
+
+    @callback
+    def async_unsubscribe() -> None:
+        """取消订阅."""
+        unsub_changed()
+        unsub_removed()
+
+    connection.subscriptions[msg_id] = async_unsubscribe
+    connection.send_result(msg_id)
+    connection.send_message(websocket_api.event_message(msg_id, {"snapshot": snapshot}))
@@ -0,0 +1 @@
+"""消逝主题测试."""
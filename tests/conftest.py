@@ -0,0 +1,10 @@
+"""消逝主题测试的公共夹具."""
+import pytest
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """加载 custom_components 中的集成."""
+    yield
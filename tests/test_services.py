@@ -0,0 +1,49 @@
+"""xiaoshi_theme.apply 服务的测试."""
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.xiaoshi_theme.const import (
+    DOMAIN,
+    DATA_ENGINE,
+    CONF_INTEGRATION_TYPE,
+    CONF_LOCATION_SOURCE_ID,
+    INTEGRATION_TYPE_PAD,
+    ROLE_HUE_NUMBER,
+    SERVICE_APPLY,
+)
+
+
+async def test_apply_ignores_disabled_and_unsupported_fields(hass: HomeAssistant) -> None:
+    """已禁用实体和不适用于条目类型的字段列在 ignored 中，其余字段照常应用."""
+    hass.states.async_set("zone.home", "0", {"latitude": 31.2, "longitude": 121.5})
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={CONF_INTEGRATION_TYPE: INTEGRATION_TYPE_PAD, CONF_LOCATION_SOURCE_ID: "zone.home"},
+    )
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    er.async_get(hass).async_update_entity(
+        "number.theme_pad_hue", disabled_by=er.RegistryEntryDisabler.USER
+    )
+    assert await hass.config_entries.async_reload(entry.entry_id)
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN][DATA_ENGINE].get_entity(entry.entry_id, ROLE_HUE_NUMBER) is None
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_APPLY,
+        {"entry_id": entry.entry_id, "hue": 50, "phone_mode": 2, "full_switch": False},
+        blocking=True,
+        return_response=True,
+    )
+    result = response["entries"][entry.entry_id]
+    assert sorted(result["ignored"]) == ["hue", "phone_mode"]
+    assert result["errors"] == {}
+    assert result["applied"] == {"full_switch": False}
+    assert hass.states.get("switch.theme_pad_full").state == "off"
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()